@@ -0,0 +1,253 @@
+"""
+Non-blocking logging.
+
+Loggers hand records to ``AsyncQueueHandler``, which only stamps them and
+puts them on a bounded in-memory queue; the real handlers (console, file)
+run on a background ``QueueListener`` thread, so a slow disk never stalls a
+request. When the queue is full records are dropped instead of waiting
+(``drop_newest`` keeps what is queued, ``drop_oldest`` makes room), and the
+number dropped is reported once there is room again. Repeats of the same log
+call (same logger, level and source line) beyond ``sample_burst`` per
+``sample_window`` seconds are dropped too, and the next one let through
+carries a ``suppressed`` count.
+
+Records are stamped with the current request id and route by
+``RequestLogContextMiddleware`` and rendered as one JSON object per line by
+``JsonFormatter``.
+
+Configured from ``LOGGING`` in settings::
+
+    'queue': {
+        '()': 'backend.log.AsyncQueueHandler',
+        'handlers': ['console', 'file'],   # names of the handlers it feeds
+        'maxsize': 10000,
+        'drop_policy': 'drop_newest',
+        'sample_burst': 10,                # 0 disables sampling
+        'sample_window': 60,
+    }
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+
+DROP_POLICIES = ('drop_newest', 'drop_oldest')
+
+_request = ContextVar('log_request', default=None)
+
+
+class RequestLogContextMiddleware:
+    """Make the request id (``X-Request-ID`` or a new one) and route available to log records."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        request.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        return _request.set(request)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+    async def __acall__(self, request):
+        token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+
+def _request_context(record):
+    # django.request logs 4xx/5xx after the middleware has reset the context,
+    # but attaches the request to the record
+    request = _request.get() or getattr(record, 'request', None)
+    if request is None:
+        return None, None
+    match = getattr(request, 'resolver_match', None)
+    route = (match.url_name or match.view_name) if match is not None else None
+    return getattr(request, 'request_id', None), route
+
+
+class LogSampler:
+    """Let through ``burst`` records per call site per ``window`` seconds."""
+
+    def __init__(self, burst, window):
+        self.burst = burst
+        self.window = window
+        # (logger, level, path, line) -> [window start, seen, suppressed]
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def allow(self, record):
+        """``None`` to drop, else the number suppressed since the last one let through."""
+        if not self.burst:
+            return 0
+        key = (record.name, record.levelno, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site is not None else 0
+                self._sites[key] = [now, 1, 0]
+                if len(self._sites) > 10000:
+                    # forget call sites idle for a whole window
+                    self._sites = {k: v for k, v in self._sites.items() if now - v[0] < self.window}
+                return suppressed
+            site[1] += 1
+            if site[1] > self.burst:
+                site[2] += 1
+                return None
+            return 0
+
+
+class AsyncQueueHandler(QueueHandler):
+    """Bounded, never-blocking queue in front of the named handlers."""
+
+    def __init__(self, handlers=(), maxsize=10000, drop_policy='drop_newest',
+                 sample_burst=10, sample_window=60, level=logging.NOTSET):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {', '.join(DROP_POLICIES)}")
+        super().__init__(queue.Queue(maxsize))
+        self.setLevel(level)
+        self.targets = []
+        for name in handlers:
+            handler = _handler_by_name(name)
+            if handler is None:
+                # dictConfig retries handlers failing this way once the others exist
+                raise ValueError(f"target not configured yet: {name}")
+            self.targets.append(handler)
+        self.drop_policy = drop_policy
+        self.sampler = LogSampler(sample_burst, sample_window)
+        self.dropped = 0
+        self._listener = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        # started on first use rather than at import
+        with self._start_lock:
+            if self._listener is not None:
+                return
+            self._listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+            self._listener.start()
+            atexit.register(self.close)
+
+    def emit(self, record):
+        if self._listener is None:
+            self._ensure_listener()
+        suppressed = self.sampler.allow(record)
+        if suppressed is None:
+            return
+        record.request_id, record.route = _request_context(record)
+        if suppressed:
+            record.suppressed = suppressed
+        try:
+            # only with room for the report and the record, or it would evict one
+            if self.dropped and self.queue.qsize() < self.queue.maxsize - 1:
+                self._put(self._dropped_record())
+            self._put(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def _put(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if self.drop_policy == 'drop_oldest':
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+                self.queue.put_nowait(record)
+                return
+            except (queue.Empty, queue.Full):
+                pass
+        self.dropped += 1
+
+    def _dropped_record(self):
+        dropped, self.dropped = self.dropped, 0
+        record = logging.LogRecord(
+            __name__, logging.WARNING, __file__, 0,
+            f"Log queue full, dropped {dropped} records", None, None,
+        )
+        record.request_id = record.route = None
+        return record
+
+    def prepare(self, record):
+        # render the message and traceback here, the listener only serialises
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        # django.request attaches the request; do not keep it alive in the queue
+        record.__dict__.pop('request', None)
+        return record
+
+    def close(self):
+        with self._start_lock:
+            listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+        super().close()
+
+
+_traceback_formatter = logging.Formatter()
+
+
+def _handler_by_name(name):
+    getter = getattr(logging, 'getHandlerByName', None)  # Python 3.12+
+    if getter is not None:
+        return getter(name)
+    return logging._handlers.get(name)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'route': getattr(record, 'route', None),
+        }
+        if getattr(record, 'suppressed', 0):
+            data['suppressed'] = record.suppressed
+        if getattr(record, 'status_code', None) is not None:
+            data['status_code'] = record.status_code
+        if record.exc_info:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, default=str)
+
+    def formatTime(self, record, datefmt=None):
+        return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z'
@@ -0,0 +1,287 @@
+"""
+Per-route request metrics.
+
+``RequestMetricsMiddleware`` records, per resolved URL name and method,
+request latency, response size and the number and time of DB queries, and
+logs a warning with a SQL summary when a request goes over its route's
+query budget. ``metrics_view`` serves the numbers in the Prometheus text
+format for scraping.
+
+Queries are counted by an execute wrapper installed on every DB connection
+as it is opened (``connection_created``). The wrapper reports to the stats
+of the current request through a context variable, so queries made from
+async views (which run on other threads through ``sync_to_async``) are
+counted too.
+
+Metrics are per process; scrape every worker. ``/internal/metrics/`` is
+hidden (404) unless the request carries the bearer ``TOKEN`` or comes from
+one of ``ALLOWED_IPS``; both are empty by default. Behind a proxy on the same
+host every request comes from 127.0.0.1, so prefer the token there.
+
+Settings (all optional)::
+
+    REQUEST_METRICS = {
+        'DEFAULT_QUERY_BUDGET': 50,              # None disables the warning
+        'QUERY_BUDGETS': {'employee-list': 5},   # per URL name, or 'METHOD name'
+        'TOKEN': None,                           # "Authorization: Bearer <token>" may read /internal/metrics/
+        'ALLOWED_IPS': [],                       # and so may these REMOTE_ADDRs
+    }
+"""
+import hmac
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'DEFAULT_QUERY_BUDGET': 50,
+    'QUERY_BUDGETS': {},
+    'TOKEN': None,
+    'ALLOWED_IPS': [],
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# statements listed in a budget warning
+SUMMARY_STATEMENTS = 5
+
+
+def metrics_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}[name]
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum:g}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class RouteMetrics:
+    __slots__ = ('latency', 'queries', 'size', 'query_seconds', 'budget_exceeded', 'statuses')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.query_seconds = 0.0
+        self.budget_exceeded = 0
+        self.statuses = defaultdict(int)
+
+
+class MetricsRegistry:
+    """``(route, method) -> RouteMetrics`` for this process."""
+
+    def __init__(self):
+        self._routes = defaultdict(RouteMetrics)
+        self._lock = threading.Lock()
+
+    def record(self, route, method, status, seconds, stats, size, over_budget):
+        with self._lock:
+            metrics = self._routes[(route, method)]
+            metrics.latency.observe(seconds)
+            metrics.queries.observe(stats.queries)
+            metrics.query_seconds += stats.seconds
+            metrics.statuses[status] += 1
+            if size is not None:
+                metrics.size.observe(size)
+            if over_budget:
+                metrics.budget_exceeded += 1
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render(self):
+        """The registry in the Prometheus text exposition format."""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            families = (
+                ('http_request_duration_seconds', 'histogram', 'Request latency.',
+                 lambda m, name, labels: m.latency.samples(name, labels)),
+                ('http_requests_total', 'counter', 'Requests by response status.',
+                 lambda m, name, labels: (
+                     f'{name}{{{labels},status="{status}"}} {count}'
+                     for status, count in sorted(m.statuses.items())
+                 )),
+                ('http_response_size_bytes', 'histogram', 'Response body size (non-streaming).',
+                 lambda m, name, labels: m.size.samples(name, labels)),
+                ('db_queries_per_request', 'histogram', 'DB queries per request.',
+                 lambda m, name, labels: m.queries.samples(name, labels)),
+                ('db_query_duration_seconds_total', 'counter', 'Time spent in DB queries.',
+                 lambda m, name, labels: [f'{name}{{{labels}}} {m.query_seconds:g}']),
+                ('db_query_budget_exceeded_total', 'counter', 'Requests over their query budget.',
+                 lambda m, name, labels: [f'{name}{{{labels}}} {m.budget_exceeded}']),
+            )
+            lines = []
+            for name, kind, help_text, samples in families:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for (route, method), metrics in routes:
+                    labels = f'route="{_escape(route)}",method="{method}"'
+                    lines.extend(samples(metrics, name, labels))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class QueryStats:
+    """DB activity of one request."""
+
+    __slots__ = ('queries', 'seconds', 'statements')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        # sql (with placeholders) -> [count, seconds]
+        self.statements = {}
+
+    def add(self, sql, seconds):
+        self.queries += 1
+        self.seconds += seconds
+        entry = self.statements.get(sql)
+        if entry is None:
+            self.statements[sql] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def summary(self):
+        top = sorted(self.statements.items(), key=lambda item: -item[1][1])[:SUMMARY_STATEMENTS]
+        return '\n'.join(
+            f'  {count}x {seconds * 1000:.1f}ms {sql[:300]}' for sql, (count, seconds) in top
+        )
+
+
+_current = ContextVar('request_query_stats', default=None)
+
+
+def _count_queries(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(sql, time.perf_counter() - started)
+
+
+def _install_wrapper(sender, connection, **kwargs):
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+connection_created.connect(_install_wrapper)
+
+
+def _query_budget(route, method):
+    budgets = metrics_setting('QUERY_BUDGETS')
+    return budgets.get(f'{method} {route}', budgets.get(route, metrics_setting('DEFAULT_QUERY_BUDGET')))
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure every request; put it first in ``MIDDLEWARE`` after
+    ``RequestLogContextMiddleware``, so its warnings carry the request id.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            _install_wrapper(None, connection)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def record(self, request, response, seconds, stats):
+        match = getattr(request, 'resolver_match', None)
+        route = (match.url_name or match.view_name) if match is not None else 'unmatched'
+        budget = _query_budget(route, request.method)
+        over_budget = budget is not None and stats.queries > budget
+        if over_budget:
+            logger.warning(
+                f"{request.method} {route} ran {stats.queries} queries "
+                f"({stats.seconds * 1000:.1f}ms), budget {budget}:\n{stats.summary()}"
+            )
+        size = None if response.streaming else len(response.content)
+        registry.record(route, request.method, response.status_code, seconds, stats, size, over_budget)
+
+
+def _allowed(request):
+    token = metrics_setting('TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+        return True
+    return request.META.get('REMOTE_ADDR') in metrics_setting('ALLOWED_IPS')
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, hidden from everyone not allowed."""
+    if not _allowed(request):
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,159 @@
+"""
+Read replica routing.
+
+``ReplicaRouter`` sends reads to one of ``DATABASE_REPLICAS`` only while
+``ReplicaRoutingMiddleware`` has marked the current request as replica-safe:
+a ``GET``/``HEAD``/``OPTIONS`` from a client that has not written recently.
+Everything else (writes, reads inside a transaction, management commands,
+background threads) uses ``default``.
+
+Read-your-writes: an unsafe request pins its client to the primary for
+``STICKY_SECONDS``, through a cookie (for browsers) and a cache entry keyed
+by the ``Authorization`` header (for API clients that do not keep cookies).
+The next request may reach any worker, so the pin lives in a shared cache;
+with replicas configured the middleware raises ``ImproperlyConfigured`` at
+startup when ``STICKY_CACHE_ALIAS`` is a per-process ``LocMemCache``.
+Wrap reads whose result is cached or written back in ``use_primary()`` so
+replica lag cannot end up in a cache.
+
+With no replicas configured the router has no opinion and everything runs
+on ``default``.
+
+Settings (all optional)::
+
+    DATABASE_REPLICAS = ['replica_0']         # aliases in DATABASES
+    REPLICA_ROUTING = {
+        'STICKY_SECONDS': 5,                  # at least the replication lag
+        'STICKY_CACHE_ALIAS': 'default',      # a cache shared by every worker
+        'STICKY_COOKIE': 'primary_pin',
+    }
+"""
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+DEFAULTS = {
+    'STICKY_SECONDS': 5,
+    'STICKY_CACHE_ALIAS': 'default',
+    'STICKY_COOKIE': 'primary_pin',
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_KEY = 'replicas:primary-pin:{}'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def routing_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'REPLICA_ROUTING', {})}[name]
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def use_primary():
+    """Send the reads in the block to ``default``."""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or 'instance' in hints:
+            return None
+        replicas = replica_aliases()
+        if not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas follow the primary through replication
+        if db in replica_aliases():
+            return False
+        return None
+
+
+def _sticky_key(request):
+    authorization = request.headers.get('Authorization')
+    if not authorization:
+        return None
+    return STICKY_KEY.format(hashlib.sha256(authorization.encode()).hexdigest())
+
+
+class ReplicaRoutingMiddleware:
+    """Allow replica reads for safe requests of clients not pinned to the primary."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        alias = routing_setting('STICKY_CACHE_ALIAS')
+        if replica_aliases() and isinstance(caches[alias], LocMemCache):
+            # a pin set by one worker would be invisible to the others
+            raise ImproperlyConfigured(
+                f"REPLICA_ROUTING['STICKY_CACHE_ALIAS'] ('{alias}') is a per-process LocMemCache; "
+                "read replicas need a cache shared by every worker, e.g. set REDIS_URL"
+            )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _replica_reads.set(self._replica_safe(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        self._pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = _replica_reads.set(self._replica_safe(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        self._pin(request, response)
+        return response
+
+    def _replica_safe(self, request):
+        if not replica_aliases() or request.method not in SAFE_METHODS:
+            return False
+        if request.COOKIES.get(routing_setting('STICKY_COOKIE')):
+            return False
+        key = _sticky_key(request)
+        return key is None or not caches[routing_setting('STICKY_CACHE_ALIAS')].get(key)
+
+    def _pin(self, request, response):
+        if not replica_aliases() or request.method in SAFE_METHODS:
+            return
+        seconds = routing_setting('STICKY_SECONDS')
+        response.set_cookie(routing_setting('STICKY_COOKIE'), '1', max_age=seconds, httponly=True, samesite='Lax')
+        key = _sticky_key(request)
+        if key is not None:
+            caches[routing_setting('STICKY_CACHE_ALIAS')].set(key, True, seconds)
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,10 +25,14 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt.token_blacklist',
     'user_auth',
     'employee',
+    'jobs',
 
 ]
 
 MIDDLEWARE = [
+    'backend.log.RequestLogContextMiddleware',
+    'backend.metrics.RequestMetricsMiddleware',
+    'backend.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -48,6 +52,16 @@ CORS_ALLOWED_ORIGINS = [
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    # employee exports and uploads waiting to be imported: outside MEDIA_ROOT, never given a URL
+    'private': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': config('PRIVATE_FILES_ROOT', default=os.path.join(BASE_DIR, 'private'))},
+    },
+}
+
 
 TEMPLATES = [
     {
@@ -70,25 +84,174 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 
 # Database
 AUTH_USER_MODEL = 'user_auth.User'
-DATABASES = {
-    'default': {
+# Worker processes and request threads per process; they size the pool.
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=1, cast=int)
+WEB_THREADS = config('WEB_THREADS', default=4, cast=int)
+# connections the server allows this app across all workers
+DATABASE_MAX_CONNECTIONS = config('DATABASE_MAX_CONNECTIONS', default=100, cast=int)
+
+
+def database(host):
+    """
+    A Postgres connection to ``host``. Connections are pooled per process
+    when DATABASE_POOL is set (needs psycopg 3 with psycopg-pool) and kept
+    open with a health check between requests otherwise.
+    """
+    options = {
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': config("DATABASE_NAME"),
         'USER': config("DATABASE_USER"),
         'PASSWORD': config("DATABASE_PASSWORD"),
-        'HOST': config("DATABASE_HOST", default='localhost'),
-        'PORT': config("DATABASE_PORT", default='5432')
+        'HOST': host,
+        'PORT': config("DATABASE_PORT", default='5432'),
+        'CONN_MAX_AGE': config('DATABASE_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
+    if config('DATABASE_POOL', default=False, cast=bool):
+        from psycopg_pool import ConnectionPool
+        options['CONN_MAX_AGE'] = 0
+        options['OPTIONS'] = {'pool': {
+            'min_size': config('DATABASE_POOL_MIN_SIZE', default=1, cast=int),
+            # a connection per request thread plus the async views' blocking
+            # pool and background writers, within this worker's share
+            'max_size': config('DATABASE_POOL_MAX_SIZE', cast=int, default=max(
+                2, min(WEB_THREADS + 4, DATABASE_MAX_CONNECTIONS // WEB_CONCURRENCY)
+            )),
+            'timeout': config('DATABASE_POOL_TIMEOUT', default=10, cast=int),
+            'check': ConnectionPool.check_connection,
+        }}
+    return options
+
+
+DATABASES = {
+    'default': database(config("DATABASE_HOST", default='localhost')),
+}
+# Read replicas: same credentials, one alias per host. Tests read them
+# through the primary.
+for index, host in enumerate(config('DATABASE_REPLICA_HOSTS', default='', cast=Csv())):
+    DATABASES[f'replica_{index}'] = {**database(host), 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica_')]
+
+# Shared by every web worker: replica pins (REPLICA_ROUTING) and, when
+# SCHEMA_CACHE_ALIAS points at it, compiled schemas. Without REDIS_URL each
+# process has its own memory cache, which only suits one worker without
+# read replicas; ReplicaRoutingMiddleware refuses to start on it.
+REDIS_URL = config('REDIS_URL', default=None)
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+    if REDIS_URL else {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+DATABASE_ROUTERS = ['backend.replicas.ReplicaRouter']
+REPLICA_ROUTING = {
+    'STICKY_SECONDS': config('REPLICA_STICKY_SECONDS', default=5, cast=int),
 }
 
 
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user_auth.authentication.CachedJWTAuthentication',
         ),
 }
 
+SIMPLE_JWT = {
+    'TOKEN_REFRESH_SERIALIZER': 'user_auth.serializers.TokenRefreshSerializer',
+}
+
+# expired token pruning and blacklist filter (user_auth/blacklist.py);
+# set TOKEN_PRUNE_INTERVAL=0 when pruning runs as a periodic job instead
+TOKEN_BLACKLIST = {
+    'PRUNE_INTERVAL': config('TOKEN_PRUNE_INTERVAL', default=3600, cast=int),
+    'PRUNE_BATCH_SIZE': config('TOKEN_PRUNE_BATCH_SIZE', default=1000, cast=int),
+    'REFRESH_INTERVAL': config('TOKEN_BLACKLIST_REFRESH_INTERVAL', default=5, cast=int),
+}
+
+# resolved JWT users (user_auth/authentication.py)
+JWT_PRINCIPAL_CACHE = {
+    'TTL': config('JWT_PRINCIPAL_CACHE_TTL', default=30, cast=int),
+    'MAX_ENTRIES': config('JWT_PRINCIPAL_CACHE_MAX_ENTRIES', default=10000, cast=int),
+}
+
+# compiled form template schemas (employee/cache.py)
+EMPLOYEE_SCHEMA_CACHE = {
+    'MAX_ENTRIES': config('SCHEMA_CACHE_MAX_ENTRIES', default=1024, cast=int),
+    'SHARED_CACHE_ALIAS': config('SCHEMA_CACHE_ALIAS', default=None),
+    'TIMEOUT': config('SCHEMA_CACHE_TIMEOUT', default=3600, cast=int),
+}
+
+# incrementally maintained template statistics (employee/stats.py)
+EMPLOYEE_STATS = {
+    'DISTRIBUTION_LIMIT': config('STATS_DISTRIBUTION_LIMIT', default=20, cast=int),
+}
+
+# background export files (employee/tasks.py)
+EMPLOYEE_EXPORTS = {
+    'TTL': config('EXPORT_TTL', default=86400, cast=int),
+}
+
+# per-route request metrics, served on /internal/metrics/ (backend/metrics.py)
+REQUEST_METRICS = {
+    'DEFAULT_QUERY_BUDGET': config('QUERY_BUDGET', default=50, cast=int),
+    'QUERY_BUDGETS': {
+        'user-profile': 3,
+        'login': 3,
+        'form-templates': 5,
+        # templates, fields and their statistics rows in one transaction
+        'POST form-templates': 6,
+        # a stale If-None-Match on a cold schema cache: version check + schema load
+        'form-template-detail': 3,
+        # lock, load fields, one statement per kind of change, then the queued jobs
+        'PATCH form-template-detail': 11,
+        'employee-list': 5,
+        'employee-detail': 3,
+        'form-template-stats': 2,
+    },
+    # nobody may scrape until one of these is set
+    'TOKEN': config('METRICS_TOKEN', default=None),
+    'ALLOWED_IPS': config('METRICS_ALLOWED_IPS', default='', cast=Csv()),
+}
+
+# async read views for ASGI deployments (employee/blocking.py)
+EMPLOYEE_ASYNC_VIEWS = {
+    'ENABLED': config('ASYNC_READ_VIEWS', default=False, cast=bool),
+    'BLOCKING_WORKERS': config('ASYNC_BLOCKING_WORKERS', default=8, cast=int),
+}
+
+# login pipeline (user_auth/login.py)
+LOGIN_PIPELINE = {
+    'HASH_WORKERS': config('LOGIN_HASH_WORKERS', default=4, cast=int),
+    # True buffers token rows off the request; see user_auth/login.py for what a crash loses
+    'DEFER_OUTSTANDING_TOKENS': config('LOGIN_DEFER_OUTSTANDING_TOKENS', default=False, cast=bool),
+    'TOKEN_FLUSH_SIZE': config('LOGIN_TOKEN_FLUSH_SIZE', default=200, cast=int),
+    'TOKEN_FLUSH_INTERVAL': config('LOGIN_TOKEN_FLUSH_INTERVAL', default=0.5, cast=float),
+}
+
+# profile picture thumbnails (user_auth/images.py)
+PROFILE_IMAGES = {
+    'THUMBNAIL_SIZES': config(
+        'PROFILE_THUMBNAIL_SIZES', default='64,128,256',
+        cast=lambda value: tuple(int(size) for size in value.split(',')),
+    ),
+    'WORKERS': config('PROFILE_THUMBNAIL_WORKERS', default=2, cast=int),
+    'QUALITY': config('PROFILE_THUMBNAIL_QUALITY', default=85, cast=int),
+    'BACKGROUND': config('PROFILE_THUMBNAIL_BACKGROUND', default='pool'),
+}
+
+# background jobs run by `manage.py run_jobs` (jobs/registry.py)
+JOBS = {
+    'PROCESSES': config('JOB_PROCESSES', default=2, cast=int),
+    'POLL_INTERVAL': config('JOB_POLL_INTERVAL', default=1.0, cast=float),
+    'MAX_ATTEMPTS': config('JOB_MAX_ATTEMPTS', default=3, cast=int),
+    'BACKOFF_BASE': config('JOB_BACKOFF_BASE', default=10, cast=int),
+    'BACKOFF_MAX': config('JOB_BACKOFF_MAX', default=3600, cast=int),
+    'LOCK_TIMEOUT': config('JOB_LOCK_TIMEOUT', default=300, cast=int),
+    # e.g. JOB_PERIODIC=user_auth.prune_tokens=3600
+    'PERIODIC': config(
+        'JOB_PERIODIC', default='employee.prune_exports=3600',
+        cast=Csv(cast=lambda entry: (entry.split('=')[0], int(entry.split('=')[1])), post_process=dict),
+    ),
+}
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -129,13 +292,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 # In settings.py
+# handlers run on a background thread behind a bounded queue (backend/log.py)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
-            'style': '{',
+        'json': {
+            '()': 'backend.log.JsonFormatter',
         },
     },
     'handlers': {
@@ -143,23 +306,31 @@ LOGGING = {
             'level': 'ERROR',
             'class': 'logging.FileHandler',
             'filename': 'django_errors.log',
-            'formatter': 'verbose',
+            'formatter': 'json',
         },
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'formatter': 'json',
+        },
+        'queue': {
+            '()': 'backend.log.AsyncQueueHandler',
+            'handlers': ['console', 'file'],
+            'maxsize': config('LOG_QUEUE_SIZE', default=10000, cast=int),
+            'drop_policy': config('LOG_DROP_POLICY', default='drop_newest'),
+            'sample_burst': config('LOG_SAMPLE_BURST', default=10, cast=int),
+            'sample_window': config('LOG_SAMPLE_WINDOW', default=60, cast=int),
         },
     },
     'loggers': {
         '': {  # Root logger
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
         },
         'your_app': {  # App-specific logger
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'ERROR',
             'propagate': False,
         },
     },
-}
\ No newline at end of file
+}
@@ -0,0 +1,292 @@
+import json
+import logging
+import shutil
+import sys
+import tempfile
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user_auth.models import User
+
+from .log import AsyncQueueHandler, JsonFormatter, LogSampler, RequestLogContextMiddleware
+from .metrics import QueryStats, RequestMetricsMiddleware, registry
+from .replicas import ReplicaRouter, ReplicaRoutingMiddleware, use_primary
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        # a cache every worker would share
+        caches = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir},
+        })
+        caches.enable()
+        self.addCleanup(caches.disable)
+        self.factory = RequestFactory()
+
+    def read_alias(self, request):
+        """The alias a read made while handling ``request`` goes to."""
+        seen = []
+
+        def view(request):
+            seen.append(ReplicaRouter().db_for_read(User))
+            with use_primary():
+                seen.append(ReplicaRouter().db_for_read(User))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        self.assertIsNone(seen[1])
+        return seen[0], response
+
+    def test_safe_requests_read_from_replicas(self):
+        alias, response = self.read_alias(self.factory.get('/', HTTP_AUTHORIZATION='Bearer a'))
+        self.assertEqual(alias, 'replica_0')
+        self.assertNotIn('primary_pin', response.cookies)
+
+    def test_writes_pin_the_client(self):
+        alias, response = self.read_alias(self.factory.post('/', HTTP_AUTHORIZATION='Bearer a'))
+        self.assertIsNone(alias)
+        self.assertEqual(response.cookies['primary_pin']['max-age'], 5)
+        # by the Authorization header, for clients without cookies
+        self.assertIsNone(self.read_alias(self.factory.get('/', HTTP_AUTHORIZATION='Bearer a'))[0])
+        self.assertEqual(self.read_alias(self.factory.get('/', HTTP_AUTHORIZATION='Bearer b'))[0], 'replica_0')
+        # by the cookie, for browsers
+        request = self.factory.get('/')
+        request.COOKIES['primary_pin'] = '1'
+        self.assertIsNone(self.read_alias(request)[0])
+
+    def test_outside_requests_use_the_primary(self):
+        self.assertIsNone(ReplicaRouter().db_for_read(User))
+        self.assertEqual(ReplicaRouter().db_for_write(User), 'default')
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_refuses_a_per_process_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ReplicaRoutingMiddleware(lambda request: HttpResponse())
+
+    @override_settings(
+        DATABASE_REPLICAS=[],
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_without_replicas(self):
+        alias, response = self.read_alias(self.factory.post('/', HTTP_AUTHORIZATION='Bearer a'))
+        self.assertIsNone(alias)
+        self.assertNotIn('primary_pin', response.cookies)
+
+
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        registry.clear()
+        self.addCleanup(registry.clear)
+        self.user = User.objects.create_user(email='hr@example.com', username='hr', password='secret-pass')
+
+    def request(self, route='metrics'):
+        request = RequestFactory().get('/')
+        request.resolver_match = resolve(reverse(route))
+        return request
+
+    def run_view(self, queries=0, route='metrics'):
+        def view(request):
+            for _ in range(queries):
+                User.objects.count()
+            return HttpResponse(b'ok')
+        return RequestMetricsMiddleware(view)(self.request(route))
+
+    def samples(self, name):
+        return [line for line in registry.render().splitlines() if line.startswith(name)]
+
+    def test_latency_buckets_per_route(self):
+        middleware = RequestMetricsMiddleware(lambda request: HttpResponse())
+        for route, seconds in [('metrics', 0.03), ('metrics', 0.3), ('job-list', 0.004)]:
+            middleware.record(self.request(route), HttpResponse(b'ok'), seconds, QueryStats())
+        samples = self.samples('http_request_duration_seconds_bucket{route="metrics"')
+        self.assertIn('http_request_duration_seconds_bucket{route="metrics",method="GET",le="0.025"} 0', samples)
+        self.assertIn('http_request_duration_seconds_bucket{route="metrics",method="GET",le="0.05"} 1', samples)
+        self.assertIn('http_request_duration_seconds_bucket{route="metrics",method="GET",le="0.5"} 2', samples)
+        self.assertIn('http_request_duration_seconds_bucket{route="job-list",method="GET",le="0.005"} 1',
+                      self.samples('http_request_duration_seconds_bucket'))
+        self.assertIn('http_requests_total{route="metrics",method="GET",status="200"} 2', registry.render())
+
+    def test_queries_per_request(self):
+        self.run_view(queries=2)
+        samples = self.samples('db_queries_per_request_bucket')
+        self.assertIn('db_queries_per_request_bucket{route="metrics",method="GET",le="1"} 0', samples)
+        self.assertIn('db_queries_per_request_bucket{route="metrics",method="GET",le="2"} 1', samples)
+        # queries outside a request are not counted
+        User.objects.count()
+        self.assertIn('db_queries_per_request_sum{route="metrics",method="GET"} 2', registry.render())
+
+    @override_settings(REQUEST_METRICS={'QUERY_BUDGETS': {'metrics': 1}})
+    def test_budget_exceeded(self):
+        with self.assertNoLogs('backend.metrics'):
+            self.run_view(queries=1)
+        with self.assertLogs('backend.metrics', 'WARNING') as logs:
+            self.run_view(queries=2)
+        self.assertIn('GET metrics ran 2 queries', logs.output[0])
+        self.assertIn('budget 1', logs.output[0])
+        self.assertIn('SELECT COUNT(*)', logs.output[0])
+        self.assertIn('db_query_budget_exceeded_total{route="metrics",method="GET"} 1', registry.render())
+
+    @override_settings(REQUEST_METRICS={'DEFAULT_QUERY_BUDGET': 0})
+    def test_budget_warnings_carry_the_request_id(self):
+        handler = AsyncQueueHandler(sample_burst=0)
+        handler._ensure_listener = lambda: None
+        self.addCleanup(handler.close)
+        logger = logging.getLogger('backend.metrics')
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        response = self.client.get(
+            reverse('job-list'),
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}', HTTP_X_REQUEST_ID='abc123',
+        )
+        self.assertEqual(response.status_code, 200)
+        record = handler.queue.get_nowait()
+        self.assertIn('GET job-list ran', record.getMessage())
+        self.assertEqual((record.request_id, record.route), ('abc123', 'job-list'))
+
+
+class MetricsAccessTests(SimpleTestCase):
+
+    def get(self, **extra):
+        return self.client.get(reverse('metrics'), **extra)
+
+    def test_hidden_by_default(self):
+        self.assertEqual(self.get().status_code, 404)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+    @override_settings(REQUEST_METRICS={'TOKEN': 's3cret'})
+    def test_token(self):
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        # the test client's 127.0.0.1 is not allowed unless listed
+        self.assertEqual(self.get().status_code, 404)
+
+    @override_settings(REQUEST_METRICS={'ALLOWED_IPS': ['10.0.0.5']})
+    def test_allowed_ips(self):
+        response = self.get(REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertEqual(self.get().status_code, 404)
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def log_record(message='Something happened', line=10, exc_info=None):
+    return logging.LogRecord('tests', logging.ERROR, __file__, line, message, None, exc_info)
+
+
+class LoggingPipelineTests(SimpleTestCase):
+
+    def queue_handler(self, listener=False, **options):
+        handler = AsyncQueueHandler(**options)
+        self.addCleanup(handler.close)
+        if not listener:
+            # leave the records on the queue to look at
+            handler._ensure_listener = lambda: None
+        return handler
+
+    def queued(self, handler):
+        return [handler.queue.get_nowait().getMessage() for _ in range(handler.queue.qsize())]
+
+    def test_drop_newest(self):
+        handler = self.queue_handler(maxsize=2, sample_burst=0)
+        for message in 'abcd':
+            handler.emit(log_record(message))
+        self.assertEqual((self.queued(handler), handler.dropped), (['a', 'b'], 2))
+        handler.emit(log_record('e'))
+        self.assertEqual(self.queued(handler), ['Log queue full, dropped 2 records', 'e'])
+        self.assertEqual(handler.dropped, 0)
+
+    def test_drop_oldest(self):
+        handler = self.queue_handler(maxsize=2, drop_policy='drop_oldest', sample_burst=0)
+        for message in 'abcd':
+            handler.emit(log_record(message))
+        self.assertEqual((self.queued(handler), handler.dropped), (['c', 'd'], 2))
+        handler.emit(log_record('e'))
+        self.assertEqual(self.queued(handler), ['Log queue full, dropped 2 records', 'e'])
+
+    def test_invalid_drop_policy(self):
+        with self.assertRaises(ValueError):
+            AsyncQueueHandler(drop_policy='block')
+
+    def test_sampling(self):
+        sampler = LogSampler(burst=2, window=60)
+        with mock.patch('backend.log.time.monotonic', return_value=100):
+            self.assertEqual([sampler.allow(log_record()) for _ in range(4)], [0, 0, None, None])
+            # another call site has its own budget
+            self.assertEqual(sampler.allow(log_record(line=20)), 0)
+        with mock.patch('backend.log.time.monotonic', return_value=160):
+            self.assertEqual(sampler.allow(log_record()), 2)
+        self.assertEqual(LogSampler(burst=0, window=60).allow(log_record()), 0)
+
+    def test_listener_writes_records_with_request_context(self):
+        target = ListHandler()
+        handler = self.queue_handler(listener=True, sample_burst=0)
+        handler.targets = [target]
+
+        def view(request):
+            request.resolver_match = resolve(reverse('metrics'))
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                handler.emit(log_record('failed', exc_info=sys.exc_info()))
+            return HttpResponse()
+
+        request = RequestFactory().get('/', HTTP_X_REQUEST_ID='abc123')
+        response = RequestLogContextMiddleware(view)(request)
+        self.assertEqual(response['X-Request-ID'], 'abc123')
+        handler.emit(log_record('outside'))
+        handler.close()
+
+        first, second = target.records
+        self.assertEqual((first.request_id, first.route, first.getMessage()), ('abc123', 'metrics', 'failed'))
+        self.assertIsNone(first.exc_info)
+        self.assertIn('ZeroDivisionError', first.exc_text)
+        self.assertEqual((second.request_id, second.route), (None, None))
+
+    def test_django_request_records_carry_the_request(self):
+        # logged by the handler after the middleware has returned
+        handler = self.queue_handler(sample_burst=0)
+        logger = logging.getLogger('django.request')
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        response = self.client.get(reverse('metrics'), HTTP_X_REQUEST_ID='abc123')
+        self.assertEqual(response.status_code, 404)
+
+        record = handler.queue.get_nowait()
+        self.assertEqual((record.name, record.status_code), ('django.request', 404))
+        self.assertEqual((record.request_id, record.route), ('abc123', 'metrics'))
+        self.assertNotIn('request', record.__dict__)
+
+    def test_new_request_ids(self):
+        response = RequestLogContextMiddleware(lambda request: HttpResponse())(RequestFactory().get('/'))
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+    def test_json_formatter(self):
+        record = log_record('failed')
+        record.request_id, record.route, record.suppressed, record.status_code = 'abc123', 'metrics', 3, 500
+        record.exc_text = 'Traceback ...'
+        data = json.loads(JsonFormatter().format(record))
+        self.assertEqual(data, {
+            'time': data['time'], 'level': 'ERROR', 'logger': 'tests', 'message': 'failed',
+            'request_id': 'abc123', 'route': 'metrics', 'suppressed': 3, 'status_code': 500,
+            'exception': 'Traceback ...',
+        })
+        self.assertRegex(data['time'], r'^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{3}Z$')
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 # media file
 from django.conf import settings
 from django.conf.urls.static import static
@@ -8,7 +10,9 @@ from django.conf.urls.static import static
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('user/', include("user_auth.urls")),
-    path('employee/', include("employee.urls"))
+    path('employee/', include("employee.urls")),
+    path('jobs/', include("jobs.urls")),
+    path('internal/metrics/', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
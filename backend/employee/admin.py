@@ -1,8 +1,113 @@
+"""
+Admin for the form and employee (EAV) tables.
+
+``EmployeeField`` runs to millions of rows, so the changelists here never
+count a whole table (``EstimatedCountPaginator``), load the related objects
+they display in the page query (``list_select_related``), and edit foreign
+keys with raw id or autocomplete widgets instead of ``<select>`` lists of
+every row.
+"""
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# model
 from .models import Employee, EmployeeField, FormField, FormTemplate
 
-# Register your models here.
-admin.site.register(Employee)
-admin.site.register(EmployeeField)
-admin.site.register(FormField)
-admin.site.register(FormTemplate)
\ No newline at end of file
+
+# filtered changelists count at most this many rows
+COUNT_LIMIT = 10000
+
+
+def estimated_rows(queryset):
+    """The planner's row estimate for the queryset's table (Postgres only), else ``None``."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    # -1 until the table is first analyzed
+    return row[0] if row is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts a large table in full.
+
+    An unfiltered list of a large table uses the planner's estimate; other
+    lists are counted up to ``COUNT_LIMIT`` rows, so past that the last pages
+    are not linked.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_rows(queryset)
+            if estimate is not None and estimate > COUNT_LIMIT:
+                return estimate
+        return queryset[:COUNT_LIMIT].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # skips the unfiltered COUNT(*) shown next to a filtered result count
+    show_full_result_count = False
+
+
+class FormFieldInline(admin.TabularInline):
+    model = FormField
+    fields = ('label', 'field_type', 'required', 'order', 'options', 'retired_at')
+    ordering = ('order', 'id')
+    extra = 0
+
+
+@admin.register(FormTemplate)
+class FormTemplateAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'created_at', 'updated_at')
+    search_fields = ('name',)
+    ordering = ('-created_at', '-id')
+    inlines = [FormFieldInline]
+
+
+@admin.register(FormField)
+class FormFieldAdmin(LargeTableAdmin):
+    list_display = ('id', 'label', 'form_template', 'field_type', 'required', 'order', 'retired_at')
+    list_select_related = ('form_template',)
+    list_filter = ('field_type',)
+    search_fields = ('label',)
+    autocomplete_fields = ('form_template',)
+
+
+class EmployeeFieldInline(admin.TabularInline):
+    """An employee's values; fields are fixed by its template, so only values are editable."""
+    model = EmployeeField
+    fields = ('form_field', 'value')
+    readonly_fields = ('form_field',)
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('form_field').order_by('form_field__order', 'id')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Employee)
+class EmployeeAdmin(LargeTableAdmin):
+    list_display = ('id', 'form_template', 'created_at', 'updated_at')
+    list_select_related = ('form_template',)
+    autocomplete_fields = ('form_template',)
+    inlines = [EmployeeFieldInline]
+
+
+@admin.register(EmployeeField)
+class EmployeeFieldAdmin(LargeTableAdmin):
+    list_display = ('id', 'employee', 'form_field', 'value')
+    list_select_related = ('employee', 'form_field')
+    raw_id_fields = ('employee', 'form_field')
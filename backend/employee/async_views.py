@@ -0,0 +1,176 @@
+"""
+Async versions of the read endpoints, for serving under ASGI.
+
+Under ASGI every sync view costs a hop onto Django's single thread-sensitive
+executor. These views stay on the event loop: authentication is token claims
+only (``ClaimsJWTAuthentication`` on safe methods), queries go through the
+async ORM and the few blocking pieces run on ``employee.blocking``'s pool.
+Responses match the sync views.
+
+``employee.urls`` routes GETs here when ``EMPLOYEE_ASYNC_VIEWS['ENABLED']`` is
+set; writes on the same URLs still go to the sync DRF views.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.utils.encoders import JSONEncoder
+
+# model
+from .models import EmployeeDocument
+
+# auth
+from user_auth.authentication import ClaimsJWTAuthentication
+
+# services
+from .cache import schema_cache, version_stamp
+from .conditional import (
+    apage_validators, atemplate_version, is_conditional, not_modified, set_validators,
+    template_list_validators, template_validators,
+)
+from .documents import adocument_values
+from .pagination import InvalidCursor, apaginate_keyset, parse_page_size
+from .queries import EmployeeQueryError, apaginate_sorted, filter_employees, parse_employee_query
+from .views import _template_list_queryset
+
+
+def _response(data, status_code=status.HTTP_200_OK):
+    # DRF's encoder and compact separators, so bodies match the sync views byte for byte
+    return JsonResponse(
+        data, status=status_code, encoder=JSONEncoder, safe=False,
+        json_dumps_params={'separators': (',', ':')},
+    )
+
+
+class AsyncReadView(View):
+    """Base for async GET views authenticated from the token claims."""
+
+    http_method_names = ['get', 'head', 'options']
+
+    async def dispatch(self, request, *args, **kwargs):
+        authenticator = ClaimsJWTAuthentication()
+        try:
+            result = authenticator.authenticate(request)
+            if result is None:
+                raise NotAuthenticated()
+        except APIException as e:
+            detail = e.detail if isinstance(e.detail, dict) else {'detail': e.detail}
+            response = _response(detail, status_code=status.HTTP_401_UNAUTHORIZED)
+            response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+            return response
+        request.user, request.auth = result
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncFormTemplateView(AsyncReadView):
+
+    async def get(self, request, template_id=None):
+        """Async ``FormTemplateView.get``: one template's schema or a page of templates."""
+        if template_id:
+            if is_conditional(request):
+                version = await atemplate_version(template_id)
+                if version is None:
+                    return _response({"error": "Form template not found"}, status_code=status.HTTP_404_NOT_FOUND)
+                response = not_modified(request, *template_validators(template_id, version))
+                if response is not None:
+                    return response
+            schema = await schema_cache.aget(template_id)
+            if schema is None:
+                return _response({"error": "Form template not found"}, status_code=status.HTTP_404_NOT_FOUND)
+            return set_validators(
+                _response(schema), *template_validators(template_id, version_stamp(schema['updated_at']))
+            )
+
+        name_prefix = request.GET.get('q')
+        cursor = request.GET.get('cursor')
+        try:
+            page_size = parse_page_size(request.GET.get('limit'))
+            queryset = _template_list_queryset(name_prefix)
+            if is_conditional(request):
+                response = not_modified(request, *await apage_validators(queryset, name_prefix, cursor, page_size))
+                if response is not None:
+                    return response
+            templates, next_cursor = await apaginate_keyset(queryset, cursor=cursor, page_size=page_size)
+        except InvalidCursor as e:
+            return _response({"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+
+        templates_data = [{
+            'id': template.id,
+            'name': template.name,
+            'description': template.description,
+            'fields_count': template.fields_count,
+            'created_at': template.created_at
+        } for template in templates]
+        return set_validators(
+            _response({'results': templates_data, 'next_cursor': next_cursor}),
+            *template_list_validators(
+                name_prefix, cursor, page_size,
+                [(template.id, template.updated_at) for template in templates], next_cursor is not None,
+            )
+        )
+
+
+class AsyncEmployeeListView(AsyncReadView):
+
+    async def get(self, request, template_id):
+        """Async ``EmployeeListView.get``."""
+        schema = await schema_cache.aget(template_id)
+        if schema is None:
+            return _response({"error": "Form template not found"}, status_code=status.HTTP_404_NOT_FOUND)
+
+        try:
+            predicates, sort = parse_employee_query(schema, request.GET)
+            page_size = parse_page_size(request.GET.get('limit'))
+            queryset = filter_employees(schema, predicates)
+            cursor = request.GET.get('cursor')
+            if sort is None:
+                employees, next_cursor = await apaginate_keyset(queryset, cursor=cursor, page_size=page_size)
+            else:
+                employees, next_cursor = await apaginate_sorted(queryset, sort, cursor=cursor, page_size=page_size)
+        except (EmployeeQueryError, InvalidCursor) as e:
+            return _response({"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+
+        values = await adocument_values([employee.id for employee in employees])
+        return _response({
+            'results': [{
+                'id': employee.id,
+                'values': values.get(employee.id, {}),
+                'created_at': employee.created_at,
+                'updated_at': employee.updated_at
+            } for employee in employees],
+            'next_cursor': next_cursor
+        })
+
+
+class AsyncEmployeeDetailView(AsyncReadView):
+
+    async def get(self, request, employee_id):
+        """Async ``EmployeeDetailView.get``."""
+        document = await EmployeeDocument.objects.filter(employee_id=employee_id).afirst()
+        if document is None:
+            if not await adocument_values([employee_id]):
+                return _response({"error": "Employee not found"}, status_code=status.HTTP_404_NOT_FOUND)
+            document = await EmployeeDocument.objects.aget(employee_id=employee_id)
+        return _response({
+            'id': document.employee_id,
+            'form_template': document.form_template_id,
+            'values': document.data,
+            'updated_at': document.updated_at
+        })
+
+
+def split_by_method(read_view, write_view):
+    """
+    One async view sending safe methods to ``read_view`` and the rest to the
+    sync ``write_view``.
+    """
+    write_view = sync_to_async(write_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await read_view(request, *args, **kwargs)
+        return await write_view(request, *args, **kwargs)
+
+    return csrf_exempt(view)
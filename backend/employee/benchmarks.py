@@ -0,0 +1,253 @@
+"""
+Endpoint benchmark suite.
+
+``generate_dataset`` fills the database with synthetic templates x fields x
+employees; ``run_suite`` drives every endpoint in ``ENDPOINTS`` in-process
+(Django test client, or the async client for ASGI) and measures req/s,
+latency percentiles and queries per request. ``compare`` checks a run against
+a saved baseline. The ``bench_endpoints`` command ties them together and
+writes the report as JSON.
+
+Requests are sent one at a time after a warm-up, so the numbers describe the
+per-request cost with warm process-local caches, not behaviour under
+concurrency (see ``bench_servers`` for that).
+"""
+import asyncio
+import itertools
+import time
+from datetime import timedelta
+
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+
+# simple jwt
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from user_auth.models import User
+
+from .cache import schema_cache
+from .services import clean_template_payload, create_form_templates
+from .submissions import create_employees, validate_submissions
+
+
+BENCH_PASSWORD = 'bench-password-123'
+
+# field types cycled through by the synthetic templates
+FIELD_TYPES = ('text', 'number', 'date', 'email', 'text')
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def _template_payload(name, field_count):
+    return {
+        'name': name,
+        'description': f'{field_count} synthetic fields',
+        'fields': [{
+            'label': f'Field {i + 1}',
+            'field_type': FIELD_TYPES[i % len(FIELD_TYPES)],
+            'required': i == 0,
+            'order': i + 1,
+        } for i in range(field_count)],
+    }
+
+
+def _record(schema, i):
+    values = {
+        'text': f'Employee {i} Rajeev',
+        'number': str(1000 + i),
+        'date': f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+        'email': f'employee{i}@example.com',
+    }
+    return {field['label']: values[field['field_type']] for field in schema['fields']}
+
+
+def generate_dataset(templates=5, fields=10, employees=1000, batch_size=1000):
+    """
+    Create the bench user, ``templates`` templates of ``fields`` fields and
+    ``employees`` employees per template. Returns the ids the suite needs.
+    """
+    user = User.objects.create_user(
+        username='bench', email='bench@example.invalid', password=BENCH_PASSWORD,
+        first_name='Bench', last_name='User',
+    )
+    created = create_form_templates([
+        clean_template_payload(_template_payload(f'Bench template {t}', fields)) for t in range(templates)
+    ])
+    template_ids = [template.id for template, _ in created]
+    employee_ids = []
+    for template_id in template_ids:
+        schema = schema_cache.get(template_id)
+        for start in range(0, employees, batch_size):
+            records = [_record(schema, i) for i in range(start, min(employees, start + batch_size))]
+            valid, _ = validate_submissions(schema, records)
+            employee_ids.extend(employee_id for _, employee_id in create_employees(schema, valid))
+    return {
+        'user_id': user.id,
+        'template_ids': template_ids,
+        'employee_ids': employee_ids,
+        'fields': fields,
+    }
+
+
+# name -> callable(dataset, i) returning (method, path, data); data is sent as JSON
+ENDPOINTS = {
+    'user.signup': lambda d, i: ('post', '/user/signup/', {
+        'username': f'bench-signup-{i}', 'email': f'bench-signup-{i}@example.invalid',
+        'password': BENCH_PASSWORD, 'first_name': 'Bench', 'last_name': 'Signup',
+    }),
+    'user.login': lambda d, i: ('post', '/user/login/', {
+        'email': 'bench@example.invalid', 'password': BENCH_PASSWORD,
+    }),
+    'user.token_refresh': lambda d, i: ('post', '/user/api/token/refresh/', {'refresh': d['refresh']}),
+    'user.details.get': lambda d, i: ('get', '/user/details/', None),
+    'user.details.put': lambda d, i: ('put', '/user/details/', {'first_name': f'Bench {i % 2}'}),
+    'employee.forms.create': lambda d, i: (
+        'post', '/employee/forms/', _template_payload(f'Bench created {i}', d['fields'])
+    ),
+    'employee.forms.list': lambda d, i: ('get', '/employee/forms/?limit=50', None),
+    'employee.forms.detail': lambda d, i: (
+        'get', f"/employee/forms/{d['template_ids'][i % len(d['template_ids'])]}/", None
+    ),
+    'employee.submit': lambda d, i: (
+        'post', f"/employee/forms/{d['template_ids'][0]}/submit/", {'values': d['record']}
+    ),
+    'employee.list': lambda d, i: (
+        'get', f"/employee/forms/{d['template_ids'][i % len(d['template_ids'])]}/employees/", None
+    ),
+    'employee.list.filtered': lambda d, i: (
+        'get', f"/employee/forms/{d['template_ids'][0]}/employees/?Field%202__gte=1100&sort=-Field%202", None
+    ),
+    'employee.detail': lambda d, i: (
+        'get', f"/employee/employees/{d['employee_ids'][i % len(d['employee_ids'])]}/", None
+    ),
+    'employee.search': lambda d, i: ('get', f'/employee/search/?q=employee+{i % 100}', None),
+    'employee.export': lambda d, i: ('get', f"/employee/forms/{d['template_ids'][0]}/export/", None),
+}
+
+
+def _prepare(dataset):
+    user = User.objects.get(pk=dataset['user_id'])
+    access = AccessToken.for_user(user)
+    # long enough for any run
+    access.set_exp(lifetime=timedelta(hours=12))
+    schema = schema_cache.get(dataset['template_ids'][0])
+    return {
+        **dataset,
+        'access': str(access),
+        'refresh': str(RefreshToken.for_user(user)),
+        'record': _record(schema, 0),
+    }
+
+
+def _summary(latencies, queries, statuses):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        'requests': len(latencies),
+        'req_per_s': round(len(latencies) / total, 2) if total else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'queries': round(sum(queries) / len(queries), 2) if queries else 0,
+        'max_queries': max(queries, default=0),
+        'status': {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def _request_kwargs(dataset, data):
+    kwargs = {'headers': {'Authorization': f"Bearer {dataset['access']}"}}
+    if data is not None:
+        kwargs.update(data=data, content_type='application/json')
+    return kwargs
+
+
+def _run_sync(dataset, build, requests, warmup, counter):
+    client = Client()
+    latencies, queries, statuses = [], [], {}
+    for n in range(warmup + requests):
+        method, path, data = build(dataset, next(counter))
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, **_request_kwargs(dataset, data))
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        if n >= warmup:
+            latencies.append(elapsed)
+            queries.append(len(captured))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return latencies, queries, statuses
+
+
+async def _run_async(dataset, build, requests, warmup, counter):
+    client = AsyncClient()
+    latencies, statuses = [], {}
+    for n in range(warmup + requests):
+        method, path, data = build(dataset, next(counter))
+        started = time.perf_counter()
+        response = await getattr(client, method)(path, **_request_kwargs(dataset, data))
+        if response.streaming:
+            [chunk async for chunk in response.streaming_content]
+        elapsed = time.perf_counter() - started
+        if n >= warmup:
+            latencies.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return latencies, statuses
+
+
+def run_suite(dataset, names=None, requests=200, warmup=20, asgi=False, progress=None):
+    """
+    Benchmark ``names`` (default: every endpoint) and return ``{name: summary}``.
+
+    Query counts are only captured with the sync client; under ``asgi`` the
+    queries run on other threads and ``queries`` is reported as ``None``.
+    """
+    dataset = _prepare(dataset)
+    results = {}
+    for name in names or ENDPOINTS:
+        build = ENDPOINTS[name]
+        counter = itertools.count()
+        if asgi:
+            latencies, statuses = asyncio.run(_run_async(dataset, build, requests, warmup, counter))
+            summary = _summary(latencies, [], statuses)
+            summary['queries'] = summary['max_queries'] = None
+        else:
+            summary = _summary(*_run_sync(dataset, build, requests, warmup, counter))
+        results[name] = summary
+        if progress is not None:
+            progress(name, summary)
+    return results
+
+
+def compare(results, baseline, tolerance=0.10):
+    """
+    Compare endpoint summaries with a baseline run.
+
+    Returns ``[(name, req_per_s_change, p99_change, queries_change, regressed)]``;
+    changes are fractions (``0.1`` is 10% more), queries an absolute
+    difference. An endpoint regressed when its req/s dropped or its p99 grew
+    by more than ``tolerance``, or it issues more queries.
+    """
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        rate = _change(current['req_per_s'], previous['req_per_s'])
+        p99 = _change(current['p99_ms'], previous['p99_ms'])
+        queries = (
+            current['queries'] - previous['queries']
+            if current['queries'] is not None and previous['queries'] is not None else None
+        )
+        regressed = rate < -tolerance or p99 > tolerance or (queries or 0) > 0
+        rows.append((name, rate, p99, queries, regressed))
+    return rows
+
+
+def _change(current, previous):
+    return (current - previous) / previous if previous else 0.0
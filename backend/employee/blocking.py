@@ -0,0 +1,62 @@
+"""
+Blocking work for the async views.
+
+Async views use the async ORM directly. What is left blocking (compiling a
+schema on a cache miss, building missing documents, the shared cache client)
+runs on a bounded thread pool of its own through ``run_blocking`` instead of
+the single thread-sensitive executor Django serialises sync calls on. Each
+call is wrapped like a request, so the worker thread's connection is closed
+or reused according to ``CONN_MAX_AGE``.
+
+Settings (all optional)::
+
+    EMPLOYEE_ASYNC_VIEWS = {
+        'ENABLED': False,          # serve read endpoints with the async views
+        'BLOCKING_WORKERS': 8,     # threads for run_blocking
+    }
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+
+DEFAULTS = {
+    'ENABLED': False,
+    'BLOCKING_WORKERS': 8,
+}
+
+
+def async_views_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'EMPLOYEE_ASYNC_VIEWS', {})}[name]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_blocking_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=async_views_setting('BLOCKING_WORKERS'), thread_name_prefix='employee-blocking'
+            )
+        return _pool
+
+
+def _call(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run sync ``func`` on the blocking pool and await its result."""
+    return await sync_to_async(_call, thread_sensitive=False, executor=get_blocking_pool())(
+        func, args, kwargs
+    )
@@ -0,0 +1,252 @@
+"""
+Cache of compiled form template schemas.
+
+A compiled schema is the detail payload of a template: its own columns plus
+its fields in display order. Schemas are kept in a process-local LRU and,
+optionally, in a shared Django cache so other workers can reuse them.
+
+Entries are stamped with the template's ``updated_at``. ``employee.signals``
+calls ``invalidate`` whenever a template or one of its fields is written,
+which drops the local copy and the shared version key; every worker then
+notices the missing version and reloads from the database. Those signals only
+run in the process that made the write, so without a shared tier a local hit
+is checked against the template's ``updated_at`` (one indexed single-row
+query) before it is served.
+
+Settings (all optional)::
+
+    EMPLOYEE_SCHEMA_CACHE = {
+        'MAX_ENTRIES': 1024,          # local LRU size
+        'SHARED_CACHE_ALIAS': None,   # e.g. 'default' to share across workers
+        'TIMEOUT': 3600,              # shared entry lifetime in seconds
+    }
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from backend.replicas import use_primary
+
+# model
+from .models import FormTemplate
+from .blocking import run_blocking
+
+
+DEFAULTS = {
+    'MAX_ENTRIES': 1024,
+    'SHARED_CACHE_ALIAS': None,
+    'TIMEOUT': 3600,
+}
+
+VERSION_KEY = 'employee:template-version:{}'
+SCHEMA_KEY = 'employee:template-schema:{}:{}'
+
+
+def version_stamp(updated_at):
+    return updated_at.isoformat()
+
+
+def _version_query(template_id):
+    return FormTemplate.objects.filter(id=template_id).values_list('updated_at', flat=True)
+
+
+def stored_version(template_id):
+    """The template's version in the database; ``None`` if it does not exist."""
+    # from the primary, like the schema it is compared with
+    with use_primary():
+        updated_at = _version_query(template_id).first()
+    return version_stamp(updated_at) if updated_at is not None else None
+
+
+async def astored_version(template_id):
+    """Async ``stored_version``."""
+    with use_primary():
+        updated_at = await _version_query(template_id).afirst()
+    return version_stamp(updated_at) if updated_at is not None else None
+
+
+def compile_template_schema(template_id):
+    """Load a template and its ordered fields; ``None`` if it does not exist."""
+    # from the primary: a lagging replica would be cached until the next write
+    with use_primary():
+        try:
+            template = FormTemplate.objects.get(id=template_id)
+        except FormTemplate.DoesNotExist:
+            return None
+        fields = list(template.fields.filter(retired_at__isnull=True).order_by('order', 'id'))
+    return template_schema(template, fields)
+
+
+def template_schema(template, fields):
+    """The schema of ``template`` with its active ``fields`` in display order."""
+    return {
+        'id': template.id,
+        'name': template.name,
+        'description': template.description,
+        'fields': [{
+            'id': field.id,
+            'label': field.label,
+            'field_type': field.field_type,
+            'required': field.required,
+            'order': field.order,
+            'options': field.options
+        } for field in fields],
+        'created_at': template.created_at,
+        'updated_at': template.updated_at
+    }
+
+
+class TemplateSchemaCache:
+    """
+    LRU of ``template_id -> (version, schema)`` with an optional shared tier.
+
+    Returned schemas are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries=DEFAULTS['MAX_ENTRIES'], shared_alias=None,
+                 timeout=DEFAULTS['TIMEOUT']):
+        self.max_entries = max_entries
+        self.shared_alias = shared_alias
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped on every invalidation so a load that raced with a write is
+        # not stored over the invalidation
+        self._generation = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULTS, **getattr(settings, 'EMPLOYEE_SCHEMA_CACHE', {})}
+        return cls(
+            max_entries=options['MAX_ENTRIES'],
+            shared_alias=options['SHARED_CACHE_ALIAS'],
+            timeout=options['TIMEOUT'],
+        )
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def get(self, template_id):
+        """Return the compiled schema for ``template_id`` or ``None``."""
+        version = self.current_version(template_id)
+        schema = self._hit(template_id, version)
+        if schema is None:
+            schema = self._load(template_id, version)
+        return schema
+
+    async def aget(self, template_id):
+        """``get`` for async views; without a shared tier only misses leave the event loop."""
+        if self.shared is not None:
+            return await run_blocking(self.get, template_id)
+        version = await astored_version(template_id)
+        schema = self._hit(template_id, version)
+        if schema is None:
+            schema = await run_blocking(self._load, template_id, version)
+        return schema
+
+    def current_version(self, template_id):
+        """
+        The version a cached schema must have to be served: the shared version
+        key, or the template's ``updated_at`` when there is no shared tier.
+        """
+        shared = self.shared
+        if shared is not None:
+            return shared.get(VERSION_KEY.format(template_id))
+        return stored_version(template_id)
+
+    def cached_version(self, template_id):
+        """
+        Version of the shared schema without loading it; ``None`` when it is not
+        cached or there is no shared tier, whose local copies may be stale.
+        """
+        shared = self.shared
+        return shared.get(VERSION_KEY.format(template_id)) if shared is not None else None
+
+    def invalidate(self, template_id):
+        with self._lock:
+            self._entries.pop(template_id, None)
+            self._generation += 1
+            self.invalidations += 1
+        shared = self.shared
+        if shared is not None:
+            shared.delete(VERSION_KEY.format(template_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+    def _hit(self, template_id, version):
+        if version is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(template_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(template_id)
+            self.hits += 1
+            return entry[1]
+
+    def _load(self, template_id, version):
+        shared = self.shared
+        if shared is not None and version is not None:
+            schema = shared.get(SCHEMA_KEY.format(template_id, version))
+            if schema is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self._store(template_id, version, schema)
+                return schema
+
+        with self._lock:
+            self.misses += 1
+            generation = self._generation
+        schema = compile_template_schema(template_id)
+        if schema is None:
+            with self._lock:
+                self._entries.pop(template_id, None)
+            return None
+
+        version = version_stamp(schema['updated_at'])
+        if not self._store(template_id, version, schema, generation):
+            return schema
+        if shared is not None:
+            shared.set_many({
+                VERSION_KEY.format(template_id): version,
+                SCHEMA_KEY.format(template_id, version): schema,
+            }, self.timeout)
+        return schema
+
+    def _store(self, template_id, version, schema, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._entries[template_id] = (version, schema)
+            self._entries.move_to_end(template_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+
+schema_cache = TemplateSchemaCache.from_settings()
@@ -0,0 +1,103 @@
+"""
+Conditional GET for form templates.
+
+Validators come from ``FormTemplate.updated_at``; a field write bumps its
+template's ``updated_at`` (``employee.signals``), so it covers the fields too.
+They are looked up without building the payload:
+
+- detail: the version in the shared schema cache, or the template's
+  ``updated_at`` in one narrow query when it is not there. Without a shared
+  tier the query always runs: a process-local copy may predate a write made
+  by another worker;
+- list: ``(id, updated_at)`` of the rows on the requested page (and whether
+  there is a next one) in one narrow query, so a create, edit or delete that
+  shows on the page changes the ETag. ``Last-Modified`` is the newest
+  ``updated_at`` on the page.
+
+Requests without ``If-None-Match``/``If-Modified-Since`` skip the lookup and
+get validators computed from the payload they receive.
+"""
+import hashlib
+from datetime import datetime
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .blocking import run_blocking
+from .cache import astored_version, schema_cache, stored_version
+from .pagination import _keyset_queryset
+
+
+def is_conditional(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def _etag(*parts):
+    return '"{}"'.format(hashlib.sha256('|'.join(map(str, parts)).encode()).hexdigest()[:32])
+
+
+def template_validators(template_id, version):
+    """``(etag, last_modified)`` of a template at ``version`` (its ``version_stamp``)."""
+    return _etag('template', template_id, version), datetime.fromisoformat(version)
+
+
+def template_version(template_id):
+    """The template's current version, ``None`` if it does not exist."""
+    if schema_cache.shared is None:
+        return stored_version(template_id)
+    version = schema_cache.cached_version(template_id)
+    return version if version is not None else stored_version(template_id)
+
+
+async def atemplate_version(template_id):
+    """Async ``template_version``."""
+    if schema_cache.shared is None:
+        return await astored_version(template_id)
+    return await run_blocking(template_version, template_id)
+
+
+def template_list_validators(name_prefix, cursor, page_size, rows, has_more):
+    """``(etag, last_modified)`` of a page of templates from its ``(id, updated_at)`` rows."""
+    etag = _etag(
+        'templates', name_prefix or '', cursor or '', page_size, has_more,
+        *(f'{pk}:{updated_at.isoformat()}' for pk, updated_at in rows),
+    )
+    return etag, max((updated_at for _, updated_at in rows), default=None)
+
+
+def _page_keys(queryset, cursor, page_size):
+    return _keyset_queryset(queryset, cursor, page_size).values_list('id', 'updated_at')
+
+
+def page_validators(queryset, name_prefix, cursor, page_size):
+    """Validators of the list page the request asks for, found with one narrow query."""
+    rows = list(_page_keys(queryset, cursor, page_size))
+    return template_list_validators(name_prefix, cursor, page_size, rows[:page_size], len(rows) > page_size)
+
+
+async def apage_validators(queryset, name_prefix, cursor, page_size):
+    """Async ``page_validators``."""
+    rows = [row async for row in _page_keys(queryset, cursor, page_size)]
+    return template_list_validators(name_prefix, cursor, page_size, rows[:page_size], len(rows) > page_size)
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 (or 412) response when the request's preconditions hold, else ``None``."""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified is not None else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # browsers revalidate on every use; shared caches never store it
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
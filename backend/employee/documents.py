@@ -0,0 +1,135 @@
+"""
+Denormalized employee documents.
+
+``EmployeeDocument`` holds one row per employee with its values keyed by field
+label, so rendering a page of employees is a primary key lookup instead of an
+``Employee -> EmployeeField -> FormField`` join and pivot. Values of
+``EmployeeField.HIDDEN_TYPES`` fields are left out, so nothing served from a
+document can leak a password.
+
+Documents are written with the employee by ``employee.submissions`` and kept
+current by ``employee.signals`` as single values are saved or deleted. A
+label change or a removed field queues an ``employee.rebuild_documents`` job
+that re-keys the documents of its template; until it runs they show the old
+labels. The ``employee_documents`` command checks for drift and rebuilds.
+"""
+from django.db import transaction
+
+from backend.replicas import use_primary
+
+# model
+from jobs.models import Job
+from .models import Employee, EmployeeDocument, EmployeeField
+
+# services
+from jobs.registry import enqueue
+
+from .blocking import run_blocking
+
+
+def build_documents(employee_ids):
+    """Unsaved documents for ``employee_ids`` built from ``EmployeeField`` rows."""
+    documents = {
+        employee_id: EmployeeDocument(employee_id=employee_id, form_template_id=template_id, data={})
+        for employee_id, template_id in Employee.objects.filter(id__in=employee_ids)
+        .values_list('id', 'form_template_id')
+    }
+    # retired fields keep their values but leave the documents
+    rows = EmployeeField.objects.filter(
+        employee_id__in=employee_ids, form_field__retired_at__isnull=True
+    ).exclude(
+        form_field__field_type__in=EmployeeField.HIDDEN_TYPES
+    ).values_list('employee_id', 'form_field__label', 'value')
+    for employee_id, label, value in rows:
+        documents[employee_id].data[label] = value
+    return list(documents.values())
+
+
+def save_documents(documents):
+    """Insert or overwrite documents in one statement."""
+    EmployeeDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['employee'],
+        update_fields=['form_template', 'data', 'updated_at'],
+    )
+
+
+def refresh_documents(employee_ids):
+    save_documents(build_documents(employee_ids))
+
+
+def rebuild_template_documents(template_id, batch_size=2000):
+    """Rebuild every document of a template, e.g. after a label change."""
+    employee_ids = Employee.objects.filter(form_template_id=template_id).values_list('id', flat=True)
+    batch = []
+    for employee_id in employee_ids.order_by('id').iterator(chunk_size=batch_size):
+        batch.append(employee_id)
+        if len(batch) == batch_size:
+            refresh_documents(batch)
+            batch = []
+    if batch:
+        refresh_documents(batch)
+
+
+def queue_template_rebuild(template_id):
+    """
+    Queue ``employee.rebuild_documents`` for a template unless a run is
+    already waiting. A run that has started may have read the old labels, so
+    it does not count.
+    """
+    waiting = Job.objects.filter(
+        name='employee.rebuild_documents', status='queued', payload__template_id=template_id
+    )
+    if not waiting.exists():
+        enqueue('employee.rebuild_documents', {'template_id': template_id})
+
+
+def set_document_value(employee_id, label, value):
+    """Set (or with ``value=None`` remove) one label in an employee's document."""
+    with transaction.atomic():
+        document = EmployeeDocument.objects.select_for_update().filter(employee_id=employee_id).first()
+        if document is None:
+            refresh_documents([employee_id])
+            return
+        if value is None:
+            document.data.pop(label, None)
+        else:
+            document.data[label] = value
+        document.save(update_fields=['data', 'updated_at'])
+
+
+def document_values(employee_ids):
+    """
+    Return ``{employee_id: {label: value}}`` served from documents.
+
+    Employees whose document is missing are built and stored on the way.
+    """
+    values = dict(
+        EmployeeDocument.objects.filter(employee_id__in=employee_ids).values_list('employee_id', 'data')
+    )
+    missing = [employee_id for employee_id in employee_ids if employee_id not in values]
+    if missing:
+        values.update(_store_missing(missing))
+    return values
+
+
+async def adocument_values(employee_ids):
+    """Async ``document_values``; missing documents are built on the blocking pool."""
+    values = {
+        employee_id: data
+        async for employee_id, data in EmployeeDocument.objects.filter(employee_id__in=employee_ids)
+        .values_list('employee_id', 'data')
+    }
+    missing = [employee_id for employee_id in employee_ids if employee_id not in values]
+    if missing:
+        values.update(await run_blocking(_store_missing, missing))
+    return values
+
+
+def _store_missing(employee_ids):
+    # built from the primary since they are written back
+    with use_primary():
+        documents = build_documents(employee_ids)
+    save_documents(documents)
+    return {document.employee_id: document.data for document in documents}
@@ -0,0 +1,91 @@
+"""
+Streaming export of a template's employees as CSV or NDJSON.
+
+``EmployeeField`` rows are read ordered by ``employee_id`` through
+``QuerySet.iterator`` (a server-side cursor on Postgres) and pivoted into one
+record per employee inside a generator, so memory stays flat however many
+employees the template has. Values of ``EmployeeField.HIDDEN_TYPES`` fields
+are not exported.
+"""
+import csv
+import json
+
+# model
+from .models import EmployeeField
+
+
+# rows fetched from the cursor per round trip
+EXPORT_CHUNK_SIZE = 5000
+
+
+class _Echo:
+    """File-like object that hands back what ``csv.writer`` writes."""
+
+    def write(self, value):
+        return value
+
+
+def iter_employee_records(schema, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield ``(employee_id, {field_id: value})`` for every employee of the
+    template described by ``schema``, in ``employee_id`` order.
+
+    Employees without any exported value are not yielded.
+    """
+    rows = (
+        _exported_values(schema)
+        .order_by('employee_id')
+        .values_list('employee_id', 'form_field_id', 'value')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    current_id = None
+    values = {}
+    for employee_id, field_id, value in rows:
+        if employee_id != current_id:
+            if current_id is not None:
+                yield current_id, values
+            current_id = employee_id
+            values = {}
+        values[field_id] = value
+    if current_id is not None:
+        yield current_id, values
+
+
+def count_employee_records(schema):
+    """Number of records ``iter_employee_records`` yields."""
+    return _exported_values(schema).values('employee_id').distinct().count()
+
+
+def _exported_values(schema):
+    return EmployeeField.objects.filter(form_field_id__in=[field_id for field_id, _ in _columns(schema)])
+
+
+def _columns(schema):
+    return [
+        (field['id'], field['label']) for field in schema['fields']
+        if field['field_type'] not in EmployeeField.HIDDEN_TYPES
+    ]
+
+
+def stream_csv(schema, chunk_size=EXPORT_CHUNK_SIZE):
+    columns = _columns(schema)
+    writer = csv.writer(_Echo())
+    yield writer.writerow(['employee_id'] + [label for _, label in columns])
+    for employee_id, values in iter_employee_records(schema, chunk_size):
+        yield writer.writerow([employee_id] + [values.get(field_id, '') for field_id, _ in columns])
+
+
+def stream_ndjson(schema, chunk_size=EXPORT_CHUNK_SIZE):
+    columns = _columns(schema)
+    for employee_id, values in iter_employee_records(schema, chunk_size):
+        record = {'employee_id': employee_id}
+        for field_id, label in columns:
+            record[label] = values.get(field_id)
+        yield json.dumps(record) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv', 'csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson', 'ndjson'),
+}
@@ -0,0 +1,145 @@
+"""
+Streaming CSV import of employees for one form template.
+
+The file is parsed row by row; rows are validated and written in chunks with
+the same bulk path as ``employee.submissions``. Each chunk is committed
+together with the progress counters on its ``EmployeeImport`` row, so an
+interrupted import can be resumed from the last committed chunk.
+"""
+import csv
+import time
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+# model
+from .models import EmployeeImport
+from .submissions import create_employees, validate_submissions
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# row errors kept on the import record; the rest are only counted
+MAX_STORED_ERRORS = 100
+
+# header written by employee.export; ignored so exports can be re-imported
+IGNORED_COLUMNS = ('employee_id',)
+
+
+class CSVImportError(ValueError):
+    """Raised when a file cannot be imported at all (bad header, wrong template)."""
+
+
+def map_headers(schema, headers):
+    """
+    Map CSV headers to field labels, matching case-insensitively.
+
+    Returns a list with the label for each column, or ``None`` for ignored
+    columns. Raises ``CSVImportError`` for unknown columns.
+    """
+    labels = {field['label'].strip().lower(): field['label'] for field in schema['fields']}
+    mapped = []
+    unknown = []
+    for header in headers:
+        key = (header or '').strip().lower()
+        if key in IGNORED_COLUMNS:
+            mapped.append(None)
+        elif key in labels:
+            mapped.append(labels[key])
+        else:
+            unknown.append(header)
+    if unknown:
+        raise CSVImportError(f"Unknown columns: {', '.join(unknown)}")
+    return mapped
+
+
+class EmployeeImporter:
+    """
+    Import CSV text lines into ``employee_import.form_template``.
+
+    ``progress`` is called after every committed chunk with a dict of
+    ``rows_processed``, ``rows_created``, ``error_count`` and ``rows_per_second``.
+    """
+
+    def __init__(self, schema, employee_import, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        if employee_import.form_template_id != schema['id']:
+            raise CSVImportError("Import belongs to a different form template")
+        self.schema = schema
+        self.employee_import = employee_import
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+    def run(self, lines):
+        employee_import = self.employee_import
+        if employee_import.status != 'running':
+            EmployeeImport.objects.filter(pk=employee_import.pk).update(status='running', updated_at=timezone.now())
+            employee_import.status = 'running'
+
+        reader = csv.reader(lines)
+        try:
+            labels = map_headers(self.schema, next(reader))
+        except StopIteration:
+            raise CSVImportError("The file is empty")
+
+        # skip what earlier runs already committed
+        row_number = employee_import.rows_processed
+        for _ in islice(reader, row_number):
+            pass
+
+        started = time.monotonic()
+        rows_this_run = 0
+        try:
+            while True:
+                chunk = list(islice(reader, self.chunk_size))
+                if not chunk:
+                    break
+                self._commit_chunk(chunk, labels, row_number)
+                row_number += len(chunk)
+                rows_this_run += len(chunk)
+                if self.progress:
+                    elapsed = time.monotonic() - started
+                    self.progress({
+                        'rows_processed': employee_import.rows_processed,
+                        'rows_created': employee_import.rows_created,
+                        'error_count': employee_import.error_count,
+                        'rows_per_second': rows_this_run / elapsed if elapsed else 0.0,
+                    })
+        except Exception:
+            EmployeeImport.objects.filter(pk=employee_import.pk).update(status='failed', updated_at=timezone.now())
+            employee_import.status = 'failed'
+            raise
+
+        EmployeeImport.objects.filter(pk=employee_import.pk).update(status='completed', updated_at=timezone.now())
+        employee_import.status = 'completed'
+        return employee_import
+
+    def _commit_chunk(self, chunk, labels, first_row):
+        records = [
+            {label: value for label, value in zip(labels, row) if label is not None}
+            for row in chunk
+        ]
+        valid, errors = validate_submissions(self.schema, records)
+        # report 1-based data row numbers rather than chunk offsets
+        for error in errors:
+            error['row'] = first_row + error.pop('index') + 1
+
+        employee_import = self.employee_import
+        room = MAX_STORED_ERRORS - len(employee_import.errors)
+        stored_errors = employee_import.errors + errors[:max(room, 0)]
+
+        with transaction.atomic():
+            created = create_employees(self.schema, valid)
+            EmployeeImport.objects.filter(pk=employee_import.pk).update(
+                rows_processed=F('rows_processed') + len(chunk),
+                rows_created=F('rows_created') + len(created),
+                error_count=F('error_count') + len(errors),
+                errors=stored_errors,
+                updated_at=timezone.now(),
+            )
+
+        employee_import.rows_processed += len(chunk)
+        employee_import.rows_created += len(created)
+        employee_import.error_count += len(errors)
+        employee_import.errors = stored_errors
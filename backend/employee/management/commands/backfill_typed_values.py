@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from employee.models import EmployeeField
+
+
+class Command(BaseCommand):
+    help = "Fill the typed value columns of EmployeeField rows written before they existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Recompute every row, not only rows whose typed columns are all empty",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = EmployeeField.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(
+                value_number__isnull=True, value_date__isnull=True, value_text__isnull=True
+            ).exclude(form_field__field_type='password')
+
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(
+                queryset.filter(id__gt=last_id)
+                .select_related('form_field')
+                .only('id', 'value', 'form_field__field_type')
+                .order_by('id')[:batch_size]
+            )
+            if not batch:
+                break
+            for employee_field in batch:
+                employee_field.set_typed_values(employee_field.form_field.field_type)
+            with transaction.atomic():
+                EmployeeField.objects.bulk_update(
+                    batch, ['value_number', 'value_date', 'value_text']
+                )
+            last_id = batch[-1].id
+            updated += len(batch)
+            self.stdout.write(f"{updated} rows updated")
+
+        self.stdout.write(self.style.SUCCESS(f"Done, {updated} rows updated"))
@@ -0,0 +1,127 @@
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_databases, teardown_databases
+
+from employee.benchmarks import ENDPOINTS, compare, generate_dataset, run_suite
+from user_auth.login import outstanding_tokens
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every endpoint in-process against synthetic data and report req/s, "
+        "p50/p95/p99 latency and queries per request as JSON. Runs in a throwaway test "
+        "database of the configured engine (e.g. local SQLite or Postgres)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--templates', type=int, default=5)
+        parser.add_argument('--fields', type=int, default=10, help="Fields per template")
+        parser.add_argument('--employees', type=int, default=1000, help="Employees per template")
+        parser.add_argument('--requests', type=int, default=200, help="Measured requests per endpoint")
+        parser.add_argument('--warmup', type=int, default=20, help="Unmeasured requests per endpoint")
+        parser.add_argument('--endpoints', help=f"Comma separated subset of: {', '.join(ENDPOINTS)}")
+        parser.add_argument('--asgi', action='store_true', help="Use the async test client")
+        parser.add_argument('--output', help="Write the report to this JSON file")
+        parser.add_argument('--baseline', help="Compare with a report written by an earlier run")
+        parser.add_argument('--tolerance', type=float, default=0.10,
+                            help="Allowed req/s drop or p99 growth before a regression is reported")
+        parser.add_argument('--fail-on-regression', action='store_true')
+        parser.add_argument('--keepdb', action='store_true', help="Keep the test database between runs")
+
+    def handle(self, *args, **options):
+        names = options['endpoints'].split(',') if options['endpoints'] else list(ENDPOINTS)
+        unknown = [name for name in names if name not in ENDPOINTS]
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(unknown)}")
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            # the in-process clients send Host: testserver
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                report = self.run(names, options)
+        finally:
+            outstanding_tokens.flush()
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        if baseline is not None:
+            self.report_comparison(report, baseline, options)
+
+    def run(self, names, options):
+        scale = {
+            'templates': options['templates'],
+            'fields': options['fields'],
+            'employees': options['employees'],
+        }
+        started = time.perf_counter()
+        dataset = generate_dataset(**scale)
+        self.stdout.write(
+            f"Generated {len(dataset['employee_ids'])} employees in "
+            f"{time.perf_counter() - started:.1f}s on {connection.vendor}"
+        )
+
+        def progress(name, summary):
+            queries = '-' if summary['queries'] is None else f"{summary['queries']:g}"
+            self.stdout.write(
+                f"{name:<24} {summary['req_per_s']:>9.1f} req/s  "
+                f"p50 {summary['p50_ms']:>8.2f}  p95 {summary['p95_ms']:>8.2f}  "
+                f"p99 {summary['p99_ms']:>8.2f} ms  {queries:>6} queries  {summary['status']}"
+            )
+
+        endpoints = run_suite(
+            dataset, names, requests=options['requests'], warmup=options['warmup'],
+            asgi=options['asgi'], progress=progress,
+        )
+        return {
+            'meta': {
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'revision': _git_revision(),
+                'database': connection.vendor,
+                'client': 'asgi' if options['asgi'] else 'wsgi',
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'scale': scale,
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+            },
+            'endpoints': endpoints,
+        }
+
+    def report_comparison(self, report, baseline, options):
+        self.stdout.write(f"Compared with {options['baseline']} ({baseline['meta'].get('revision')}):")
+        rows = compare(report['endpoints'], baseline['endpoints'], options['tolerance'])
+        for name, rate, p99, queries, regressed in rows:
+            queries = '-' if queries is None else f"{queries:+g}"
+            self.stdout.write(
+                f"{name:<24} req/s {rate:>+7.1%}  p99 {p99:>+7.1%}  queries {queries:>6}"
+                + ("  REGRESSED" if regressed else "")
+            )
+        regressions = [row[0] for row in rows if row[4]]
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"Regressed: {', '.join(regressions)}")
@@ -0,0 +1,209 @@
+import asyncio
+import io
+import itertools
+import time
+import types
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import include, path
+from concurrent.futures import ThreadPoolExecutor
+
+# simple jwt
+from rest_framework_simplejwt.tokens import AccessToken
+
+from employee.benchmarks import percentile
+from employee.cache import schema_cache
+from employee.models import Employee, FormTemplate
+from employee.services import clean_template_payload, create_form_templates
+from employee.submissions import create_employees, validate_submissions
+from employee.urls import employee_urlpatterns
+from user_auth.models import User
+
+
+BENCH_EMAIL = 'bench-servers@example.invalid'
+
+# (name, handler, async read views)
+MODES = {
+    'wsgi': ('wsgi', False),
+    'asgi-sync': ('asgi', False),
+    'asgi': ('asgi', True),
+}
+
+
+def bench_urlconf(async_reads):
+    module = types.ModuleType(f'bench_urls_{"async" if async_reads else "sync"}')
+    module.urlpatterns = [path('employee/', include(employee_urlpatterns(async_reads)))]
+    return module
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput and latency percentiles of the read endpoints under WSGI "
+        "(thread pool) and ASGI (sync views, then async views) at a given number of "
+        "concurrent clients. Django's WSGI and ASGI handlers are driven in-process, so "
+        "HTTP parsing and sockets are not measured. Creates throwaway data in the "
+        "configured database and removes it afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default='wsgi,asgi-sync,asgi', help=f"Comma separated: {', '.join(MODES)}")
+        parser.add_argument('--concurrency', type=int, default=1000, help="Concurrent clients")
+        parser.add_argument('--requests', type=int, default=5000, help="Requests per mode")
+        parser.add_argument('--threads', type=int, default=32, help="WSGI server threads")
+        parser.add_argument('--employees', type=int, default=200, help="Employees in the throwaway template")
+
+    def handle(self, *args, **options):
+        template, employee_ids, user = self.create_data(options['employees'])
+        token = str(AccessToken.for_user(user))
+        paths = [
+            f'/employee/forms/{template.id}/',
+            '/employee/forms/?limit=20',
+            f'/employee/forms/{template.id}/employees/?limit=20',
+            f'/employee/employees/{employee_ids[0]}/',
+        ]
+        try:
+            for mode in options['modes'].split(','):
+                server, async_reads = MODES[mode]
+                with override_settings(
+                    ROOT_URLCONF=bench_urlconf(async_reads),
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                ):
+                    if server == 'wsgi':
+                        send, cleanup = self.wsgi_sender(token, options['threads'])
+                    else:
+                        send, cleanup = self.asgi_sender(token), lambda: None
+                    try:
+                        elapsed, latencies, failures = asyncio.run(
+                            self.drive(send, paths, options['requests'], options['concurrency'])
+                        )
+                    finally:
+                        cleanup()
+                latencies.sort()
+                self.stdout.write(
+                    f"{mode:>10}: {len(latencies) / elapsed:>8.1f} req/s  "
+                    f"p50 {percentile(latencies, 0.50) * 1000:>7.1f} ms  "
+                    f"p99 {percentile(latencies, 0.99) * 1000:>7.1f} ms  "
+                    f"({failures} failures)"
+                )
+        finally:
+            Employee.objects.filter(form_template=template).delete()
+            template.delete()
+            user.delete()
+
+    def create_data(self, employee_count):
+        User.objects.filter(email=BENCH_EMAIL).delete()
+        user = User.objects.create_user(username='bench-servers', email=BENCH_EMAIL, password=None)
+        [(template, _)] = create_form_templates([clean_template_payload({
+            'name': 'Bench servers',
+            'fields': [
+                {'label': 'Name', 'field_type': 'text', 'required': True, 'order': 1},
+                {'label': 'Email', 'field_type': 'email', 'order': 2},
+                {'label': 'Salary', 'field_type': 'number', 'order': 3},
+                {'label': 'Joined', 'field_type': 'date', 'order': 4},
+            ],
+        })])
+        schema = schema_cache.get(template.id)
+        valid, _ = validate_submissions(schema, [{
+            'Name': f'Employee {i}',
+            'Email': f'employee{i}@example.com',
+            'Salary': 1000 + i,
+            'Joined': '2024-01-15',
+        } for i in range(employee_count)])
+        created = create_employees(schema, valid)
+        return template, [employee_id for _, employee_id in created], user
+
+    async def drive(self, send, paths, total, concurrency):
+        latencies = []
+        failures = 0
+        counter = itertools.count()
+
+        async def client():
+            nonlocal failures
+            while (i := next(counter)) < total:
+                started = time.perf_counter()
+                status_code = await send(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - started)
+                if status_code != 200:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - started, latencies, failures
+
+    def wsgi_sender(self, token, threads):
+        handler = WSGIHandler()
+        pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='bench-wsgi')
+
+        def call(url):
+            path_info, _, query = url.partition('?')
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': path_info,
+                'QUERY_STRING': query,
+                'SCRIPT_NAME': '',
+                'SERVER_NAME': 'testserver',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'testserver',
+                'HTTP_AUTHORIZATION': f'Bearer {token}',
+                'wsgi.input': io.BytesIO(),
+                'wsgi.errors': io.StringIO(),
+                'wsgi.url_scheme': 'http',
+            }
+            status = []
+            response = handler(environ, lambda status_line, headers: status.append(status_line))
+            try:
+                b''.join(response)
+            finally:
+                response.close()
+            return int(status[0].split()[0])
+
+        async def send(url):
+            return await asyncio.get_running_loop().run_in_executor(pool, call, url)
+
+        return send, lambda: pool.shutdown(wait=True)
+
+    def asgi_sender(self, token):
+        application = ASGIHandler()
+
+        async def send(url):
+            path_info, _, query = url.partition('?')
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path_info,
+                'raw_path': path_info.encode(),
+                'query_string': query.encode(),
+                'root_path': '',
+                'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+                'server': ('testserver', 80),
+                'client': ('127.0.0.1', 0),
+            }
+            request_sent = False
+            disconnect = asyncio.Event()
+            status = []
+
+            async def receive():
+                nonlocal request_sent
+                if not request_sent:
+                    request_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send_message(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            await application(scope, receive, send_message)
+            disconnect.set()
+            return status[0]
+
+        return send
@@ -0,0 +1,67 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+
+from employee.validators import TemplateValidator
+
+
+# field types cycled through by the synthetic templates
+BENCH_TYPES = ('text', 'number', 'date', 'email', 'text')
+
+SAMPLE_VALUES = {
+    'text': 'Rahul Rajeev',
+    'number': '4250.50',
+    'date': '2024-03-15',
+    'email': 'rahul@example.com',
+}
+
+
+def synthetic_schema(field_count):
+    return {
+        'id': field_count,
+        'updated_at': datetime.now(timezone.utc),
+        'fields': [{
+            'id': i + 1,
+            'label': f'Field {i + 1}',
+            'field_type': BENCH_TYPES[i % len(BENCH_TYPES)],
+            'required': i % 3 == 0,
+            'order': i,
+        } for i in range(field_count)],
+    }
+
+
+def synthetic_records(schema, count):
+    record = {field['label']: SAMPLE_VALUES[field['field_type']] for field in schema['fields']}
+    return [dict(record) for _ in range(count)]
+
+
+class Command(BaseCommand):
+    help = "Measure records per second validated by compiled template validators."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fields', default='10,100,500', help="Comma separated field counts")
+        parser.add_argument('--records', type=int, default=2000, help="Records per batch")
+        parser.add_argument('--repeat', type=int, default=3, help="Best of this many runs")
+
+    def handle(self, *args, **options):
+        for field_count in [int(count) for count in options['fields'].split(',')]:
+            schema = synthetic_schema(field_count)
+
+            started = time.perf_counter()
+            validator = TemplateValidator(schema)
+            compile_ms = (time.perf_counter() - started) * 1000
+
+            records = synthetic_records(schema, options['records'])
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                valid, errors = validator.validate(records)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            assert len(valid) == len(records) and not errors
+
+            self.stdout.write(
+                f"{field_count:>4} fields: {len(records) / best:>10.0f} records/s "
+                f"({len(records) * field_count / best:>12.0f} values/s, compile {compile_ms:.2f} ms)"
+            )
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from employee.documents import build_documents, save_documents
+from employee.models import Employee, EmployeeDocument
+
+
+class Command(BaseCommand):
+    help = "Check employee documents against EmployeeField for drift, or rebuild them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['check', 'rebuild'])
+        parser.add_argument('--template', type=int, help="Only employees of this form template")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        employees = Employee.objects.order_by('id')
+        if options['template']:
+            employees = employees.filter(form_template_id=options['template'])
+        employee_ids = list(employees.values_list('id', flat=True))
+        batch_size = options['batch_size']
+        batches = [employee_ids[i:i + batch_size] for i in range(0, len(employee_ids), batch_size)]
+
+        rebuild = options['action'] == 'rebuild'
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                results = list(pool.map(lambda batch: self.run_in_thread(batch, rebuild), batches))
+        else:
+            results = [self.process_batch(batch, rebuild) for batch in batches]
+
+        missing = sum(result['missing'] for result in results)
+        stale = sum(result['stale'] for result in results)
+        orphans = EmployeeDocument.objects.exclude(employee_id__in=employees.values('id'))
+        if options['template']:
+            orphans = orphans.filter(form_template_id=options['template'])
+        orphan_count = orphans.count()
+        if rebuild and orphan_count:
+            orphans.delete()
+
+        summary = (
+            f"{len(employee_ids)} employees checked: {missing} missing, {stale} stale, "
+            f"{orphan_count} orphaned documents"
+        )
+        if rebuild:
+            self.stdout.write(self.style.SUCCESS(f"{summary}; all rebuilt"))
+        elif missing or stale or orphan_count:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    def run_in_thread(self, employee_ids, rebuild):
+        # each worker thread gets its own connection; close it when done
+        try:
+            return self.process_batch(employee_ids, rebuild)
+        finally:
+            connections.close_all()
+
+    def process_batch(self, employee_ids, rebuild):
+        expected = build_documents(employee_ids)
+        stored = dict(
+            EmployeeDocument.objects.filter(employee_id__in=employee_ids)
+            .values_list('employee_id', 'data')
+        )
+        missing = sum(1 for document in expected if document.employee_id not in stored)
+        stale = sum(
+            1 for document in expected
+            if document.employee_id in stored and stored[document.employee_id] != document.data
+        )
+        if rebuild:
+            save_documents(expected)
+        return {'missing': missing, 'stale': stale}
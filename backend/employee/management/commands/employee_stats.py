@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from employee.models import FormTemplate
+from employee.stats import REBUILD_CHUNK_SIZE, rebuild_template_stats
+
+
+class Command(BaseCommand):
+    help = "Check the incrementally maintained template statistics for drift, or rebuild them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['check', 'rebuild'])
+        parser.add_argument('--template', type=int, help="Only this form template")
+        parser.add_argument('--chunk-size', type=int, default=REBUILD_CHUNK_SIZE, help="Employees per chunk")
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        templates = FormTemplate.objects.order_by('id')
+        if options['template']:
+            templates = templates.filter(pk=options['template'])
+        rebuild = options['action'] == 'rebuild'
+
+        checked = drifted = 0
+        for template_id in templates.values_list('id', flat=True).iterator():
+            drift = rebuild_template_stats(
+                template_id, rebuild=rebuild, workers=options['workers'], chunk_size=options['chunk_size']
+            )
+            checked += 1
+            if drift['missing']:
+                drifted += 1
+                self.stdout.write(f"Template {template_id}: no statistics")
+            elif drift['employee_count'] or drift['fields']:
+                drifted += 1
+                fields = ', '.join(f"{field_id} ({', '.join(columns)})" for field_id, columns in drift['fields'].items())
+                self.stdout.write(
+                    f"Template {template_id}: "
+                    f"{'employee count, ' if drift['employee_count'] else ''}fields {fields or 'none'}"
+                )
+
+        summary = f"{checked} templates checked: {drifted} drifted"
+        if rebuild:
+            self.stdout.write(self.style.SUCCESS(f"{summary}; all rebuilt"))
+        elif drifted:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from employee.cache import schema_cache
+from employee.importer import DEFAULT_CHUNK_SIZE, CSVImportError, EmployeeImporter
+from employee.models import EmployeeImport
+
+
+class Command(BaseCommand):
+    help = "Import employees for a form template from a CSV file, in committed chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('template_id', type=int)
+        parser.add_argument('path', help="CSV file whose header row holds field labels")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            '--resume', type=int, metavar='IMPORT_ID',
+            help="Continue an earlier import from its last committed chunk",
+        )
+
+    def handle(self, *args, **options):
+        template_id = options['template_id']
+        schema = schema_cache.get(template_id)
+        if schema is None:
+            raise CommandError(f"Form template {template_id} not found")
+
+        if options['resume']:
+            try:
+                employee_import = EmployeeImport.objects.get(pk=options['resume'])
+            except EmployeeImport.DoesNotExist:
+                raise CommandError(f"Import {options['resume']} not found")
+            self.stdout.write(f"Resuming import {employee_import.pk} after row {employee_import.rows_processed}")
+        else:
+            employee_import = EmployeeImport.objects.create(
+                form_template_id=template_id, source_name=options['path'][-255:]
+            )
+            self.stdout.write(f"Started import {employee_import.pk}")
+
+        def progress(stats):
+            self.stdout.write(
+                "rows {rows_processed}  created {rows_created}  errors {error_count}  "
+                "({rows_per_second:.0f} rows/s)".format(**stats)
+            )
+
+        try:
+            importer = EmployeeImporter(
+                schema, employee_import, chunk_size=options['chunk_size'], progress=progress
+            )
+            with open(options['path'], newline='', encoding='utf-8-sig') as lines:
+                importer.run(lines)
+        except (CSVImportError, OSError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Import {employee_import.pk} completed: {employee_import.rows_created} created, "
+            f"{employee_import.error_count} errors"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from employee.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the employee search postings from EmployeeField values."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index(
+            batch_size=options['batch_size'],
+            progress=lambda indexed: self.stdout.write(f"{indexed} values indexed"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Done, {indexed} values indexed"))
@@ -1,3 +1,6 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
 from django.db import models
 
 # Create your models here.
@@ -9,6 +12,18 @@ class FormTemplate(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination of the template list
+            models.Index(fields=['-created_at', '-id'], name='formtemplate_created_id_idx'),
+            # name prefix search (LIKE 'abc%'); opclasses only apply on postgres
+            models.Index(fields=['name'], name='formtemplate_name_prefix_idx',
+                         opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return self.name
+
 class FormField(models.Model):
     FIELD_TYPES = (
         ('text', 'Text'),
@@ -25,13 +40,142 @@ class FormField(models.Model):
     required = models.BooleanField(default=False)
     order = models.IntegerField(default=0)
     options = models.JSONField(blank=True, null=True)  # For select fields
+    # removed from the template; kept so existing EmployeeField rows stay valid
+    retired_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.label
 
 class Employee(models.Model):
     form_template = models.ForeignKey(FormTemplate, on_delete=models.PROTECT)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    class Meta:
+        indexes = [
+            # keyset pagination of a template's employees
+            models.Index(fields=['form_template', '-created_at', '-id'], name='employee_template_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Employee {self.pk}"
+
 class EmployeeField(models.Model):
+    # field types whose values get a normalized copy in value_text
+    TEXT_TYPES = ('text', 'email')
+    # integer digits that fit in value_number
+    MAX_NUMBER_DIGITS = 20
+    # field types whose values are stored but never served back
+    HIDDEN_TYPES = ('password',)
+
     employee = models.ForeignKey(Employee, related_name='fields', on_delete=models.CASCADE)
     form_field = models.ForeignKey(FormField, on_delete=models.PROTECT)
-    value = models.TextField()  # Store all values as text and convert as needed
\ No newline at end of file
+    value = models.TextField()  # Store all values as text and convert as needed
+    # typed copies of `value` filled from form_field.field_type, for indexed filtering and sorting
+    value_number = models.DecimalField(max_digits=30, decimal_places=10, null=True, blank=True)
+    value_date = models.DateField(null=True, blank=True)
+    value_text = models.CharField(max_length=255, null=True, blank=True)  # lowercased, truncated
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['form_field', 'value_number', 'employee'], name='employeefield_number_idx'),
+            models.Index(fields=['form_field', 'value_date', 'employee'], name='employeefield_date_idx'),
+            models.Index(fields=['form_field', 'value_text', 'employee'], name='employeefield_text_idx'),
+        ]
+
+    @classmethod
+    def typed_values(cls, field_type, value):
+        """Return the typed column values for ``value`` stored under ``field_type``."""
+        typed = {'value_number': None, 'value_date': None, 'value_text': None}
+        if value is None:
+            return typed
+        if field_type == 'number':
+            try:
+                number = Decimal(value.strip())
+            except InvalidOperation:
+                return typed
+            if number.is_finite() and number.adjusted() < cls.MAX_NUMBER_DIGITS:
+                typed['value_number'] = number
+        elif field_type == 'date':
+            try:
+                typed['value_date'] = date.fromisoformat(value.strip())
+            except ValueError:
+                pass
+        elif field_type in cls.TEXT_TYPES:
+            typed['value_text'] = value.strip().lower()[:255]
+        return typed
+
+    def set_typed_values(self, field_type):
+        for name, typed in self.typed_values(field_type, self.value).items():
+            setattr(self, name, typed)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'value' in update_fields:
+            self.set_typed_values(self.form_field.field_type)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'value_number', 'value_date', 'value_text'}
+        super().save(*args, **kwargs)
+
+class EmployeeImport(models.Model):
+    STATUSES = (
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    form_template = models.ForeignKey(FormTemplate, on_delete=models.PROTECT)
+    source_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUSES, default='running')
+    # data rows covered by committed chunks; a resumed import skips these
+    rows_processed = models.IntegerField(default=0)
+    rows_created = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # first few row errors only
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class SearchPosting(models.Model):
+    """One token of one EmployeeField value; the postings list of employee search."""
+    token = models.CharField(max_length=64)
+    employee = models.ForeignKey(Employee, related_name='+', on_delete=models.CASCADE)
+    # deleting the value deletes its postings
+    employee_field = models.ForeignKey(EmployeeField, related_name='search_postings', on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=1)  # occurrences of the token in the value
+
+    class Meta:
+        indexes = [
+            # prefix scans (LIKE 'abc%'); opclasses only apply on postgres
+            models.Index(fields=['token', 'employee'], name='searchposting_token_idx',
+                         opclasses=['varchar_pattern_ops', 'int8_ops']),
+        ]
+
+
+class EmployeeDocument(models.Model):
+    """Read model: one employee's values keyed by field label, kept in step with EmployeeField."""
+    employee = models.OneToOneField(Employee, primary_key=True, related_name='document', on_delete=models.CASCADE)
+    form_template = models.ForeignKey(FormTemplate, related_name='+', on_delete=models.CASCADE)
+    data = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class TemplateStats(models.Model):
+    """A template's employee count; with its ``FieldStats`` kept current by ``employee.stats``."""
+    form_template = models.OneToOneField(FormTemplate, primary_key=True, related_name='stats', on_delete=models.CASCADE)
+    employee_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class FieldStats(models.Model):
+    """Aggregates of one field's values over its template's employees."""
+    form_field = models.OneToOneField(FormField, primary_key=True, related_name='stats', on_delete=models.CASCADE)
+    form_template = models.ForeignKey(FormTemplate, related_name='+', on_delete=models.CASCADE)
+    filled_count = models.PositiveIntegerField(default=0)  # non-empty values
+    # bounds of the typed values of number and date fields
+    min_number = models.DecimalField(max_digits=30, decimal_places=10, null=True, blank=True)
+    max_number = models.DecimalField(max_digits=30, decimal_places=10, null=True, blank=True)
+    min_date = models.DateField(null=True, blank=True)
+    max_date = models.DateField(null=True, blank=True)
+    # {value: count} while the field has few distinct values, otherwise null
+    distribution = models.JSONField(null=True, blank=True)
@@ -0,0 +1,94 @@
+"""
+Keyset (cursor) pagination on ``(created_at, id)``.
+
+Pages are fetched newest first with ``WHERE (created_at, id) < cursor`` so the
+cost of a page does not grow with how deep into the list the client is.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor or page size from the client cannot be used."""
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, pk)`` for a cursor produced by ``encode_cursor``."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    if value in (None, ''):
+        return default
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor("Invalid page size")
+    if size < 1:
+        raise InvalidCursor("Invalid page size")
+    return min(size, maximum)
+
+
+def parse_offset(value):
+    if value in (None, ''):
+        return 0
+    try:
+        offset = int(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor("Invalid offset")
+    if offset < 0:
+        raise InvalidCursor("Invalid offset")
+    return offset
+
+
+def _keyset_queryset(queryset, cursor, page_size):
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    return queryset[:page_size + 1]
+
+
+def _keyset_page(rows, page_size):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.pk)
+    return rows, next_cursor
+
+
+def paginate_keyset(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return ``(rows, next_cursor)`` for one page of ``queryset``.
+
+    ``next_cursor`` is ``None`` on the last page. One extra row is fetched to
+    tell whether another page exists, so no COUNT query is needed.
+    """
+    rows = list(_keyset_queryset(queryset, cursor, page_size))
+    return _keyset_page(rows, page_size)
+
+
+async def apaginate_keyset(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Async ``paginate_keyset``."""
+    rows = [row async for row in _keyset_queryset(queryset, cursor, page_size)]
+    return _keyset_page(rows, page_size)
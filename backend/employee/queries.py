@@ -0,0 +1,252 @@
+"""
+Filtering and sorting employees of one template by field values.
+
+Every predicate becomes ``employee_id IN (SELECT ... FROM EmployeeField WHERE
+form_field_id = X AND value_<type> <op> Y)`` which is answered by the
+``(form_field, value_<type>)`` indexes instead of casting ``value`` in Python.
+
+Sorted lists are read in index order from the sort field's
+``EmployeeField`` rows, ``(form_field, value_<type>, employee)``, and paged
+by a keyset cursor on ``(value, employee_id)``; employees without a value
+follow, by id.
+
+Query syntax, with a field given by id or label::
+
+    ?Age__gte=30&Date of Joining__gt=2024-01-01&Name__startswith=ra&sort=-Age
+"""
+import base64
+import binascii
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import F, Q
+
+# model
+from .models import Employee, EmployeeField
+
+from .pagination import DEFAULT_PAGE_SIZE, InvalidCursor
+
+
+# parameters that are not field predicates
+RESERVED_PARAMS = ('sort', 'limit', 'cursor', 'offset', 'q', 'format', 'output')
+
+LOOKUPS = {
+    'eq': 'exact',
+    'lt': 'lt',
+    'lte': 'lte',
+    'gt': 'gt',
+    'gte': 'gte',
+    'startswith': 'startswith',
+    'isnull': 'isnull',
+}
+
+
+class EmployeeQueryError(ValueError):
+    """Raised for predicates or sort keys that cannot be applied."""
+
+
+def typed_column(field_type):
+    """Name of the indexed ``EmployeeField`` column for ``field_type``, or ``None``."""
+    if field_type == 'number':
+        return 'value_number'
+    if field_type == 'date':
+        return 'value_date'
+    if field_type in EmployeeField.TEXT_TYPES:
+        return 'value_text'
+    return None
+
+
+def _coerce(field, column, op, raw):
+    if op == 'isnull':
+        return raw.lower() in ('1', 'true', 'yes')
+    try:
+        if column == 'value_number':
+            number = Decimal(raw)
+            # NaN and Infinity parse, but no stored value compares with them
+            if not number.is_finite():
+                raise ValueError(raw)
+            return number
+        if column == 'value_date':
+            return date.fromisoformat(raw)
+    except (InvalidOperation, ValueError):
+        raise EmployeeQueryError(f"Invalid value '{raw}' for field '{field['label']}'")
+    return raw.strip().lower()
+
+
+def _field_lookup(schema):
+    by_key = {}
+    for field in schema['fields']:
+        by_key[field['label']] = field
+        by_key[str(field['id'])] = field
+    return by_key
+
+
+def parse_employee_query(schema, params):
+    """
+    Parse query params into ``(predicates, sort)``.
+
+    ``predicates`` is a list of ``(field_id, column, lookup, value)`` and
+    ``sort`` is ``(field_id, column, descending)`` or ``None``.
+    """
+    by_key = _field_lookup(schema)
+
+    predicates = []
+    for key, raw in params.items():
+        if key in RESERVED_PARAMS:
+            continue
+        name, _, op = key.rpartition('__')
+        if not name or op not in LOOKUPS:
+            name, op = key, 'eq'
+        field = by_key.get(name)
+        if field is None:
+            raise EmployeeQueryError(f"Unknown field '{name}'")
+        column = typed_column(field['field_type'])
+        if column is None:
+            raise EmployeeQueryError(f"Field '{field['label']}' cannot be filtered")
+        if op == 'startswith' and column != 'value_text':
+            raise EmployeeQueryError("'startswith' only applies to text fields")
+        predicates.append((field['id'], column, LOOKUPS[op], _coerce(field, column, op, raw)))
+
+    sort = None
+    sort_key = params.get('sort')
+    if sort_key:
+        descending = sort_key.startswith('-')
+        field = by_key.get(sort_key.lstrip('-'))
+        if field is None:
+            raise EmployeeQueryError(f"Unknown sort field '{sort_key.lstrip('-')}'")
+        column = typed_column(field['field_type'])
+        if column is None:
+            raise EmployeeQueryError(f"Field '{field['label']}' cannot be sorted")
+        sort = (field['id'], column, descending)
+
+    return predicates, sort
+
+
+def filter_employees(schema, predicates):
+    """Return an ``Employee`` queryset for the template, filtered."""
+    queryset = Employee.objects.filter(form_template_id=schema['id'])
+
+    for field_id, column, lookup, value in predicates:
+        if lookup == 'isnull':
+            has_value = EmployeeField.objects.filter(
+                form_field_id=field_id, **{f'{column}__isnull': False}
+            ).values('employee_id')
+            if value:
+                queryset = queryset.exclude(id__in=has_value)
+            else:
+                queryset = queryset.filter(id__in=has_value)
+            continue
+        matches = EmployeeField.objects.filter(
+            form_field_id=field_id, **{f'{column}__{lookup}': value}
+        ).values('employee_id')
+        queryset = queryset.filter(id__in=matches)
+
+    return queryset
+
+
+def encode_sort_cursor(employee_id, value=None):
+    """Cursor after ``employee_id``; ``value`` is ``None`` once past the valued employees."""
+    raw = f"n|{employee_id}" if value is None else f"v|{employee_id}|{value}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_sort_cursor(cursor, column):
+    """``(employee_id, value)`` of a cursor from ``encode_sort_cursor``."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        phase, employee_id, *value = base64.urlsafe_b64decode(padded.encode()).decode().split('|', 2)
+        employee_id = int(employee_id) if employee_id else None
+        if phase == 'n' and not value:
+            return employee_id, None
+        if phase != 'v' or len(value) != 1 or employee_id is None:
+            raise ValueError(cursor)
+        value = value[0]
+        if column == 'value_number':
+            value = Decimal(value)
+            if not value.is_finite():
+                raise ValueError(cursor)
+        elif column == 'value_date':
+            value = date.fromisoformat(value)
+        return employee_id, value
+    except (binascii.Error, UnicodeDecodeError, InvalidOperation, ValueError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def _valued_rows(queryset, sort, after):
+    """The sort field's values of ``queryset``'s employees in sort order, past ``after``."""
+    field_id, column, descending = sort
+    rows = EmployeeField.objects.filter(
+        form_field_id=field_id, employee__in=queryset.values('id'), **{f'{column}__isnull': False}
+    ).select_related('employee')
+    if after is not None:
+        employee_id, value = after
+        op = 'lt' if descending else 'gt'
+        rows = rows.filter(Q(**{f'{column}__{op}': value}) | Q(**{column: value, f'employee_id__{op}': employee_id}))
+    if descending:
+        return rows.order_by(F(column).desc(), F('employee_id').desc())
+    return rows.order_by(column, 'employee_id')
+
+
+def _unvalued_rows(queryset, sort, after_id):
+    """``queryset``'s employees without a sort value, by id, past ``after_id``."""
+    field_id, column, descending = sort
+    valued = EmployeeField.objects.filter(form_field_id=field_id, **{f'{column}__isnull': False})
+    rows = queryset.exclude(id__in=valued.values('employee_id'))
+    if after_id is not None:
+        rows = rows.filter(**{'id__lt' if descending else 'id__gt': after_id})
+    return rows.order_by('-id' if descending else 'id')
+
+
+def _sorted_start(sort, cursor):
+    """``(after, after_id)``: where to resume among valued, else unvalued employees."""
+    if not cursor:
+        return None, None
+    employee_id, value = decode_sort_cursor(cursor, sort[1])
+    if value is None:
+        return False, employee_id
+    return (employee_id, value), None
+
+
+def _valued_page(rows, sort, page_size):
+    if len(rows) > page_size:
+        last = rows[page_size - 1]
+        return [row.employee for row in rows[:page_size]], encode_sort_cursor(last.employee_id, getattr(last, sort[1]))
+    return [row.employee for row in rows], None
+
+
+def _unvalued_page(employees, rows, page_size):
+    remaining = page_size - len(employees)
+    if len(rows) > remaining:
+        # an empty id starts the unvalued employees from the first
+        last_id = rows[remaining - 1].id if remaining else ''
+        return employees + rows[:remaining], encode_sort_cursor(last_id)
+    return employees + rows, None
+
+
+def paginate_sorted(queryset, sort, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return ``(employees, next_cursor)`` for one page of ``queryset`` ordered
+    by ``sort`` from ``parse_employee_query``, employees without a value last.
+    """
+    after, after_id = _sorted_start(sort, cursor)
+    employees = []
+    if after is not False:
+        rows = list(_valued_rows(queryset, sort, after)[:page_size + 1])
+        employees, next_cursor = _valued_page(rows, sort, page_size)
+        if next_cursor is not None:
+            return employees, next_cursor
+    rows = list(_unvalued_rows(queryset, sort, after_id)[:page_size - len(employees) + 1])
+    return _unvalued_page(employees, rows, page_size)
+
+
+async def apaginate_sorted(queryset, sort, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Async ``paginate_sorted``."""
+    after, after_id = _sorted_start(sort, cursor)
+    employees = []
+    if after is not False:
+        rows = [row async for row in _valued_rows(queryset, sort, after)[:page_size + 1]]
+        employees, next_cursor = _valued_page(rows, sort, page_size)
+        if next_cursor is not None:
+            return employees, next_cursor
+    rows = [row async for row in _unvalued_rows(queryset, sort, after_id)[:page_size - len(employees) + 1]]
+    return _unvalued_page(employees, rows, page_size)
@@ -0,0 +1,164 @@
+"""
+Token search over employee text and email values.
+
+Values are split into lowercase tokens and stored as ``SearchPosting`` rows
+(token -> employee). Postings are written together with their
+``EmployeeField`` rows: in bulk by ``employee.submissions`` and one value at
+a time by ``employee.signals``; deleting a value cascades to its postings.
+The postings of a removed field are dropped by an ``employee.drop_field_postings``
+job, so its values still match until that has run.
+
+A search matches every query term as a token prefix through the token index
+(``varchar_pattern_ops`` on Postgres) and ranks employees by how often the
+terms occur.
+"""
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, When
+
+# model
+from .models import EmployeeField, SearchPosting
+
+
+# field types whose values are searchable
+SEARCH_TYPES = EmployeeField.TEXT_TYPES
+
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TERMS = 8
+
+# rows per INSERT statement for SearchPosting
+POSTING_BATCH_SIZE = 5000
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lowercase word tokens of ``text`` with their counts."""
+    return Counter(token[:MAX_TOKEN_LENGTH] for token in TOKEN_RE.findall(text.lower()))
+
+
+def build_postings(employee_fields, field_types):
+    """
+    Unsaved ``SearchPosting`` objects for saved ``EmployeeField`` objects.
+
+    ``field_types`` maps ``form_field_id`` to its ``field_type``.
+    """
+    postings = []
+    for employee_field in employee_fields:
+        if field_types.get(employee_field.form_field_id) not in SEARCH_TYPES:
+            continue
+        for token, count in tokenize(employee_field.value).items():
+            postings.append(SearchPosting(
+                token=token,
+                employee_id=employee_field.employee_id,
+                employee_field_id=employee_field.id,
+                count=count,
+            ))
+    return postings
+
+
+def index_employee_fields(employee_fields, field_types):
+    """Insert postings for newly written values in bulk."""
+    SearchPosting.objects.bulk_create(
+        build_postings(employee_fields, field_types), batch_size=POSTING_BATCH_SIZE
+    )
+
+
+def reindex_employee_field(employee_field, field_type, created=False):
+    """Replace the postings of one value after it was saved."""
+    if not created:
+        SearchPosting.objects.filter(employee_field_id=employee_field.id).delete()
+    index_employee_fields([employee_field], {employee_field.form_field_id: field_type})
+
+
+def search_employees(query, template_id=None, limit=20, offset=0):
+    """
+    Rank employees matching every term of ``query`` as a token prefix.
+
+    Returns ``[{'employee_id': ..., 'score': ...}, ...]`` best first, with
+    ties broken by employee id.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    postings = SearchPosting.objects.all()
+    if template_id is not None:
+        postings = postings.filter(employee__form_template_id=template_id)
+
+    any_term = Q()
+    for term in terms:
+        any_term |= Q(token__startswith=term)
+    # 1 when the employee has a posting for the term, so every term must match
+    term_flags = {
+        f'term_{index}': Max(Case(When(token__startswith=term, then=1), default=0,
+                                  output_field=IntegerField()))
+        for index, term in enumerate(terms)
+    }
+
+    ranked = (
+        postings.filter(any_term)
+        .values('employee_id')
+        .annotate(score=Sum('count'), **term_flags)
+        .filter(**{name: 1 for name in term_flags})
+        .order_by('-score', 'employee_id')
+    )
+    return [
+        {'employee_id': row['employee_id'], 'score': row['score']}
+        for row in ranked[offset:offset + limit]
+    ]
+
+
+def rebuild_search_index(batch_size=POSTING_BATCH_SIZE, progress=None):
+    """
+    Replace every posting with ones built from the stored values.
+
+    ``progress`` is called with the number of values indexed after each
+    batch. Returns that number.
+    """
+    queryset = (
+        EmployeeField.objects.filter(form_field__field_type__in=SEARCH_TYPES, form_field__retired_at__isnull=True)
+        .select_related('form_field')
+        .only('id', 'employee_id', 'form_field_id', 'value', 'form_field__field_type')
+        .order_by('id')
+    )
+
+    SearchPosting.objects.all().delete()
+    last_id = 0
+    indexed = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        field_types = {
+            employee_field.form_field_id: employee_field.form_field.field_type
+            for employee_field in batch
+        }
+        with transaction.atomic():
+            index_employee_fields(batch, field_types)
+        last_id = batch[-1].id
+        indexed += len(batch)
+        if progress:
+            progress(indexed)
+    return indexed
+
+
+def drop_field_postings(field_ids, batch_size=POSTING_BATCH_SIZE, progress=None):
+    """
+    Delete the postings of the values of ``field_ids`` a batch at a time.
+
+    ``progress`` is called with the number deleted after each batch. Returns
+    that number.
+    """
+    postings = SearchPosting.objects.filter(employee_field__form_field_id__in=field_ids)
+    deleted = 0
+    while True:
+        batch = list(postings.values_list('id', flat=True)[:batch_size])
+        if not batch:
+            break
+        deleted += SearchPosting.objects.filter(id__in=batch).delete()[0]
+        if progress:
+            progress(deleted)
+    return deleted
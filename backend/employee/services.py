@@ -0,0 +1,361 @@
+"""
+Write paths for form templates.
+
+Payloads are validated in full before anything touches the database, then
+templates and their fields are inserted with ``bulk_create`` so a template
+costs the same number of queries whether it has 2 fields or 200.
+
+Existing templates are edited with a patch (added, changed, removed and
+reordered fields) applied with one bulk statement per kind of change.
+Removed fields are retired rather than deleted, because ``EmployeeField``
+rows keep pointing at them. Work proportional to the number of employees
+(dropping search postings, re-keying documents) is queued as background jobs
+instead of running in the request.
+"""
+import bisect
+
+from django.db import transaction
+from django.utils import timezone
+
+# model
+from .models import FormTemplate, FormField, TemplateStats
+
+# services
+from jobs.registry import enqueue
+from .cache import schema_cache, template_schema
+from .documents import queue_template_rebuild
+
+
+FIELD_TYPES = frozenset(dict(FormField.FIELD_TYPES))
+
+
+class TemplatePayloadError(ValueError):
+    """Raised when a form template payload fails validation."""
+
+
+def clean_template_payload(data):
+    """
+    Validate a single template payload.
+
+    Returns ``(template_kwargs, fields)`` where ``fields`` is a list of kwargs
+    ready for ``FormField``. Raises ``TemplatePayloadError`` on the first
+    problem found; nothing is written.
+    """
+    if not isinstance(data, dict):
+        raise TemplatePayloadError("Form template must be an object")
+
+    name = data.get('name')
+    if not name:
+        raise TemplatePayloadError("Form template name is required")
+
+    fields_data = data.get('fields') or []
+    if not isinstance(fields_data, list):
+        raise TemplatePayloadError("Fields must be a list")
+    if not fields_data:
+        raise TemplatePayloadError("At least one field is required")
+
+    fields = [_clean_field(idx, field_data) for idx, field_data in enumerate(fields_data)]
+    # values are keyed by label in submissions, documents and exports
+    labels = [field['label'] for field in fields]
+    if len(set(labels)) != len(labels):
+        raise TemplatePayloadError("Field labels must be unique")
+
+    template_kwargs = {
+        'name': name,
+        'description': data.get('description') or '',
+    }
+    return template_kwargs, fields
+
+
+def _clean_field(idx, field_data):
+    if not isinstance(field_data, dict) or not field_data.get('label'):
+        raise TemplatePayloadError(f"Field at index {idx} is missing a label")
+
+    field_type = field_data.get('field_type')
+    if field_type not in FIELD_TYPES:
+        raise TemplatePayloadError(
+            f"Field '{field_data.get('label')}' has invalid field type"
+        )
+
+    order = field_data.get('order', idx)
+    try:
+        order = int(idx if order is None else order)
+    except (TypeError, ValueError):
+        raise TemplatePayloadError(
+            f"Field '{field_data.get('label')}' has invalid order"
+        )
+
+    return {
+        'label': field_data['label'],
+        'field_type': field_type,
+        'required': bool(field_data.get('required', False)),
+        'order': order,
+        'options': field_data.get('options'),
+    }
+
+
+def create_form_templates(cleaned):
+    """
+    Create templates from cleaned payloads in one transaction.
+
+    ``cleaned`` is a list of ``(template_kwargs, fields)`` pairs as returned
+    by ``clean_template_payload``. One INSERT is issued for the templates, one
+    for all of their fields and one for their statistics rows. Returns
+    ``[(template, [field, ...]), ...]`` with primary keys populated.
+    """
+    with transaction.atomic():
+        templates = FormTemplate.objects.bulk_create(
+            [FormTemplate(**template_kwargs) for template_kwargs, _ in cleaned]
+        )
+
+        grouped = []
+        all_fields = []
+        for template, (_, fields) in zip(templates, cleaned):
+            objs = [FormField(form_template=template, **field) for field in fields]
+            grouped.append(objs)
+            all_fields.extend(objs)
+
+        FormField.objects.bulk_create(all_fields)
+        # no employees yet, so their statistics start out complete
+        TemplateStats.objects.bulk_create([TemplateStats(form_template=template) for template in templates])
+
+    return list(zip(templates, grouped))
+
+
+# field attributes a patch may change; a new type would leave the typed
+# value columns of existing employees wrong, so that takes remove + add
+CHANGEABLE_FIELD_ATTRS = ('label', 'required', 'options')
+
+
+def _id_list(value, name):
+    if not isinstance(value, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in value):
+        raise TemplatePayloadError(f"'{name}' must be a list of field ids")
+    if len(set(value)) != len(value):
+        raise TemplatePayloadError(f"'{name}' lists a field more than once")
+    return value
+
+
+def clean_template_patch(data):
+    """
+    Validate a template patch::
+
+        {
+            "name": "...",                  # optional
+            "description": "...",           # optional
+            "add": [{"label": ..., "field_type": ..., "required": ..., "options": ...,
+                     "after": 12}],         # field id, null for first, absent for last
+            "change": [{"id": 12, "label": ..., "required": ..., "options": ...}],
+            "remove": [13, 14],
+            "order": [12, 15, 11]           # every remaining field, in display order
+        }
+
+    Returns a dict with every key filled in. Raises ``TemplatePayloadError``;
+    ids are checked against the template by ``apply_template_patch``.
+    """
+    if not isinstance(data, dict):
+        raise TemplatePayloadError("Patch must be an object")
+
+    template_kwargs = {}
+    if 'name' in data:
+        if not data['name']:
+            raise TemplatePayloadError("Form template name is required")
+        template_kwargs['name'] = data['name']
+    if 'description' in data:
+        template_kwargs['description'] = data['description'] or ''
+
+    add = data.get('add') or []
+    change = data.get('change') or []
+    if not isinstance(add, list) or not isinstance(change, list):
+        raise TemplatePayloadError("'add' and 'change' must be lists")
+
+    added = []
+    for idx, field_data in enumerate(add):
+        field = _clean_field(idx, field_data)
+        del field['order']
+        after = field_data.get('after', 'last')
+        if after is not None and after != 'last' and (not isinstance(after, int) or isinstance(after, bool)):
+            raise TemplatePayloadError(f"Field '{field['label']}' has invalid 'after'")
+        added.append((field, after))
+
+    changed = {}
+    for idx, change_data in enumerate(change):
+        change_id = change_data.get('id') if isinstance(change_data, dict) else None
+        if not isinstance(change_id, int) or isinstance(change_id, bool):
+            raise TemplatePayloadError(f"Change at index {idx} is missing a field id")
+        if change_data['id'] in changed:
+            raise TemplatePayloadError(f"Field {change_data['id']} is changed more than once")
+        if 'field_type' in change_data:
+            raise TemplatePayloadError(
+                f"The type of field {change_data['id']} cannot change; remove it and add a new field"
+            )
+        if 'label' in change_data and not change_data['label']:
+            raise TemplatePayloadError(f"Field {change_data['id']} is missing a label")
+        attrs = {name: change_data[name] for name in CHANGEABLE_FIELD_ATTRS if name in change_data}
+        if 'required' in attrs:
+            attrs['required'] = bool(attrs['required'])
+        changed[change_data['id']] = attrs
+
+    remove = _id_list(data.get('remove') or [], 'remove')
+    order = _id_list(data['order'], 'order') if data.get('order') is not None else None
+    if set(remove) & set(changed):
+        raise TemplatePayloadError("A removed field cannot also be changed")
+
+    return {
+        'template': template_kwargs,
+        'add': added,
+        'change': changed,
+        'remove': remove,
+        'order': order,
+    }
+
+
+def _increasing_run(values):
+    """Indexes of a longest strictly increasing subsequence of ``values``."""
+    tail_values = []    # tail_values[k]: smallest value ending a run of length k + 1
+    tail_indexes = []
+    previous = {}
+    for i, value in enumerate(values):
+        if value is None:
+            continue
+        k = bisect.bisect_left(tail_values, value)
+        previous[i] = tail_indexes[k - 1] if k else None
+        if k == len(tail_values):
+            tail_values.append(value)
+            tail_indexes.append(i)
+        else:
+            tail_values[k] = value
+            tail_indexes[k] = i
+    run = set()
+    i = tail_indexes[-1] if tail_indexes else None
+    while i is not None:
+        run.add(i)
+        i = previous[i]
+    return run
+
+
+def assign_orders(sequence):
+    """
+    Give the fields of ``sequence`` (display order; new fields have
+    ``order=None``) increasing ``order`` values, changing as few existing
+    rows as possible.
+
+    The longest run of fields already in increasing order keeps its values;
+    the others get free values between their neighbours, from 0 up. When
+    there is no room the sequence is renumbered from 1. Returns the existing
+    fields whose ``order`` changed.
+    """
+    before = [field.order for field in sequence]
+    keep = _increasing_run(before)
+    # order of the next kept field at or after each position
+    upper = [None] * len(sequence)
+    next_kept = None
+    for i in range(len(sequence) - 1, -1, -1):
+        upper[i] = next_kept
+        if i in keep:
+            next_kept = before[i]
+
+    lower = -1
+    for i, field in enumerate(sequence):
+        if i in keep:
+            lower = field.order
+        elif upper[i] is None or lower + 1 < upper[i]:
+            field.order = lower = lower + 1
+        else:
+            for position, field in enumerate(sequence, start=1):
+                field.order = position
+            break
+    return [
+        field for field, order in zip(sequence, before)
+        if field.pk is not None and field.order != order
+    ]
+
+
+def apply_template_patch(template_id, patch):
+    """
+    Apply a cleaned patch in one transaction and return the new schema, or
+    ``None`` if the template does not exist.
+
+    Removed fields are retired, changes and moves are one ``bulk_update``,
+    additions one ``bulk_create``, and ``updated_at`` is bumped once. Jobs
+    queued in the same transaction drop the search postings of removed
+    fields and rebuild the documents when labels change. Raises ``TemplatePayloadError`` when the patch refers to
+    fields the template does not have.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        template = FormTemplate.objects.select_for_update().filter(id=template_id).first()
+        if template is None:
+            return None
+        fields = {
+            field.id: field
+            for field in FormField.objects.filter(form_template=template, retired_at__isnull=True)
+        }
+
+        unknown = [pk for pk in [*patch['remove'], *patch['change']] if pk not in fields]
+        if unknown:
+            raise TemplatePayloadError(f"Unknown field ids: {', '.join(map(str, unknown))}")
+        removed = set(patch['remove'])
+        remaining = [field for pk, field in fields.items() if pk not in removed]
+        if not remaining and not patch['add']:
+            raise TemplatePayloadError("At least one field is required")
+
+        if patch['order'] is not None:
+            if set(patch['order']) != {field.id for field in remaining}:
+                raise TemplatePayloadError("'order' must list every remaining field exactly once")
+            sequence = [fields[pk] for pk in patch['order']]
+        else:
+            sequence = sorted(remaining, key=lambda field: (field.order, field.id))
+
+        new_fields = []
+        # fields added after the same anchor keep their relative order
+        last_inserted = {}
+        for field_kwargs, after in patch['add']:
+            field = FormField(form_template=template, order=None, **field_kwargs)
+            if after == 'last':
+                sequence.append(field)
+            else:
+                if after is not None and (after not in fields or after in removed):
+                    raise TemplatePayloadError(f"Unknown field id in 'after': {after}")
+                anchor = last_inserted.get(after, fields.get(after))
+                sequence.insert(sequence.index(anchor) + 1 if anchor is not None else 0, field)
+                last_inserted[after] = field
+            new_fields.append(field)
+
+        changed_fields = {}
+        changed_attrs = set()
+        for pk, attrs in patch['change'].items():
+            field = fields[pk]
+            for name, value in attrs.items():
+                if getattr(field, name) != value:
+                    setattr(field, name, value)
+                    changed_fields[pk] = field
+                    changed_attrs.add(name)
+        labels = [field.label for field in sequence]
+        if len(set(labels)) != len(labels):
+            raise TemplatePayloadError("Field labels must be unique")
+
+        moved = assign_orders(sequence)
+        if moved:
+            changed_fields.update((field.id, field) for field in moved)
+            changed_attrs.add('order')
+
+        if removed:
+            FormField.objects.filter(id__in=removed).update(retired_at=now)
+            enqueue('employee.drop_field_postings', {'field_ids': sorted(removed)})
+        if changed_fields:
+            FormField.objects.bulk_update(list(changed_fields.values()), sorted(changed_attrs))
+        if new_fields:
+            FormField.objects.bulk_create(new_fields)
+
+        # bulk writes skip the signals, so bump the version here
+        for name, value in patch['template'].items():
+            setattr(template, name, value)
+        template.updated_at = now
+        FormTemplate.objects.filter(pk=template.pk).update(updated_at=now, **patch['template'])
+
+        transaction.on_commit(lambda: schema_cache.invalidate(template_id))
+        if removed or 'label' in changed_attrs:
+            # documents are keyed by label and leave out retired fields
+            queue_template_rebuild(template_id)
+
+    return template_schema(template, sequence)
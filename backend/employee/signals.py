@@ -0,0 +1,102 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import FormTemplate, FormField, Employee, EmployeeField
+from .cache import schema_cache
+from .search import reindex_employee_field
+from .documents import queue_template_rebuild, set_document_value
+from .stats import StatsDelta, apply_stats_delta, employee_removal_delta
+
+
+def invalidate_template(template_id):
+    # after commit, so no other request can re-cache the pre-write rows
+    transaction.on_commit(lambda: schema_cache.invalidate(template_id))
+
+
+@receiver([post_save, post_delete], sender=FormTemplate)
+def invalidate_template_schema(sender, instance, **kwargs):
+    invalidate_template(instance.pk)
+
+@receiver([post_save, post_delete], sender=FormField)
+def invalidate_field_template_schema(sender, instance, **kwargs):
+    # a field change is a new version of its template
+    FormTemplate.objects.filter(pk=instance.form_template_id).update(updated_at=timezone.now())
+    invalidate_template(instance.form_template_id)
+
+@receiver(post_save, sender=EmployeeField)
+def update_search_postings(sender, instance, created, **kwargs):
+    # bulk writes index themselves; deletes cascade to the postings
+    reindex_employee_field(instance, instance.form_field.field_type, created=created)
+
+@receiver(post_save, sender=EmployeeField)
+def update_employee_document(sender, instance, **kwargs):
+    if instance.form_field.field_type in EmployeeField.HIDDEN_TYPES:
+        return
+    set_document_value(instance.employee_id, instance.form_field.label, instance.value)
+
+@receiver(post_delete, sender=EmployeeField)
+def remove_from_employee_document(sender, instance, origin=None, **kwargs):
+    # the document goes away with the employee itself
+    deleting_employee = isinstance(origin, Employee) or (
+        isinstance(origin, QuerySet) and origin.model is Employee
+    )
+    if not deleting_employee and instance.form_field.field_type not in EmployeeField.HIDDEN_TYPES:
+        set_document_value(instance.employee_id, instance.form_field.label, None)
+
+@receiver(pre_save, sender=EmployeeField)
+def remember_employee_value(sender, instance, **kwargs):
+    instance._previous_value = None
+    if instance.pk:
+        instance._previous_value = (
+            EmployeeField.objects.filter(pk=instance.pk)
+            .values_list('value', 'value_number', 'value_date').first()
+        )
+
+@receiver(post_save, sender=EmployeeField)
+def update_template_stats(sender, instance, **kwargs):
+    form_field = instance.form_field
+    delta = StatsDelta(form_field.form_template_id)
+    previous = getattr(instance, '_previous_value', None)
+    if previous is not None:
+        delta.remove(form_field.id, form_field.field_type, *previous)
+    delta.add(form_field.id, form_field.field_type, instance.value, instance.value_number, instance.value_date)
+    apply_stats_delta(delta)
+
+@receiver(post_delete, sender=EmployeeField)
+def remove_from_template_stats(sender, instance, origin=None, **kwargs):
+    # counted together with the employee being deleted
+    deleting_employee = isinstance(origin, Employee) or (
+        isinstance(origin, QuerySet) and origin.model is Employee
+    )
+    if not deleting_employee:
+        form_field = instance.form_field
+        delta = StatsDelta(form_field.form_template_id)
+        delta.remove(form_field.id, form_field.field_type, instance.value, instance.value_number, instance.value_date)
+        apply_stats_delta(delta)
+
+@receiver(pre_delete, sender=Employee)
+def remember_employee_stats(sender, instance, **kwargs):
+    # its values are gone by post_delete
+    instance._stats_delta = employee_removal_delta(instance)
+
+@receiver(post_delete, sender=Employee)
+def remove_employee_from_stats(sender, instance, **kwargs):
+    delta = getattr(instance, '_stats_delta', None)
+    if delta is not None:
+        apply_stats_delta(delta)
+
+@receiver(pre_save, sender=FormField)
+def remember_field_label(sender, instance, **kwargs):
+    instance._previous_label = None
+    if instance.pk:
+        instance._previous_label = (
+            FormField.objects.filter(pk=instance.pk).values_list('label', flat=True).first()
+        )
+
+@receiver(post_save, sender=FormField)
+def rekey_employee_documents(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_label', None)
+    if not created and previous is not None and previous != instance.label:
+        queue_template_rebuild(instance.form_template_id)
@@ -0,0 +1,369 @@
+"""
+Per-template statistics maintained by deltas.
+
+``TemplateStats`` counts a template's employees and ``FieldStats`` holds per
+field the number of filled (non-empty) values, the bounds of ``number`` and
+``date`` values, and the distribution of values while a field has at most
+``DISTRIBUTION_LIMIT`` distinct ones. ``/employee/forms/<id>/stats/`` reads
+these rows instead of aggregating ``EmployeeField``.
+
+Every write of employee values applies a ``StatsDelta`` in its own
+transaction: in bulk from ``employee.submissions`` and one value at a time
+from ``employee.signals``. The delta locks the template's ``TemplateStats``
+row, so stats updates of one template are serialized (the value writes
+themselves are not). Removing a value that was a field's min or max looks the
+bound up again through the typed value indexes. A field that outgrows the
+distribution limit stops tracking values until it is rebuilt.
+
+A template without a ``TemplateStats`` row (created before statistics were
+kept) has none until ``rebuild_template_stats`` computes them; the
+``employee_stats`` command checks every template for drift and rebuilds.
+
+Settings (all optional)::
+
+    EMPLOYEE_STATS = {
+        'DISTRIBUTION_LIMIT': 20,   # distinct values tracked per field; rebuild after changing
+    }
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Max, Min, Q
+
+# model
+from .models import Employee, EmployeeField, FieldStats, FormField, TemplateStats
+
+
+DEFAULTS = {
+    'DISTRIBUTION_LIMIT': 20,
+}
+
+# field types whose value distribution is tracked; password values never are
+DISTRIBUTION_TYPES = ('text', 'number', 'date')
+
+# field types with bounds, and the typed column they are taken from
+BOUND_COLUMNS = {'number': 'number', 'date': 'date'}
+
+# longest value kept as a distribution key
+MAX_VALUE_LENGTH = 255
+
+# employees per chunk when recomputing
+REBUILD_CHUNK_SIZE = 5000
+
+FIELD_STATS_COLUMNS = ('filled_count', 'min_number', 'max_number', 'min_date', 'max_date', 'distribution')
+
+
+def stats_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'EMPLOYEE_STATS', {})}[name]
+
+
+def _bound(field_type, value_number, value_date):
+    column = BOUND_COLUMNS.get(field_type)
+    if column == 'number':
+        return value_number
+    if column == 'date':
+        return value_date
+    return None
+
+
+def new_field_stats(field_id, template_id, field_type):
+    return FieldStats(
+        form_field_id=field_id,
+        form_template_id=template_id,
+        distribution={} if field_type in DISTRIBUTION_TYPES else None,
+    )
+
+
+class StatsDelta:
+    """Employees and values added to or removed from one template."""
+
+    def __init__(self, template_id):
+        self.template_id = template_id
+        self.employees = 0
+        self.field_types = {}
+        self.added = defaultdict(list)    # field id -> [(value, bound), ...]
+        self.removed = defaultdict(list)
+
+    def add(self, field_id, field_type, value, value_number=None, value_date=None):
+        self.field_types[field_id] = field_type
+        self.added[field_id].append((value, _bound(field_type, value_number, value_date)))
+
+    def remove(self, field_id, field_type, value, value_number=None, value_date=None):
+        self.field_types[field_id] = field_type
+        self.removed[field_id].append((value, _bound(field_type, value_number, value_date)))
+
+    def __bool__(self):
+        return bool(self.employees or self.field_types)
+
+
+def _count_values(distribution, values, step):
+    for value, _ in values:
+        if value == '':
+            continue
+        key = value[:MAX_VALUE_LENGTH]
+        count = distribution.get(key, 0) + step
+        if count > 0:
+            distribution[key] = count
+        else:
+            distribution.pop(key, None)
+
+
+def _apply_values(stats, field_type, added, removed):
+    """Update ``stats`` in place; returns whether its bounds must be looked up again."""
+    filled = sum(1 for value, _ in added if value != '') - sum(1 for value, _ in removed if value != '')
+    stats.filled_count = max(0, stats.filled_count + filled)
+
+    if stats.distribution is not None:
+        _count_values(stats.distribution, removed, -1)
+        _count_values(stats.distribution, added, 1)
+        if len(stats.distribution) > stats_setting('DISTRIBUTION_LIMIT'):
+            stats.distribution = None
+
+    column = BOUND_COLUMNS.get(field_type)
+    if column is None:
+        return False
+    low, high = getattr(stats, f'min_{column}'), getattr(stats, f'max_{column}')
+    if any(bound is not None and (low is None or bound <= low or bound >= high) for _, bound in removed):
+        return True
+    bounds = [bound for _, bound in added if bound is not None]
+    if bounds:
+        setattr(stats, f'min_{column}', min(bounds if low is None else [low, *bounds]))
+        setattr(stats, f'max_{column}', max(bounds if high is None else [high, *bounds]))
+    return False
+
+
+def _lookup_bounds(stats, field_type):
+    # one field and one column, so both are index lookups rather than a scan
+    column = BOUND_COLUMNS[field_type]
+    bounds = EmployeeField.objects.filter(form_field_id=stats.form_field_id).aggregate(
+        low=Min(f'value_{column}'), high=Max(f'value_{column}')
+    )
+    setattr(stats, f'min_{column}', bounds['low'])
+    setattr(stats, f'max_{column}', bounds['high'])
+
+
+def apply_stats_delta(delta):
+    """Fold ``delta`` into the stored stats; call it after writing the values."""
+    if not delta:
+        return
+    with transaction.atomic():
+        template_stats = TemplateStats.objects.select_for_update().filter(pk=delta.template_id).first()
+        if template_stats is None:
+            # never computed; the values are counted when the template is rebuilt
+            return
+
+        existing = {
+            stats.form_field_id: stats
+            for stats in FieldStats.objects.filter(form_field_id__in=list(delta.field_types))
+        }
+        created = []
+        for field_id, field_type in delta.field_types.items():
+            stats = existing.get(field_id)
+            if stats is None:
+                # a field added since the last rebuild, so it starts from nothing
+                stats = new_field_stats(field_id, delta.template_id, field_type)
+                created.append(stats)
+            if _apply_values(stats, field_type, delta.added[field_id], delta.removed[field_id]):
+                _lookup_bounds(stats, field_type)
+
+        if created:
+            FieldStats.objects.bulk_create(created)
+        if existing:
+            FieldStats.objects.bulk_update(list(existing.values()), FIELD_STATS_COLUMNS)
+        template_stats.employee_count = max(0, template_stats.employee_count + delta.employees)
+        template_stats.save(update_fields=['employee_count', 'updated_at'])
+
+
+def employee_removal_delta(employee):
+    """The delta of deleting ``employee`` with all of its values."""
+    delta = StatsDelta(employee.form_template_id)
+    delta.employees = -1
+    rows = EmployeeField.objects.filter(employee_id=employee.pk).values_list(
+        'form_field_id', 'form_field__field_type', 'value', 'value_number', 'value_date'
+    )
+    for row in rows:
+        delta.remove(*row)
+    return delta
+
+
+def _chunk_stats(template_id, field_types, first_id, last_id):
+    """Partial field stats over the employees with ids in ``[first_id, last_id]``."""
+    rows = EmployeeField.objects.filter(
+        employee__form_template_id=template_id, employee_id__gte=first_id, employee_id__lte=last_id
+    ).order_by()
+    partial = {}
+    for row in rows.values('form_field_id').annotate(
+        filled=Count('id', filter=~Q(value='')),
+        min_number=Min('value_number'), max_number=Max('value_number'),
+        min_date=Min('value_date'), max_date=Max('value_date'),
+    ):
+        partial[row['form_field_id']] = {**row, 'distribution': defaultdict(int)}
+
+    distributed = [field_id for field_id, field_type in field_types.items() if field_type in DISTRIBUTION_TYPES]
+    values = (
+        rows.filter(form_field_id__in=distributed).exclude(value='')
+        .values('form_field_id', 'value').annotate(count=Count('id'))
+    )
+    for row in values:
+        partial[row['form_field_id']]['distribution'][row['value'][:MAX_VALUE_LENGTH]] += row['count']
+    return partial
+
+
+def _merge_bound(current, bound, pick):
+    if bound is None:
+        return current
+    return bound if current is None else pick(current, bound)
+
+
+def _merge_chunk(merged, partial, limit):
+    for field_id, row in partial.items():
+        stats = merged.get(field_id)
+        if stats is None:
+            continue
+        stats.filled_count += row['filled']
+        for column in ('number', 'date'):
+            setattr(stats, f'min_{column}', _merge_bound(getattr(stats, f'min_{column}'), row[f'min_{column}'], min))
+            setattr(stats, f'max_{column}', _merge_bound(getattr(stats, f'max_{column}'), row[f'max_{column}'], max))
+        if stats.distribution is not None:
+            for value, count in row['distribution'].items():
+                stats.distribution[value] = stats.distribution.get(value, 0) + count
+            if len(stats.distribution) > limit:
+                stats.distribution = None
+
+
+def compute_template_stats(template_id, workers=1, chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    ``(employee_count, {field_id: unsaved FieldStats})`` computed from
+    ``EmployeeField``, in chunks of ``chunk_size`` employees spread over
+    ``workers`` threads.
+    """
+    field_types = dict(FormField.objects.filter(form_template_id=template_id).values_list('id', 'field_type'))
+    employee_ids = list(
+        Employee.objects.filter(form_template_id=template_id).order_by('id').values_list('id', flat=True)
+    )
+    chunks = [
+        (employee_ids[start], employee_ids[min(start + chunk_size, len(employee_ids)) - 1])
+        for start in range(0, len(employee_ids), chunk_size)
+    ]
+
+    def run_in_thread(chunk):
+        # each worker thread gets its own connection; close it when done
+        try:
+            return _chunk_stats(template_id, field_types, *chunk)
+        finally:
+            connections.close_all()
+
+    if workers > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            partials = pool.map(run_in_thread, chunks)
+    else:
+        partials = (_chunk_stats(template_id, field_types, *chunk) for chunk in chunks)
+
+    merged = {
+        field_id: new_field_stats(field_id, template_id, field_type)
+        for field_id, field_type in field_types.items()
+    }
+    limit = stats_setting('DISTRIBUTION_LIMIT')
+    for partial in partials:
+        _merge_chunk(merged, partial, limit)
+    return len(employee_ids), merged
+
+
+def _drift(stored, computed):
+    """Names of the columns in which ``stored`` differs from ``computed``."""
+    if stored is None:
+        # no row is the same as a row of a field without values
+        blank = computed.filled_count == 0 and not computed.distribution and all(
+            getattr(computed, f'{bound}_{column}') is None for bound in ('min', 'max') for column in ('number', 'date')
+        )
+        return [] if blank else ['missing']
+    return [
+        column for column in FIELD_STATS_COLUMNS
+        if getattr(stored, column) != getattr(computed, column)
+    ]
+
+
+def rebuild_template_stats(template_id, rebuild=True, workers=1, chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    Recompute a template's stats and report drift from the stored ones as
+    ``{'missing': bool, 'employee_count': bool, 'fields': {field_id: [column, ...]}}``;
+    with ``rebuild`` the stored stats are replaced.
+
+    The ``TemplateStats`` row stays locked meanwhile, so no delta is applied
+    between the recount and the write; deltas of values written during the
+    recount wait and are applied on top.
+    """
+    with transaction.atomic():
+        template_stats = TemplateStats.objects.select_for_update().filter(pk=template_id).first()
+        missing = template_stats is None
+        if missing:
+            template_stats = TemplateStats(form_template_id=template_id)
+        stored = {stats.form_field_id: stats for stats in FieldStats.objects.filter(form_template_id=template_id)}
+
+        employee_count, computed = compute_template_stats(template_id, workers=workers, chunk_size=chunk_size)
+        drift = {
+            'missing': missing,
+            'employee_count': missing or template_stats.employee_count != employee_count,
+            'fields': {},
+        }
+        for field_id, stats in computed.items():
+            columns = _drift(stored.get(field_id), stats)
+            if columns:
+                drift['fields'][field_id] = columns
+
+        if rebuild and (drift['employee_count'] or drift['fields']):
+            template_stats.employee_count = employee_count
+            template_stats.save()
+            FieldStats.objects.bulk_create(
+                list(computed.values()),
+                update_conflicts=True,
+                unique_fields=['form_field'],
+                update_fields=FIELD_STATS_COLUMNS,
+            )
+    return drift
+
+
+def template_stats_data(template_id):
+    """The stats served by the stats endpoint, or ``None`` if never computed."""
+    template_stats = TemplateStats.objects.filter(pk=template_id).first()
+    if template_stats is None:
+        return None
+    employee_count = template_stats.employee_count
+
+    fields = []
+    # fields without a stats row have had no value since the last rebuild
+    for field in (
+        FormField.objects.filter(form_template_id=template_id, retired_at__isnull=True)
+        .select_related('stats').order_by('order', 'id')
+    ):
+        stats = getattr(field, 'stats', None) or new_field_stats(field.id, template_id, field.field_type)
+        data = {
+            'id': field.id,
+            'label': field.label,
+            'field_type': field.field_type,
+            'filled': stats.filled_count,
+            'fill_rate': round(stats.filled_count / employee_count, 4) if employee_count else None,
+        }
+        column = BOUND_COLUMNS.get(field.field_type)
+        if column == 'number':
+            data['min'], data['max'] = (
+                None if bound is None else format(bound.normalize(), 'f')
+                for bound in (stats.min_number, stats.max_number)
+            )
+        elif column == 'date':
+            data['min'], data['max'] = stats.min_date, stats.max_date
+        if field.field_type in DISTRIBUTION_TYPES:
+            data['distribution'] = None if stats.distribution is None else [
+                {'value': value, 'count': count}
+                for value, count in sorted(stats.distribution.items(), key=lambda item: (-item[1], item[0]))
+            ]
+        fields.append(data)
+
+    return {
+        'template': template_id,
+        'employee_count': employee_count,
+        'fields': fields,
+        'updated_at': template_stats.updated_at,
+    }
@@ -0,0 +1,84 @@
+"""
+Employee submissions against a form template.
+
+A batch is validated against the template's compiled validator, then
+every valid record is written with two bulk INSERTs (``Employee`` then
+``EmployeeField``) inside a single transaction. Invalid records are reported
+by index and simply left out of the write.
+"""
+from django.db import transaction
+
+# model
+from .documents import save_documents
+from .models import Employee, EmployeeDocument, EmployeeField
+from .search import index_employee_fields
+from .stats import StatsDelta, apply_stats_delta
+from .validators import get_validator
+
+
+# rows per INSERT statement for EmployeeField
+FIELD_BATCH_SIZE = 2000
+
+
+def validate_submissions(schema, records):
+    """
+    Validate ``records`` against a compiled template schema.
+
+    See ``employee.validators.TemplateValidator.validate`` for the result.
+    """
+    return get_validator(schema).validate(records)
+
+
+def create_employees(schema, valid):
+    """
+    Write validated records; returns ``[(index, employee_id), ...]``.
+
+    ``valid`` is the first element returned by ``validate_submissions`` for
+    the same ``schema``. Typed value columns are filled here as well, since
+    ``bulk_create`` does not go through ``EmployeeField.save``, and so are the
+    search postings, the employee documents and the template statistics.
+    """
+    if not valid:
+        return []
+
+    field_types = {field['id']: field['field_type'] for field in schema['fields']}
+    with transaction.atomic():
+        employees = Employee.objects.bulk_create(
+            [Employee(form_template_id=schema['id']) for _ in valid]
+        )
+        employee_fields = EmployeeField.objects.bulk_create(
+            [
+                EmployeeField(
+                    employee=employee, form_field_id=field_id, value=text,
+                    **EmployeeField.typed_values(field_types[field_id], text)
+                )
+                for employee, (_, values) in zip(employees, valid)
+                for field_id, text in values
+            ],
+            batch_size=FIELD_BATCH_SIZE,
+        )
+        index_employee_fields(employee_fields, field_types)
+
+        labels = {field['id']: field['label'] for field in schema['fields']}
+        save_documents([
+            EmployeeDocument(
+                employee=employee,
+                form_template_id=schema['id'],
+                data={
+                    labels[field_id]: text for field_id, text in values
+                    if field_types[field_id] not in EmployeeField.HIDDEN_TYPES
+                },
+            )
+            for employee, (_, values) in zip(employees, valid)
+        ])
+
+        delta = StatsDelta(schema['id'])
+        delta.employees = len(employees)
+        for employee_field in employee_fields:
+            delta.add(
+                employee_field.form_field_id, field_types[employee_field.form_field_id], employee_field.value,
+                employee_field.value_number, employee_field.value_date,
+            )
+        apply_stats_delta(delta)
+
+    return [(index, employee.id) for employee, (index, _) in zip(employees, valid)]
@@ -0,0 +1,158 @@
+"""
+Background jobs (``jobs.registry``) for work too heavy for a request.
+
+Exports are written to ``exports/`` and imports read from the upload saved
+under ``imports/``, both in the ``private`` storage (``STORAGES``): they hold
+employee data, so they are kept outside ``MEDIA_ROOT``. An export is
+downloaded through ``/employee/exports/<job id>/`` by the user who queued it
+and deleted ``TTL`` seconds after it was written by the periodic
+``employee.prune_exports``. A retried import resumes from the last chunk its
+``EmployeeImport`` committed.
+
+Settings (all optional)::
+
+    EMPLOYEE_EXPORTS = {
+        'TTL': 86400,   # seconds an export file is kept
+    }
+"""
+import io
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.urls import reverse
+from django.utils import timezone
+
+# model
+from .models import EmployeeImport
+
+# services
+from jobs.registry import JobError, task
+from .cache import schema_cache
+from .documents import rebuild_template_documents
+from .export import EXPORT_FORMATS, count_employee_records
+from .importer import CSVImportError, EmployeeImporter
+from .search import drop_field_postings, rebuild_search_index
+from .stats import rebuild_template_stats
+
+
+EXPORT_DIR = 'exports'
+IMPORT_DIR = 'imports'
+
+DEFAULTS = {
+    'TTL': 86400,
+}
+
+
+def export_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'EMPLOYEE_EXPORTS', {})}[name]
+
+
+def private_storage():
+    return storages['private']
+
+
+def export_expires_at(finished_at):
+    return finished_at + timedelta(seconds=export_setting('TTL'))
+
+
+@task('employee.export')
+def export_employees(job, template_id, output='csv'):
+    schema = schema_cache.get(template_id)
+    if schema is None:
+        raise JobError("Form template not found")
+    if output not in EXPORT_FORMATS:
+        raise JobError(f"Unsupported output '{output}'")
+
+    stream, _, extension = EXPORT_FORMATS[output]
+    total = count_employee_records(schema)
+    job.progress(0, total, force=True)
+    # csv starts with a header line
+    rows = -1 if output == 'csv' else 0
+    with tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR) as temporary:
+        for chunk in stream(schema):
+            temporary.write(chunk.encode('utf-8'))
+            rows += 1
+            job.progress(max(rows, 0))
+        temporary.seek(0)
+        name = private_storage().save(
+            f"{EXPORT_DIR}/form-{template_id}-employees-{job.id}.{extension}", File(temporary)
+        )
+    job.progress(rows, force=True)
+    return {
+        'path': name,
+        'url': reverse('employee-export-download', args=[job.id]),
+        'rows': rows,
+        'expires_at': export_expires_at(timezone.now()).isoformat(),
+    }
+
+
+@task('employee.prune_exports', max_attempts=1)
+def prune_exports(job):
+    storage = private_storage()
+    if not storage.exists(EXPORT_DIR):
+        return {'deleted': 0}
+    cutoff = timezone.now() - timedelta(seconds=export_setting('TTL'))
+    deleted = 0
+    for name in storage.listdir(EXPORT_DIR)[1]:
+        path = f"{EXPORT_DIR}/{name}"
+        if storage.get_modified_time(path) < cutoff:
+            storage.delete(path)
+            deleted += 1
+    return {'deleted': deleted}
+
+
+@task('employee.import')
+def import_employees(job, import_id, path):
+    employee_import = EmployeeImport.objects.filter(pk=import_id).first()
+    if employee_import is None:
+        raise JobError("Import not found")
+    schema = schema_cache.get(employee_import.form_template_id)
+    if schema is None:
+        raise JobError("Form template not found")
+
+    importer = EmployeeImporter(
+        schema, employee_import, progress=lambda counts: job.progress(counts['rows_processed'])
+    )
+    storage = private_storage()
+    try:
+        with storage.open(path, 'rb') as upload:
+            importer.run(io.TextIOWrapper(upload, encoding='utf-8-sig', newline=''))
+    except (CSVImportError, UnicodeDecodeError) as e:
+        storage.delete(path)
+        raise JobError(str(e))
+    # kept until here so a retry can resume from it
+    storage.delete(path)
+
+    employee_import.refresh_from_db()
+    job.progress(employee_import.rows_processed, force=True)
+    return {
+        'import': employee_import.id,
+        'rows_processed': employee_import.rows_processed,
+        'rows_created': employee_import.rows_created,
+        'error_count': employee_import.error_count,
+    }
+
+
+@task('employee.rebuild_search_index', max_attempts=1)
+def rebuild_search(job, batch_size=5000):
+    return {'indexed': rebuild_search_index(batch_size=batch_size, progress=job.progress)}
+
+
+@task('employee.drop_field_postings')
+def drop_postings(job, field_ids):
+    return {'deleted': drop_field_postings(field_ids, progress=job.progress)}
+
+
+@task('employee.rebuild_documents')
+def rebuild_documents(job, template_id):
+    rebuild_template_documents(template_id)
+    return {'template': template_id}
+
+
+@task('employee.rebuild_stats')
+def rebuild_stats(job, template_id):
+    drift = rebuild_template_stats(template_id)
+    return {'template': template_id, 'drifted_fields': len(drift['fields'])}
@@ -1,3 +1,1271 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import types
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import include, path, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from jobs.models import Job
+from jobs.registry import enqueue
+from jobs.runner import claim_jobs, execute_job
+from user_auth.authentication import principal_cache
+from user_auth.models import User
+
+from .benchmarks import ENDPOINTS, compare, generate_dataset, percentile, run_suite
+from .cache import TemplateSchemaCache, schema_cache
+from .documents import rebuild_template_documents
+from .export import stream_csv
+from .importer import EmployeeImporter
+from .models import Employee, EmployeeDocument, EmployeeImport, EmployeeField, FieldStats, FormField, FormTemplate
+from .models import SearchPosting, TemplateStats
+from .queries import apaginate_sorted, encode_sort_cursor, filter_employees, parse_employee_query
+from .search import search_employees
+from .services import assign_orders
+from .stats import rebuild_template_stats
+from .submissions import create_employees, validate_submissions
+from .tasks import private_storage
+from .urls import employee_urlpatterns
+from .validators import TemplateValidator, ValidatorCache
+
+
+class APITestCase(TestCase):
+    """Requests as a logged-in user against empty caches."""
+
+    def setUp(self):
+        schema_cache.clear()
+        principal_cache.clear()
+        self.user = User.objects.create_user(email='hr@example.com', username='hr', password='secret-pass')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def create_template(self, fields, name='Onboarding'):
+        response = self.client.post(reverse('form-templates'), {'name': name, 'fields': fields}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def run_jobs(self):
+        """Run the queued jobs here, as ``manage.py run_jobs`` would."""
+        # the runner closes connections between jobs, which would end the test transaction
+        with mock.patch('jobs.runner.close_old_connections'):
+            for job_id in claim_jobs('tests', limit=100):
+                execute_job(job_id)
+
+
+class FormTemplateCreateTests(APITestCase):
+
+    def test_duplicate_labels(self):
+        fields = [{'label': 'Name', 'field_type': 'text'}, {'label': 'Name', 'field_type': 'email'}]
+        response = self.client.post(reverse('form-templates'), {'name': 'T', 'fields': fields}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Field labels must be unique'})
+        self.assertFalse(FormTemplate.objects.exists())
+
+    def test_invalid_field_type(self):
+        fields = [{'label': 'Name', 'field_type': 'colour'}]
+        response = self.client.post(reverse('form-templates'), {'name': 'T', 'fields': fields}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_import_list_body(self):
+        templates = [
+            {'name': f'T{i}', 'fields': [{'label': 'Name', 'field_type': 'text'}]} for i in range(3)
+        ]
+        response = self.client.post(reverse('form-template-import'), templates, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(FormTemplate.objects.count(), 3)
+
+    def test_import_object_body(self):
+        templates = [{'name': 'T', 'fields': [{'label': 'Name', 'field_type': 'text'}]}]
+        response = self.client.post(reverse('form-template-import'), {'templates': templates}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_import_invalid_bodies(self):
+        for body in ([], {}, {'templates': 'x'}, 'text'):
+            response = self.client.post(reverse('form-template-import'), body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_import_is_all_or_nothing(self):
+        templates = [
+            {'name': 'Good', 'fields': [{'label': 'Name', 'field_type': 'text'}]},
+            {'name': 'Bad', 'fields': [{'label': 'A', 'field_type': 'text'}, {'label': 'A', 'field_type': 'text'}]},
+        ]
+        response = self.client.post(reverse('form-template-import'), templates, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [{'index': 1, 'error': 'Field labels must be unique'}])
+        self.assertFalse(FormTemplate.objects.exists())
+
+
+class AssignOrdersTests(SimpleTestCase):
+
+    def fields(self, *orders):
+        return [FormField(pk=pk, order=order) for pk, order in enumerate(orders, start=1)]
+
+    def test_unchanged(self):
+        fields = self.fields(1, 2, 3)
+        self.assertEqual(assign_orders(fields), [])
+        self.assertEqual([field.order for field in fields], [1, 2, 3])
+
+    def test_move_last_to_first(self):
+        first, second, third, last = self.fields(1, 2, 3, 4)
+        self.assertEqual(assign_orders([last, first, second, third]), [last])
+        self.assertEqual([field.order for field in (last, first, second, third)], [0, 1, 2, 3])
+
+    def test_run_of_new_fields(self):
+        first, second = self.fields(10, 20)
+        new = [FormField(order=None) for _ in range(3)]
+        sequence = [first, *new, second]
+        self.assertEqual(assign_orders(sequence), [])
+        self.assertEqual([field.order for field in sequence], [10, 11, 12, 13, 20])
+
+    def test_new_fields_at_the_ends(self):
+        first, second = self.fields(5, 6)
+        sequence = [FormField(order=None), first, second, FormField(order=None), FormField(order=None)]
+        self.assertEqual(assign_orders(sequence), [])
+        self.assertEqual([field.order for field in sequence], [0, 5, 6, 7, 8])
+
+    def test_renumbers_without_room(self):
+        first, second, third = self.fields(1, 2, 3)
+        sequence = [first, FormField(order=None), second, third]
+        self.assertEqual(assign_orders(sequence), [second, third])
+        self.assertEqual([field.order for field in sequence], [1, 2, 3, 4])
+
+    def test_reversed(self):
+        fields = self.fields(1, 2, 3)
+        sequence = fields[::-1]
+        assign_orders(sequence)
+        orders = [field.order for field in sequence]
+        self.assertEqual(orders, sorted(set(orders)))
+
+
+class TemplatePatchTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.template = self.create_template([
+            {'label': 'Name', 'field_type': 'text'},
+            {'label': 'Team', 'field_type': 'text'},
+            {'label': 'Age', 'field_type': 'number'},
+        ])
+        self.url = reverse('form-template-detail', args=[self.template['id']])
+        self.ids = {field['label']: field['id'] for field in self.template['fields']}
+        response = self.client.post(
+            reverse('form-submit', args=[self.template['id']]),
+            {'values': {'Name': 'Ada', 'Team': 'Payroll', 'Age': '36'}}, format='json'
+        )
+        self.employee_id = response.json()['created'][0]['id']
+
+    def patch(self, body, status_code=200):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, body, format='json')
+        self.assertEqual(response.status_code, status_code, response.content)
+        return response.json()
+
+    def document(self):
+        return EmployeeDocument.objects.get(employee_id=self.employee_id).data
+
+    def test_rename_rebuilds_documents_in_a_job(self):
+        schema = self.patch({'change': [{'id': self.ids['Team'], 'label': 'Department'}]})
+        self.assertEqual([field['label'] for field in schema['fields']], ['Name', 'Department', 'Age'])
+        # the request only queues the rebuild
+        self.assertIn('Team', self.document())
+        self.patch({'change': [{'id': self.ids['Name'], 'label': 'Full name'}]})
+        self.assertEqual(Job.objects.filter(name='employee.rebuild_documents', status='queued').count(), 1)
+        self.run_jobs()
+        self.assertEqual(self.document(), {'Full name': 'Ada', 'Department': 'Payroll', 'Age': '36'})
+
+    def test_remove_drops_postings_in_a_job(self):
+        schema = self.patch({'remove': [self.ids['Team']]})
+        self.assertEqual([field['label'] for field in schema['fields']], ['Name', 'Age'])
+        self.assertTrue(SearchPosting.objects.filter(employee_field__form_field_id=self.ids['Team']).exists())
+        self.run_jobs()
+        self.assertFalse(SearchPosting.objects.filter(employee_field__form_field_id=self.ids['Team']).exists())
+        self.assertEqual(search_employees('payroll'), [])
+        self.assertEqual(self.document(), {'Name': 'Ada', 'Age': '36'})
+        self.assertEqual(Job.objects.exclude(status='succeeded').count(), 0)
+
+    def test_add_and_reorder(self):
+        schema = self.patch({
+            'add': [{'label': 'Phone', 'field_type': 'text', 'after': None}, {'label': 'Email', 'field_type': 'email'}],
+            'order': [self.ids['Age'], self.ids['Team'], self.ids['Name']],
+        })
+        self.assertEqual([field['label'] for field in schema['fields']], ['Phone', 'Age', 'Team', 'Name', 'Email'])
+        self.assertFalse(Job.objects.exists())
+        fetched = self.client.get(self.url).json()
+        self.assertEqual([field['label'] for field in fetched['fields']], ['Phone', 'Age', 'Team', 'Name', 'Email'])
+
+    def test_errors(self):
+        cases = [
+            ({'remove': [999]}, 'Unknown field ids: 999'),
+            ({'change': [{'id': self.ids['Team'], 'label': 'Name'}]}, 'Field labels must be unique'),
+            ({'remove': list(self.ids.values())}, 'At least one field is required'),
+            ({'order': [self.ids['Name']]}, "'order' must list every remaining field exactly once"),
+            # True == 1 would otherwise change field 1
+            ({'change': [{'id': True, 'label': 'X'}]}, 'Change at index 0 is missing a field id'),
+        ]
+        for body, error in cases:
+            self.assertEqual(self.patch(body, status_code=400), {'error': error})
+        self.assertFalse(Job.objects.exists())
+        self.assertFalse(FormField.objects.filter(retired_at__isnull=False).exists())
+
+    def test_unknown_template(self):
+        response = self.client.patch(reverse('form-template-detail', args=[999]), {'name': 'X'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class SubmissionTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.template = self.create_template([
+            {'label': 'Name', 'field_type': 'text', 'required': True},
+            {'label': 'Age', 'field_type': 'number'},
+            {'label': 'Start', 'field_type': 'date'},
+            {'label': 'Email', 'field_type': 'email'},
+        ])
+        self.url = reverse('form-submit', args=[self.template['id']])
+
+    def test_batch_keeps_valid_records(self):
+        employees = [
+            {'Name': 'Ada', 'Age': '36'},
+            {'Age': '40'},
+            {'Name': 'Bob', 'Age': 'old', 'Start': '2024-13-01', 'Email': 'nope', 'Shoe size': 9},
+            {'Name': 'Cy'},
+        ]
+        response = self.client.post(self.url, {'employees': employees}, format='json')
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual([created['index'] for created in data['created']], [0, 3])
+        errors = {error['index']: sorted(e['code'] for e in error['errors']) for error in data['errors']}
+        self.assertEqual(errors, {1: ['required'], 2: ['invalid', 'invalid', 'invalid', 'unknown_field']})
+        self.assertEqual(Employee.objects.count(), 2)
+
+    def test_numbers_are_stored_as_submitted(self):
+        response = self.client.post(self.url, {'values': {'Name': 'Ada', 'Age': ' 1e3 '}}, format='json')
+        self.assertEqual(response.status_code, 201)
+        value = EmployeeField.objects.get(form_field__label='Age')
+        self.assertEqual(value.value, '1e3')
+        self.assertEqual(value.value_number, Decimal(1000))
+
+    def test_non_finite_numbers(self):
+        for number in ('NaN', 'sNaN', 'Infinity', '-inf'):
+            response = self.client.post(self.url, {'values': {'Name': 'Ada', 'Age': number}}, format='json')
+            self.assertEqual(response.status_code, 400, number)
+            self.assertEqual(response.json()['errors'][0]['errors'][0]['code'], 'invalid')
+
+    def test_invalid_bodies(self):
+        for body in ([{'Name': 'Ada'}], {}, {'employees': []}, {'employees': 'Ada'}):
+            response = self.client.post(self.url, body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+        self.assertFalse(Employee.objects.exists())
+
+    def test_unknown_template(self):
+        response = self.client.post(reverse('form-submit', args=[999]), {'values': {'Name': 'Ada'}}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class EmployeeQueryTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.template = self.create_template([
+            {'label': 'Name', 'field_type': 'text', 'required': True},
+            {'label': 'Age', 'field_type': 'number'},
+        ])
+        self.url = reverse('employee-list', args=[self.template['id']])
+        records = [
+            {'Name': 'Ada', 'Age': '30'}, {'Name': 'Bob', 'Age': '25'}, {'Name': 'Cy'},
+            {'Name': 'Di', 'Age': '40'}, {'Name': 'Ed', 'Age': '25'}, {'Name': 'Flo'},
+        ]
+        response = self.client.post(
+            reverse('form-submit', args=[self.template['id']]), {'employees': records}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.ids = {records[created['index']]['Name']: created['id'] for created in response.json()['created']}
+
+    def names(self, params, limit):
+        names, cursor = [], None
+        while True:
+            page = self.client.get(self.url, {**params, 'limit': limit, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(page.status_code, 200, page.content)
+            names += [employee['values']['Name'] for employee in page.json()['results']]
+            cursor = page.json()['next_cursor']
+            if cursor is None:
+                return names
+
+    def test_filters(self):
+        self.assertEqual(sorted(self.names({'Age__gte': '30'}, 10)), ['Ada', 'Di'])
+        self.assertEqual(sorted(self.names({'Age__isnull': 'true'}, 10)), ['Cy', 'Flo'])
+        self.assertEqual(self.names({'Name__startswith': 'F'}, 10), ['Flo'])
+
+    def test_sort_pages(self):
+        for limit in (1, 2, 4, 10):
+            self.assertEqual(self.names({'sort': 'Age'}, limit), ['Bob', 'Ed', 'Ada', 'Di', 'Cy', 'Flo'], limit)
+            self.assertEqual(self.names({'sort': '-Age'}, limit), ['Di', 'Ada', 'Ed', 'Bob', 'Flo', 'Cy'], limit)
+
+    def test_sort_with_filter(self):
+        self.assertEqual(self.names({'sort': '-Age', 'Age__lt': '40'}, 1), ['Ada', 'Ed', 'Bob'])
+
+    async def test_async_sort_pages(self):
+        schema = await schema_cache.aget(self.template['id'])
+        predicates, sort = parse_employee_query(schema, {'sort': 'Age'})
+        queryset = filter_employees(schema, predicates)
+        employees, cursor = [], None
+        while True:
+            page, cursor = await apaginate_sorted(queryset, sort, cursor=cursor, page_size=4)
+            employees += page
+            if cursor is None:
+                break
+        self.assertEqual(
+            [employee.id for employee in employees],
+            [self.ids[name] for name in ('Bob', 'Ed', 'Ada', 'Di', 'Cy', 'Flo')]
+        )
+
+    def test_non_finite_filter_values(self):
+        for value in ('NaN', 'sNaN', 'Infinity', '-inf'):
+            response = self.client.get(self.url, {'Age__gt': value})
+            self.assertEqual(response.status_code, 400, value)
+            self.assertEqual(response.json(), {'error': f"Invalid value '{value}' for field 'Age'"})
+
+    def test_invalid_cursors(self):
+        sorted_cursor = self.client.get(self.url, {'sort': 'Age', 'limit': 1}).json()['next_cursor']
+        for params in (
+            {'cursor': 'garbage'},
+            {'sort': 'Age', 'cursor': 'garbage'},
+            {'sort': 'Age', 'cursor': encode_sort_cursor(1, 'NaN')},
+            # a sorted cursor does not page the unsorted list
+            {'cursor': sorted_cursor},
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+    def test_unknown_sort_field(self):
+        response = self.client.get(self.url, {'sort': 'Height'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PasswordMaskingTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.template = self.create_template([
+            {'label': 'Name', 'field_type': 'text'},
+            {'label': 'Code', 'field_type': 'password'},
+        ], name='Staff')
+        self.other = self.create_template([
+            {'label': 'Name', 'field_type': 'text'},
+            {'label': 'Code', 'field_type': 'text'},
+        ], name='Visitors')
+        self.employee_id = self.submit(self.template, {'Name': 'Ada', 'Code': 's3cret'})
+        self.visitor_id = self.submit(self.other, {'Name': 'Adam', 'Code': 'blue'})
+
+    def submit(self, template, values):
+        response = self.client.post(reverse('form-submit', args=[template['id']]), {'values': values}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['created'][0]['id']
+
+    def test_detail(self):
+        response = self.client.get(reverse('employee-detail', args=[self.employee_id]))
+        self.assertEqual(response.json()['values'], {'Name': 'Ada'})
+        # stored all the same
+        self.assertEqual(EmployeeField.objects.get(employee_id=self.employee_id, form_field__label='Code').value, 's3cret')
+
+    def test_list(self):
+        response = self.client.get(reverse('employee-list', args=[self.template['id']]))
+        self.assertEqual([employee['values'] for employee in response.json()['results']], [{'Name': 'Ada'}])
+
+    def test_search_masks_per_template(self):
+        response = self.client.get(reverse('employee-search'), {'q': 'ada'})
+        values = {result['id']: result['values'] for result in response.json()['results']}
+        self.assertEqual(values, {self.employee_id: {'Name': 'Ada'}, self.visitor_id: {'Name': 'Adam', 'Code': 'blue'}})
+
+    def test_single_value_writes(self):
+        employee_field = EmployeeField.objects.get(employee_id=self.employee_id, form_field__label='Code')
+        employee_field.value = 'changed'
+        employee_field.save()
+        self.assertEqual(EmployeeDocument.objects.get(employee_id=self.employee_id).data, {'Name': 'Ada'})
+
+    def test_rebuilt_documents(self):
+        EmployeeDocument.objects.all().delete()
+        response = self.client.get(reverse('employee-detail', args=[self.employee_id]))
+        self.assertEqual(response.json()['values'], {'Name': 'Ada'})
+        rebuild_template_documents(self.template['id'])
+        self.assertEqual(EmployeeDocument.objects.get(employee_id=self.employee_id).data, {'Name': 'Ada'})
+
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.private_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.private_root)
+        storages = override_settings(STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'private': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                'OPTIONS': {'location': self.private_root},
+            },
+        })
+        storages.enable()
+        self.addCleanup(storages.disable)
+
+        self.template = self.create_template([
+            {'label': 'Name', 'field_type': 'text'},
+            {'label': 'Code', 'field_type': 'password'},
+        ])
+        records = [{'Name': 'Ada', 'Code': 'a1'}, {'Name': 'Bob'}, {'Code': 'only-a-secret'}]
+        self.client.post(
+            reverse('form-submit', args=[self.template['id']]), {'employees': records}, format='json'
+        )
+
+    def export(self, output='csv'):
+        response = self.client.post(
+            reverse('employee-export', args=[self.template['id']]), {'output': output}, format='json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.run_jobs()
+        return Job.objects.get(pk=response.json()['id'])
+
+    def download(self, job, client=None):
+        return (client or self.client).get(job.result['url'])
+
+    def test_streamed_csv(self):
+        self.client.post(
+            reverse('form-submit', args=[self.template['id']]),
+            {'values': {'Name': 'Smith, "Jo"\nJr'}}, format='json'
+        )
+        schema = schema_cache.get(self.template['id'])
+        # rows span several fetches from the cursor
+        rows = list(csv.reader(io.StringIO(''.join(stream_csv(schema, chunk_size=1)))))
+        employee_ids = [int(row[0]) for row in rows[1:]]
+        self.assertEqual(employee_ids, sorted(employee_ids))
+        self.assertEqual([row[1] for row in rows[1:]], ['Ada', 'Bob', 'Smith, "Jo"\nJr'])
+
+    def test_streamed_ndjson(self):
+        response = self.client.get(reverse('employee-export', args=[self.template['id']]), {'output': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('form-%d-employees.ndjson' % self.template['id'], response['Content-Disposition'])
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['Name'] for record in records], ['Ada', 'Bob'])
+
+    def test_export_errors(self):
+        url = reverse('employee-export', args=[self.template['id']])
+        for response in (
+            self.client.get(url, {'output': 'xlsx'}),
+            self.client.post(url, {'output': 'xlsx'}, format='json'),
+        ):
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': "Unsupported output 'xlsx', use one of: csv, ndjson"})
+        missing = reverse('employee-export', args=[999])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+        self.assertEqual(self.client.post(missing, {}, format='json').status_code, 404)
+        self.assertFalse(Job.objects.exists())
+
+    def test_streamed_export_leaves_out_passwords(self):
+        response = self.client.get(reverse('employee-export', args=[self.template['id']]))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'employee_id,Name')
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], ['Ada', 'Bob'])
+
+    def test_background_export(self):
+        job = self.export('ndjson')
+        self.assertEqual(job.status, 'succeeded')
+        # the employee with only a password value is neither exported nor counted
+        self.assertEqual((job.progress, job.progress_total, job.result['rows']), (2, 2, 2))
+        self.assertFalse(job.result['path'].startswith(settings.MEDIA_ROOT))
+        self.assertTrue(os.path.exists(os.path.join(self.private_root, job.result['path'])))
+
+        response = self.download(job)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment', response['Content-Disposition'])
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([sorted(record) for record in records], [['Name', 'employee_id']] * 2)
+        self.assertEqual([record['Name'] for record in records], ['Ada', 'Bob'])
+
+    def test_download_is_for_the_owner_only(self):
+        job = self.export()
+        other = User.objects.create_user(email='other@example.com', username='other', password='secret-pass')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(other)}')
+        self.assertEqual(self.download(job, client).status_code, 404)
+        self.assertEqual(APIClient().get(job.result['url']).status_code, 401)
+        self.assertEqual(self.download(job).status_code, 200)
+
+    def test_expired_exports(self):
+        job = self.export()
+        Job.objects.filter(pk=job.pk).update(finished_at=timezone.now() - timedelta(days=2))
+        job.refresh_from_db()
+        self.assertEqual(self.download(job).status_code, 410)
+
+        path = os.path.join(self.private_root, job.result['path'])
+        old = (timezone.now() - timedelta(days=2)).timestamp()
+        os.utime(path, (old, old))
+        fresh = self.export()
+        enqueue('employee.prune_exports')
+        self.run_jobs()
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(private_storage().exists(fresh.result['path']))
+
+
+class FormTemplateListTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.templates = [
+            self.create_template([{'label': f'F{i}', 'field_type': 'text'} for i in range(count)], name=name)
+            for name, count in [('Alpha', 1), ('Beta', 2), ('Alpine', 3), ('Gamma', 1), ('Alps', 2)]
+        ]
+
+    def page(self, **params):
+        response = self.client.get(reverse('form-templates'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_pages_newest_first(self):
+        names, cursor = [], None
+        while True:
+            page = self.page(limit=2, **({'cursor': cursor} if cursor else {}))
+            self.assertLessEqual(len(page['results']), 2)
+            names += [(template['name'], template['fields_count']) for template in page['results']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(names, [('Alps', 2), ('Gamma', 1), ('Alpine', 3), ('Beta', 2), ('Alpha', 1)])
+
+    def test_fields_count_leaves_out_retired_fields(self):
+        template = self.templates[2]
+        self.client.patch(
+            reverse('form-template-detail', args=[template['id']]),
+            {'remove': [template['fields'][0]['id']]}, format='json'
+        )
+        counts = {result['name']: result['fields_count'] for result in self.page()['results']}
+        self.assertEqual(counts['Alpine'], 2)
+
+    def test_name_prefix(self):
+        self.assertEqual([result['name'] for result in self.page(q='Alp')['results']], ['Alps', 'Alpine', 'Alpha'])
+
+    def test_queries_do_not_grow_with_templates(self):
+        with CaptureQueriesContext(connection) as five:
+            self.page()
+        for i in range(5):
+            self.create_template([{'label': 'F', 'field_type': 'text'}], name=f'More {i}')
+        with CaptureQueriesContext(connection) as ten:
+            self.assertEqual(len(self.page()['results']), 10)
+        self.assertEqual(len(five), len(ten))
+        self.assertEqual(len(ten), 1)
+
+    def test_invalid_params(self):
+        for params in ({'cursor': 'garbage'}, {'limit': 'ten'}, {'limit': 0}):
+            response = self.client.get(reverse('form-templates'), params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+        # larger pages are capped, not refused
+        self.assertEqual(len(self.page(limit=1000)['results']), 5)
+
+
+class SchemaCacheTests(TransactionTestCase):
+    """
+    Each ``TemplateSchemaCache`` stands for one worker's cache; writes made
+    with ``QuerySet.update`` fire no signals, as if another worker made them.
+    """
+
+    def setUp(self):
+        caches['default'].clear()
+        self.templates = [FormTemplate.objects.create(name=name) for name in ('Alpha', 'Beta', 'Gamma')]
+        for template in self.templates:
+            FormField.objects.create(form_template=template, label='Name', field_type='text')
+
+    def edit(self, template, **values):
+        FormTemplate.objects.filter(pk=template.pk).update(updated_at=timezone.now(), **values)
+
+    def test_hits(self):
+        cache = TemplateSchemaCache()
+        template = self.templates[0]
+        self.assertEqual(cache.get(template.id)['name'], 'Alpha')
+        # the version lookup only
+        with self.assertNumQueries(1):
+            schema = cache.get(template.id)
+        self.assertIs(cache.get(template.id), schema)
+        self.assertIsNone(cache.get(999))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 2, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_writes_by_other_workers(self):
+        cache = TemplateSchemaCache()
+        template = self.templates[0]
+        cache.get(template.id)
+        self.edit(template, name='Renamed')
+        self.assertEqual(cache.get(template.id)['name'], 'Renamed')
+        self.edit(template, name='Async')
+        self.assertEqual(async_to_sync(cache.aget)(template.id)['name'], 'Async')
+        self.assertEqual(async_to_sync(cache.aget)(template.id)['name'], 'Async')
+        FormTemplate.objects.filter(pk=template.pk).delete()
+        self.assertIsNone(cache.get(template.id))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_eviction(self):
+        cache = TemplateSchemaCache(max_entries=2)
+        first, second, third = self.templates
+        cache.get(first.id)
+        cache.get(second.id)
+        # the least recently used entry goes
+        cache.get(first.id)
+        cache.get(third.id)
+        cache.get(first.id)
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['evictions'], stats['hits']), (2, 1, 2))
+        cache.get(second.id)
+        self.assertEqual(cache.stats()['misses'], 4)
+
+    def test_invalidate(self):
+        cache = TemplateSchemaCache()
+        template = self.templates[0]
+        cache.get(template.id)
+        cache.invalidate(template.id)
+        cache.get(template.id)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['invalidations']), (0, 2, 1))
+
+    def test_shared_tier(self):
+        writer, reader = TemplateSchemaCache(shared_alias='default'), TemplateSchemaCache(shared_alias='default')
+        template = self.templates[0]
+        writer.get(template.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(reader.get(template.id)['name'], 'Alpha')
+            self.assertEqual(reader.get(template.id)['name'], 'Alpha')
+        self.assertEqual(reader.cached_version(template.id), writer.cached_version(template.id))
+        self.assertEqual((reader.stats()['shared_hits'], reader.stats()['hits']), (1, 1))
+
+        self.edit(template, name='Renamed')
+        writer.invalidate(template.id)
+        self.assertIsNone(reader.cached_version(template.id))
+        self.assertEqual(reader.get(template.id)['name'], 'Renamed')
+
+    def test_local_versions_are_not_shared(self):
+        cache = TemplateSchemaCache()
+        cache.get(self.templates[0].id)
+        self.assertIsNone(cache.cached_version(self.templates[0].id))
+
+
+class ImportTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.private_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.private_root)
+        storages = override_settings(STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'private': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                'OPTIONS': {'location': self.private_root},
+            },
+        })
+        storages.enable()
+        self.addCleanup(storages.disable)
+        self.template = self.create_template([
+            {'label': 'Name', 'field_type': 'text', 'required': True},
+            {'label': 'Age', 'field_type': 'number'},
+        ])
+        self.url = reverse('employee-import', args=[self.template['id']])
+
+    def upload(self, text, **data):
+        upload = SimpleUploadedFile('staff.csv', text.encode('utf-8-sig'), content_type='text/csv')
+        return self.client.post(self.url, {'file': upload, **data}, format='multipart')
+
+    def names(self):
+        return sorted(
+            EmployeeField.objects.filter(form_field__label='Name').values_list('value', flat=True)
+        )
+
+    def test_import(self):
+        response = self.upload('employee_id,NAME,age\n7,Ada,36\n8,,40\n9,Bob,old\n10,Cy,\n')
+        self.assertEqual(response.status_code, 201, response.content)
+        data = response.json()
+        self.assertEqual(
+            (data['status'], data['rows_processed'], data['rows_created'], data['error_count']),
+            ('completed', 4, 2, 2)
+        )
+        self.assertEqual([error['row'] for error in data['errors']], [2, 3])
+        self.assertEqual(self.names(), ['Ada', 'Cy'])
+        status = self.client.get(reverse('employee-import-status', args=[data['id']])).json()
+        self.assertEqual(status['rows_created'], 2)
+
+    def test_rejected_files(self):
+        cases = [
+            ('Name,Shoe size\nAda,9\n', 'Unknown columns: Shoe size'),
+            ('', 'The file is empty'),
+        ]
+        for text, error in cases:
+            response = self.upload(text)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['error'], error)
+        response = self.client.post(self.url, {}, format='multipart')
+        self.assertEqual(response.json(), {'error': "A CSV 'file' is required"})
+        response = self.upload('Name\nAda\n', resume=999)
+        self.assertEqual((response.status_code, response.json()), (404, {'error': 'Import not found'}))
+        self.assertFalse(Employee.objects.exists())
+
+    def test_resume_after_a_failed_chunk(self):
+        text = 'Name\n' + ''.join(f'P{i}\n' for i in range(5))
+        calls = []
+
+        def fail_second_chunk(schema, valid):
+            calls.append(len(valid))
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            return create_employees(schema, valid)
+
+        employee_import = EmployeeImport.objects.create(form_template_id=self.template['id'], source_name='s.csv')
+        schema = schema_cache.get(self.template['id'])
+        with mock.patch('employee.importer.create_employees', fail_second_chunk):
+            with self.assertRaises(RuntimeError):
+                EmployeeImporter(schema, employee_import, chunk_size=2).run(io.StringIO(text))
+        employee_import.refresh_from_db()
+        self.assertEqual((employee_import.status, employee_import.rows_processed), ('failed', 2))
+
+        response = self.upload(text, resume=employee_import.id)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['rows_processed'], response.json()['rows_created']), (5, 5))
+        self.assertEqual(self.names(), ['P0', 'P1', 'P2', 'P3', 'P4'])
+
+    def test_background_import(self):
+        response = self.upload('Name,Age\nAda,36\nBob,41\n', background='true')
+        self.assertEqual(response.status_code, 202)
+        import_id = response.json()['import']['id']
+        self.assertEqual(len(os.listdir(os.path.join(self.private_root, 'imports'))), 1)
+        self.run_jobs()
+        employee_import = EmployeeImport.objects.get(pk=import_id)
+        self.assertEqual((employee_import.status, employee_import.rows_created), ('completed', 2))
+        job = Job.objects.get(pk=response.json()['job']['id'])
+        self.assertEqual((job.status, job.result['rows_created']), ('succeeded', 2))
+        # the upload is removed once imported
+        self.assertEqual(os.listdir(os.path.join(self.private_root, 'imports')), [])
+
+
+class SearchTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.template = self.create_template([
+            {'label': 'Name', 'field_type': 'text'},
+            {'label': 'Email', 'field_type': 'email'},
+            {'label': 'Badge', 'field_type': 'number'},
+        ])
+        self.other = self.create_template([{'label': 'Name', 'field_type': 'text'}], name='Visitors')
+        self.ids = {}
+        for template, values in [
+            (self.template, {'Name': 'Rahul Sharma', 'Email': 'rs@example.com', 'Badge': '42'}),
+            (self.template, {'Name': 'Rahul Rahul Mehta', 'Email': 'rm@example.com'}),
+            (self.template, {'Name': 'Priya Sharma', 'Email': 'priya@example.com'}),
+            (self.other, {'Name': 'Rahul Visitor'}),
+        ]:
+            response = self.client.post(
+                reverse('form-submit', args=[template['id']]), {'values': values}, format='json'
+            )
+            self.ids[values['Name']] = response.json()['created'][0]['id']
+
+    def search(self, **params):
+        response = self.client.get(reverse('employee-search'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def names(self, **params):
+        by_id = {employee_id: name for name, employee_id in self.ids.items()}
+        return [by_id[result['id']] for result in self.search(**params)['results']]
+
+    def test_ranking_and_prefixes(self):
+        # most occurrences first, ties by id
+        self.assertEqual(self.names(q='rah'), ['Rahul Rahul Mehta', 'Rahul Sharma', 'Rahul Visitor'])
+        self.assertEqual(self.names(q='RAHUL sharma'), ['Rahul Sharma'])
+        self.assertEqual(self.names(q='example'), ['Rahul Sharma', 'Rahul Rahul Mehta', 'Priya Sharma'])
+        # numbers are not searchable
+        self.assertEqual(self.names(q='42'), [])
+
+    def test_template_filter_and_paging(self):
+        self.assertEqual(self.names(q='rahul', template=self.other['id']), ['Rahul Visitor'])
+        first = self.search(q='rahul', limit=2)
+        self.assertEqual(len(first['results']), 2)
+        rest = self.search(q='rahul', limit=2, offset=first['next_offset'])
+        self.assertEqual(len(rest['results']), 1)
+        self.assertIsNone(rest['next_offset'])
+
+    def test_single_value_writes_reindex(self):
+        value = EmployeeField.objects.get(employee_id=self.ids['Priya Sharma'], form_field__label='Name')
+        value.value = 'Priya Kapoor'
+        value.save()
+        self.assertEqual(self.names(q='sharma'), ['Rahul Sharma'])
+        self.assertEqual(self.names(q='kapoor'), ['Priya Sharma'])
+        value.delete()
+        self.assertEqual(self.names(q='kapoor'), [])
+
+    def test_rebuild(self):
+        SearchPosting.objects.all().delete()
+        self.assertEqual(self.names(q='priya'), [])
+        out = io.StringIO()
+        call_command('rebuild_search_index', '--batch-size', '2', stdout=out)
+        self.assertIn('Done, 7 values indexed', out.getvalue())
+        self.assertEqual(self.names(q='priya'), ['Priya Sharma'])
+
+    def test_errors(self):
+        for params in ({}, {'q': '  '}, {'q': 'a', 'limit': 'x'}, {'q': 'a', 'offset': -1}, {'q': 'a', 'template': 'x'}):
+            response = self.client.get(reverse('employee-search'), params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+
+class ValidatorTests(SimpleTestCase):
+
+    def schema(self, updated_at='2024-01-01T00:00:00+00:00'):
+        return {
+            'id': 1,
+            'updated_at': updated_at,
+            'fields': [
+                {'id': 10, 'label': 'Name', 'field_type': 'text', 'required': True},
+                {'id': 11, 'label': 'Age', 'field_type': 'number', 'required': False},
+                {'id': 12, 'label': 'Start', 'field_type': 'date', 'required': False},
+                {'id': 13, 'label': 'Email', 'field_type': 'email', 'required': False},
+            ],
+        }
+
+    def test_values_in_field_order(self):
+        valid, errors = TemplateValidator(self.schema()).validate([
+            {'Email': ' ada@example.com ', 'Start': '2024-02-01', 'Name': 'Ada'},
+            {'10': 'Bob', '11': 7},
+        ])
+        self.assertEqual(errors, [])
+        self.assertEqual(valid, [
+            (0, [(10, 'Ada'), (12, '2024-02-01'), (13, 'ada@example.com')]),
+            (1, [(10, 'Bob'), (11, '7')]),
+        ])
+
+    def test_error_codes(self):
+        valid, errors = TemplateValidator(self.schema()).validate([
+            ['Ada'],
+            {'Name': '', 'Shoe size': 9},
+            {'Name': 'Cy', 'Age': True, 'Start': '01/02/2024', 'Email': 'nope'},
+            {'Name': 'Di', 'Age': 'Infinity'},
+            {'Name': 'Ed', 'Age': None},
+        ])
+        self.assertEqual(valid, [(4, [(10, 'Ed')])])
+        codes = {error['index']: [(e['field'], e['code']) for e in error['errors']] for error in errors}
+        self.assertEqual(codes, {
+            0: [(None, 'invalid_record')],
+            1: [('Shoe size', 'unknown_field'), ('Name', 'required')],
+            2: [('Age', 'invalid'), ('Start', 'invalid'), ('Email', 'invalid')],
+            3: [('Age', 'invalid')],
+        })
+
+    def test_cache_follows_template_versions(self):
+        cache = ValidatorCache(max_entries=2)
+        validator = cache.get(self.schema())
+        self.assertIs(cache.get(self.schema()), validator)
+        changed = cache.get(self.schema(updated_at='2024-01-02T00:00:00+00:00'))
+        self.assertIsNot(changed, validator)
+        # the least recently used version is dropped
+        cache.get(self.schema(updated_at='2024-01-03T00:00:00+00:00'))
+        self.assertIsNot(cache.get(self.schema()), validator)
+
+
+def employee_urlconf(async_reads):
+    module = types.ModuleType(f'employee_urls_{"async" if async_reads else "sync"}')
+    module.urlpatterns = [path('employee/', include(employee_urlpatterns(async_reads)))]
+    return module
+
+
+class AsyncReadViewTests(TransactionTestCase):
+    """
+    The async read views answer exactly like the sync ones.
+
+    Not a ``TestCase``: the blocking pool's threads only see committed rows.
+    """
+
+    def setUp(self):
+        schema_cache.clear()
+        principal_cache.clear()
+        self.user = User.objects.create_user(email='hr@example.com', username='hr', password='secret-pass')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        response = self.client.post(reverse('form-templates'), {'name': 'Onboarding', 'fields': [
+            {'label': 'Name', 'field_type': 'text', 'required': True},
+            {'label': 'Salary', 'field_type': 'number'},
+        ]}, format='json')
+        self.template = response.json()
+        response = self.client.post(reverse('form-submit', args=[self.template['id']]), {'employees': [
+            {'Name': f'Employee {i}', 'Salary': 1000 + i % 4} for i in range(7)
+        ]}, format='json')
+        self.employee_ids = [created['id'] for created in response.json()['created']]
+
+    def get_both(self, url, **extra):
+        responses = []
+        for async_reads in (False, True):
+            with override_settings(ROOT_URLCONF=employee_urlconf(async_reads)):
+                responses.append(self.client.get(url, **extra))
+        return responses
+
+    def test_same_responses(self):
+        template_id = self.template['id']
+        sort_cursor = self.client.get(
+            reverse('employee-list', args=[template_id]), {'sort': '-Salary', 'limit': 3}
+        ).json()['next_cursor']
+        urls = [
+            reverse('form-templates') + '?limit=1',
+            reverse('form-templates') + '?cursor=garbage',
+            reverse('form-template-detail', args=[template_id]),
+            reverse('form-template-detail', args=[999]),
+            reverse('employee-list', args=[template_id]) + '?limit=3',
+            reverse('employee-list', args=[template_id]) + f'?sort=-Salary&limit=3&cursor={sort_cursor}',
+            reverse('employee-list', args=[template_id]) + '?Salary__gte=1002',
+            reverse('employee-list', args=[template_id]) + '?Salary__gte=NaN',
+            reverse('employee-list', args=[template_id]) + '?sort=Age',
+            reverse('employee-list', args=[999]),
+            reverse('employee-detail', args=[self.employee_ids[2]]),
+            reverse('employee-detail', args=[999]),
+        ]
+        for url in urls:
+            sync_response, async_response = self.get_both(url)
+            self.assertEqual(
+                (async_response.status_code, async_response.content),
+                (sync_response.status_code, sync_response.content), url,
+            )
+
+    def test_documents_built_on_first_read(self):
+        EmployeeDocument.objects.all().delete()
+        with override_settings(ROOT_URLCONF=employee_urlconf(True)):
+            response = self.client.get(reverse('employee-detail', args=[self.employee_ids[0]]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['values'], {'Name': 'Employee 0', 'Salary': '1000'})
+        self.assertTrue(EmployeeDocument.objects.filter(employee_id=self.employee_ids[0]).exists())
+
+    def test_unauthenticated(self):
+        self.client.credentials()
+        for credentials in ({}, {'HTTP_AUTHORIZATION': 'Bearer garbage'}):
+            sync_response, async_response = self.get_both(reverse('form-templates'), **credentials)
+            self.assertEqual(async_response.status_code, 401)
+            self.assertEqual(async_response.json(), sync_response.json())
+            self.assertEqual(async_response['WWW-Authenticate'], sync_response['WWW-Authenticate'])
+
+    def test_writes_go_to_the_sync_views(self):
+        with override_settings(ROOT_URLCONF=employee_urlconf(True)):
+            response = self.client.post(reverse('form-templates'), {'name': 'Exit', 'fields': [
+                {'label': 'Reason', 'field_type': 'text'},
+            ]}, format='json')
+            self.assertEqual(response.status_code, 201)
+            response = self.client.patch(
+                reverse('form-template-detail', args=[self.template['id']]), {'name': 'Joining'}, format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(FormTemplate.objects.get(id=self.template['id']).name, 'Joining')
+
+
+class BenchmarkSuiteTests(TestCase):
+
+    def setUp(self):
+        schema_cache.clear()
+        principal_cache.clear()
+
+    def test_generate_dataset(self):
+        dataset = generate_dataset(templates=2, fields=4, employees=3, batch_size=2)
+        self.assertEqual(len(dataset['template_ids']), 2)
+        self.assertEqual(len(dataset['employee_ids']), 6)
+        self.assertEqual(FormField.objects.filter(form_template_id__in=dataset['template_ids']).count(), 8)
+        self.assertEqual(EmployeeField.objects.count(), 24)
+
+    def test_every_endpoint_succeeds(self):
+        dataset = generate_dataset(templates=2, fields=5, employees=4)
+        seen = []
+        results = run_suite(dataset, requests=2, warmup=1, progress=lambda name, summary: seen.append(name))
+        self.assertEqual(seen, list(ENDPOINTS))
+        for name, summary in results.items():
+            self.assertEqual(summary['requests'], 2, name)
+            self.assertTrue(all(code.startswith('2') for code in summary['status']), (name, summary['status']))
+            self.assertGreater(summary['req_per_s'], 0, name)
+            self.assertLessEqual(summary['p50_ms'], summary['p99_ms'], name)
+            self.assertGreaterEqual(summary['max_queries'], summary['queries'], name)
+
+    def test_percentile(self):
+        values = list(range(100))
+        self.assertEqual((percentile(values, 0.5), percentile(values, 0.99), percentile(values, 1)), (50, 99, 99))
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_compare(self):
+        baseline = {
+            'fast': {'req_per_s': 100, 'p99_ms': 10, 'queries': 2},
+            'slower': {'req_per_s': 100, 'p99_ms': 10, 'queries': 2},
+            'chattier': {'req_per_s': 100, 'p99_ms': 10, 'queries': 2},
+            'gone': {'req_per_s': 100, 'p99_ms': 10, 'queries': 2},
+        }
+        results = {
+            'fast': {'req_per_s': 95, 'p99_ms': 10.5, 'queries': 2},
+            'slower': {'req_per_s': 80, 'p99_ms': 10, 'queries': 2},
+            'chattier': {'req_per_s': 100, 'p99_ms': 10, 'queries': 3},
+            'new': {'req_per_s': 100, 'p99_ms': 10, 'queries': None},
+        }
+        rows = {row[0]: row for row in compare(results, baseline, tolerance=0.10)}
+        self.assertEqual(sorted(rows), ['chattier', 'fast', 'slower'])
+        self.assertFalse(rows['fast'][4])
+        self.assertEqual(rows['slower'][1:], (-0.2, 0.0, 0, True))
+        self.assertEqual(rows['chattier'][3:], (1, True))
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.template = self.create_template([{'label': 'Name', 'field_type': 'text'}])
+        self.url = reverse('form-template-detail', args=[self.template['id']])
+
+    def get(self, url, **headers):
+        return self.client.get(url, headers=headers)
+
+    def test_detail_validators(self):
+        response = self.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(set(response['Cache-Control'].split(', ')), {'private', 'no-cache'})
+        self.assertIn('Authorization', response['Vary'])
+
+        # answered from the template's updated_at alone
+        with self.assertNumQueries(1):
+            response = self.get(self.url, if_none_match=response['ETag'])
+        self.assertEqual((response.status_code, response.content), (304, b''))
+        self.assertEqual(self.get(self.url, if_modified_since=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.get(self.url, if_modified_since='Mon, 01 Jan 2001 00:00:00 GMT').status_code, 200)
+        self.assertEqual(self.get(self.url, if_none_match='"stale"').status_code, 200)
+
+    def test_detail_changes_invalidate(self):
+        etag = self.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {'add': [{'label': 'Email', 'field_type': 'email'}]}, format='json')
+        response = self.get(self.url, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([field['label'] for field in response.json()['fields']], ['Name', 'Email'])
+
+    def test_detail_changed_by_another_worker(self):
+        etag = self.get(self.url)['ETag']
+        # no signals, so this worker's cache is not invalidated
+        FormTemplate.objects.filter(pk=self.template['id']).update(name='Exit', updated_at=timezone.now())
+        response = self.get(self.url, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['name'], 'Exit')
+
+    def test_detail_uncached(self):
+        etag = self.get(self.url)['ETag']
+        schema_cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(self.url, if_none_match=etag).status_code, 304)
+        response = self.get(reverse('form-template-detail', args=[999]), if_none_match=etag)
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_pages(self):
+        self.create_template([{'label': 'Reason', 'field_type': 'text'}], name='Exit')
+        url = reverse('form-templates') + '?limit=1'
+        response = self.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.get(url, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        # other pages and page sizes have their own validators
+        self.assertNotEqual(self.get(reverse('form-templates'))['ETag'], etag)
+        cursor = self.get(url).json()['next_cursor']
+        self.assertNotEqual(self.get(f'{url}&cursor={cursor}')['ETag'], etag)
+
+        self.create_template([{'label': 'Team', 'field_type': 'text'}], name='Transfer')
+        response = self.get(url, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['name'], 'Transfer')
+
+    def test_list_invalid_cursor(self):
+        etag = self.get(reverse('form-templates'))['ETag']
+        response = self.get(reverse('form-templates') + '?cursor=garbage', if_none_match=etag)
+        self.assertEqual(response.status_code, 400)
+
+
+class AdminScaleTests(TestCase):
+    """Admin pages must cost the same handful of queries at 100k value rows as at ten."""
+
+    EMPLOYEES = 5000
+    FIELDS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='secret-pass',
+            first_name='Ada', last_name='Admin',
+        )
+        cls.template = FormTemplate.objects.create(name='Onboarding')
+        fields = FormField.objects.bulk_create([
+            FormField(form_template=cls.template, label=f'Field {i}', field_type='text', order=i)
+            for i in range(cls.FIELDS)
+        ])
+        employees = Employee.objects.bulk_create([
+            Employee(form_template=cls.template) for _ in range(cls.EMPLOYEES)
+        ])
+        EmployeeField.objects.bulk_create([
+            EmployeeField(employee=employee, form_field=field, value=f'{employee.pk}-{field.pk}')
+            for employee in employees for field in fields
+        ], batch_size=5000)
+        cls.employee = employees[0]
+        cls.employee_field = EmployeeField.objects.filter(employee=cls.employee).first()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def assertQueriesAtMost(self, limit, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(captured), limit,
+            '\n'.join(query['sql'][:200] for query in captured.captured_queries),
+        )
+        return response
+
+    def test_scale(self):
+        self.assertEqual(EmployeeField.objects.count(), self.EMPLOYEES * self.FIELDS)
+
+    def test_employee_field_changelist(self):
+        # session, user, bounded count, page with employee and field joined
+        response = self.assertQueriesAtMost(4, reverse('admin:employee_employeefield_changelist'))
+        self.assertContains(response, 'Field 0')
+
+    def test_employee_field_changelist_filtered(self):
+        url = reverse('admin:employee_employeefield_changelist')
+        self.assertQueriesAtMost(4, f'{url}?employee__id__exact={self.employee.pk}')
+
+    def test_employee_field_change_form(self):
+        # session, user, savepoint pair, value, content type, and one lookup per
+        # raw id widget instead of a <select> of every row
+        response = self.assertQueriesAtMost(
+            8, reverse('admin:employee_employeefield_change', args=[self.employee_field.pk])
+        )
+        self.assertNotContains(response, '<select name="employee"')
+        self.assertNotContains(response, '<select name="form_field"')
+
+    def test_employee_changelist(self):
+        self.assertQueriesAtMost(4, reverse('admin:employee_employee_changelist'))
+
+    def test_employee_change_form(self):
+        # session, user, savepoint pair, employee, its values joined with their
+        # fields, content type, and the template shown by the autocomplete
+        response = self.assertQueriesAtMost(
+            8, reverse('admin:employee_employee_change', args=[self.employee.pk])
+        )
+        [values] = response.context['inline_admin_formsets']
+        self.assertEqual(len(values.formset.forms), self.FIELDS)
+        # the autocomplete renders only the selected template
+        self.assertContains(response, '<option value="', count=1)
+
+    def test_form_field_changelist(self):
+        self.assertQueriesAtMost(4, reverse('admin:employee_formfield_changelist'))
+
+    def test_form_template_change_form(self):
+        # session, user, savepoint pair, template, its fields, content type
+        self.assertQueriesAtMost(7, reverse('admin:employee_formtemplate_change', args=[self.template.pk]))
+
+
+class TemplateStatsTests(TestCase):
+    """Stats kept by deltas must match a recount from EmployeeField."""
+
+    def setUp(self):
+        schema_cache.clear()
+        self.template = FormTemplate.objects.create(name='Stats')
+        TemplateStats.objects.create(form_template=self.template)
+        FormField.objects.bulk_create([
+            FormField(form_template=self.template, label='Dept', field_type='text', order=0),
+            FormField(form_template=self.template, label='Age', field_type='number', order=1),
+            FormField(form_template=self.template, label='Start', field_type='date', order=2),
+            FormField(form_template=self.template, label='Secret', field_type='password', order=3),
+        ])
+
+    def submit(self, records):
+        schema = schema_cache.get(self.template.id)
+        valid, errors = validate_submissions(schema, records)
+        self.assertEqual(errors, [])
+        return [employee_id for _, employee_id in create_employees(schema, valid)]
+
+    def stats(self, label):
+        return FieldStats.objects.get(form_field__label=label)
+
+    def assertNoDrift(self):
+        drift = rebuild_template_stats(self.template.id, rebuild=False, chunk_size=3)
+        self.assertEqual(drift, {'missing': False, 'employee_count': False, 'fields': {}})
+
+    def test_bulk_submissions(self):
+        self.submit([
+            {'Dept': ['HR', 'Eng'][n % 2], 'Age': str(30 + n), 'Start': f'2024-01-{n + 1:02d}'}
+            for n in range(10)
+        ])
+        self.assertEqual(TemplateStats.objects.get(pk=self.template.id).employee_count, 10)
+        self.assertEqual(self.stats('Dept').distribution, {'HR': 5, 'Eng': 5})
+        self.assertEqual(self.stats('Age').min_number, Decimal(30))
+        self.assertEqual(self.stats('Start').max_date, date(2024, 1, 10))
+        # no value yet, so no row
+        self.assertFalse(FieldStats.objects.filter(form_field__label='Secret').exists())
+        self.assertNoDrift()
+
+    def test_edits_and_deletes(self):
+        employee_ids = self.submit([{'Dept': 'HR', 'Age': str(30 + n)} for n in range(6)])
+
+        youngest = EmployeeField.objects.get(form_field__label='Age', value='30')
+        youngest.value = '70'
+        youngest.save()
+        self.assertEqual(self.stats('Age').min_number, Decimal(31))
+        self.assertEqual(self.stats('Age').max_number, Decimal(70))
+
+        EmployeeField.objects.filter(form_field__label='Dept').first().delete()
+        Employee.objects.get(pk=employee_ids[-1]).delete()
+        self.assertEqual(TemplateStats.objects.get(pk=self.template.id).employee_count, 5)
+        self.assertEqual(self.stats('Dept').distribution, {'HR': 4})
+        self.assertNoDrift()
+
+    @override_settings(EMPLOYEE_STATS={'DISTRIBUTION_LIMIT': 3})
+    def test_distribution_limit(self):
+        self.submit([{'Dept': f'Dept {n}'} for n in range(4)])
+        self.assertIsNone(self.stats('Dept').distribution)
+        self.assertNoDrift()
+
+    def test_rebuild(self):
+        self.submit([{'Dept': 'HR', 'Age': '40'}, {'Dept': 'Ops'}])
+        FieldStats.objects.filter(form_field__label='Age').update(filled_count=9, min_number=None)
+        drift = rebuild_template_stats(self.template.id)
+        self.assertEqual(drift['fields'], {self.stats('Age').form_field_id: ['filled_count', 'min_number']})
+        self.assertEqual(self.stats('Age').filled_count, 1)
+        self.assertNoDrift()
+
+    def test_endpoint(self):
+        user = User.objects.create_user(email='hr@example.com', username='hr', password='secret-pass')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        self.submit([{'Dept': 'HR', 'Age': str(20 + n)} for n in range(50)])
+
+        url = reverse('form-template-stats', args=[self.template.id])
+        # template stats, then the fields joined to their stats
+        with self.assertNumQueries(2):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['employee_count'], 50)
+        age = next(field for field in data['fields'] if field['label'] == 'Age')
+        self.assertEqual((age['min'], age['max'], age['fill_rate']), ('20', '69', 1.0))
+        secret = next(field for field in data['fields'] if field['label'] == 'Secret')
+        self.assertNotIn('distribution', secret)
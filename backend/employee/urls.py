@@ -1,9 +1,54 @@
 # In your urls.py
 from django.urls import path
-from .views import  FormTemplateView
+from .async_views import (
+    AsyncEmployeeDetailView,
+    AsyncEmployeeListView,
+    AsyncFormTemplateView,
+    split_by_method,
+)
+from .blocking import async_views_setting
+from .views import (
+    FormTemplateView,
+    FormTemplateImportView,
+    SchemaCacheStatsView,
+    TemplateStatsView,
+    DynamicFormView,
+    EmployeeExportView,
+    EmployeeExportDownloadView,
+    EmployeeImportView,
+    EmployeeImportStatusView,
+    EmployeeListView,
+    EmployeeSearchView,
+    EmployeeDetailView,
+)
 
-urlpatterns = [
-    path('forms/', FormTemplateView.as_view(), name='form-templates'),
-    path('forms/<int:template_id>/', FormTemplateView.as_view(), name='form-template-detail'),
-    # path('api/forms/submit/', DynamicFormView.as_view(), name='form-submit'),
-]
\ No newline at end of file
+
+def employee_urlpatterns(async_reads=False):
+    """URL patterns, with the async read views (for ASGI) when ``async_reads``."""
+    if async_reads:
+        form_templates = split_by_method(AsyncFormTemplateView.as_view(), FormTemplateView.as_view())
+        employee_list = AsyncEmployeeListView.as_view()
+        employee_detail = AsyncEmployeeDetailView.as_view()
+    else:
+        form_templates = FormTemplateView.as_view()
+        employee_list = EmployeeListView.as_view()
+        employee_detail = EmployeeDetailView.as_view()
+
+    return [
+        path('forms/', form_templates, name='form-templates'),
+        path('forms/import/', FormTemplateImportView.as_view(), name='form-template-import'),
+        path('forms/cache-stats/', SchemaCacheStatsView.as_view(), name='form-schema-cache-stats'),
+        path('forms/<int:template_id>/', form_templates, name='form-template-detail'),
+        path('forms/<int:template_id>/stats/', TemplateStatsView.as_view(), name='form-template-stats'),
+        path('forms/<int:template_id>/submit/', DynamicFormView.as_view(), name='form-submit'),
+        path('forms/<int:template_id>/employees/', employee_list, name='employee-list'),
+        path('forms/<int:template_id>/export/', EmployeeExportView.as_view(), name='employee-export'),
+        path('exports/<int:job_id>/', EmployeeExportDownloadView.as_view(), name='employee-export-download'),
+        path('forms/<int:template_id>/employees/import/', EmployeeImportView.as_view(), name='employee-import'),
+        path('employees/<int:employee_id>/', employee_detail, name='employee-detail'),
+        path('search/', EmployeeSearchView.as_view(), name='employee-search'),
+        path('employee-imports/<int:import_id>/', EmployeeImportStatusView.as_view(), name='employee-import-status'),
+    ]
+
+
+urlpatterns = employee_urlpatterns(async_reads=async_views_setting('ENABLED'))
@@ -0,0 +1,177 @@
+"""
+Compiled validators for employee records.
+
+A ``TemplateValidator`` is built once per template version from its compiled
+schema: a fixed tuple of per-field parsers in field order. A batch is first
+laid out as rows aligned to those fields, then validated one column at a
+time, so each parser runs over a whole column in a tight loop instead of
+being looked up again for every value.
+
+Errors are structured as ``{'index': i, 'errors': [{'field', 'code',
+'message'}, ...]}`` with ``code`` one of ``invalid_record``,
+``unknown_field``, ``required`` or ``invalid``.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+
+
+def _parse_text(value):
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError("must be a string")
+    return str(value)
+
+
+def _parse_number(value):
+    if isinstance(value, bool):
+        raise ValueError("must be a number")
+    text = str(value).strip()
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        raise ValueError("must be a number")
+    if not number.is_finite():
+        raise ValueError("must be a number")
+    # stored as submitted; value_number holds the parsed copy
+    return text
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(str(value).strip()).isoformat()
+    except ValueError:
+        raise ValueError("must be a date (YYYY-MM-DD)")
+
+
+def _parse_email(value):
+    value = _parse_text(value).strip()
+    try:
+        validate_email(value)
+    except ValidationError:
+        raise ValueError("must be a valid email address")
+    return value
+
+
+# FormField.field_type -> callable returning the text to store, or raising ValueError
+FIELD_PARSERS = {
+    'text': _parse_text,
+    'number': _parse_number,
+    'date': _parse_date,
+    'password': _parse_text,
+    'email': _parse_email,
+}
+
+_MISSING = object()
+
+
+def _error(field, code, message):
+    return {'field': field, 'code': code, 'message': message}
+
+
+class TemplateValidator:
+    """Validator compiled from one version of a template schema."""
+
+    __slots__ = ('template_id', 'field_ids', 'labels', 'parsers', 'required', 'positions')
+
+    def __init__(self, schema):
+        fields = schema['fields']
+        self.template_id = schema['id']
+        self.field_ids = tuple(field['id'] for field in fields)
+        self.labels = tuple(field['label'] for field in fields)
+        self.parsers = tuple(FIELD_PARSERS[field['field_type']] for field in fields)
+        self.required = tuple(field['required'] for field in fields)
+        # record key (label or id) -> column position
+        positions = {}
+        for position, field in enumerate(fields):
+            positions[field['label']] = position
+            positions[str(field['id'])] = position
+        self.positions = positions
+
+    def validate(self, records):
+        """
+        Validate a batch of records keyed by field label or id.
+
+        Returns ``(valid, errors)`` where ``valid`` is
+        ``[(index, [(field_id, text), ...]), ...]`` in input order.
+        """
+        width = len(self.field_ids)
+        positions = self.positions
+        errors = {}
+
+        # lay the batch out as rows aligned to the template's fields
+        rows = []
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                rows.append(None)
+                errors[index] = [_error(None, 'invalid_record', "must be an object")]
+                continue
+            row = [_MISSING] * width
+            rows.append(row)
+            for key, value in record.items():
+                position = positions.get(str(key))
+                if position is None:
+                    errors.setdefault(index, []).append(
+                        _error(str(key), 'unknown_field', "unknown field")
+                    )
+                else:
+                    row[position] = value
+
+        # then validate column by column
+        parsed = [[] for _ in rows]
+        for position in range(width):
+            parse = self.parsers[position]
+            required = self.required[position]
+            field_id = self.field_ids[position]
+            label = self.labels[position]
+            for index, row in enumerate(rows):
+                if row is None:
+                    continue
+                value = row[position]
+                if value is _MISSING or value is None or value == '':
+                    if required:
+                        errors.setdefault(index, []).append(
+                            _error(label, 'required', "this field is required")
+                        )
+                    continue
+                try:
+                    parsed[index].append((field_id, parse(value)))
+                except ValueError as e:
+                    errors.setdefault(index, []).append(_error(label, 'invalid', str(e)))
+
+        valid = [(index, values) for index, values in enumerate(parsed) if index not in errors]
+        return valid, [{'index': index, 'errors': errors[index]} for index in sorted(errors)]
+
+
+class ValidatorCache:
+    """Small LRU of compiled validators keyed by ``(template_id, updated_at)``."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, schema):
+        key = (schema['id'], schema['updated_at'])
+        with self._lock:
+            validator = self._entries.get(key)
+            if validator is not None:
+                self._entries.move_to_end(key)
+                return validator
+
+        validator = TemplateValidator(schema)
+        with self._lock:
+            self._entries[key] = validator
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return validator
+
+
+validator_cache = ValidatorCache()
+
+
+def get_validator(schema):
+    return validator_cache.get(schema)
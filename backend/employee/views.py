@@ -1,20 +1,97 @@
-# django
-from django.db import transaction
-from django.db import models, transaction
-from datetime import datetime
 # drf
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 # from rest_framework.exceptions import AuthenticationFailed, ParseError
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
 # model
-from .models import FormTemplate, FormField, Employee, EmployeeField
+from .models import FormTemplate, FormField, Employee, EmployeeField, EmployeeImport, EmployeeDocument
+
+# django
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# auth
+from user_auth.authentication import ClaimsJWTAuthentication
+
+# jobs
+from jobs.models import Job
+from jobs.registry import enqueue
+from jobs.views import job_data
+
+# services
+from .cache import schema_cache, version_stamp
+from .conditional import (
+    is_conditional, not_modified, page_validators, set_validators, template_list_validators,
+    template_validators, template_version,
+)
+from .pagination import InvalidCursor, paginate_keyset, parse_offset, parse_page_size
+from .services import (
+    TemplatePayloadError, apply_template_patch, clean_template_patch, clean_template_payload,
+    create_form_templates,
+)
+from .export import EXPORT_FORMATS
+from .documents import document_values
+from .queries import EmployeeQueryError, filter_employees, paginate_sorted, parse_employee_query
+from .search import search_employees
+from .stats import template_stats_data
+from .importer import CSVImportError, EmployeeImporter
+from .submissions import create_employees, validate_submissions
+from .tasks import IMPORT_DIR, export_expires_at, private_storage
+
+# logging
+import io
+import logging
+import uuid
+logger = logging.getLogger(__name__)
+
+
+# upper bound on templates accepted by a single import request
+MAX_IMPORT_TEMPLATES = 500
+
+# upper bound on employees accepted by a single submission request
+MAX_SUBMISSION_BATCH = 5000
+
+
+def _created_template_data(form_template, fields):
+    return {
+        'id': form_template.id,
+        'name': form_template.name,
+        'description': form_template.description,
+        'fields': [{
+            'id': field.id,
+            'label': field.label,
+            'field_type': field.field_type,
+            'required': field.required,
+            'order': field.order
+        } for field in fields],
+        'created_at': form_template.created_at
+    }
+
+
+def _template_list_queryset(name_prefix=None):
+    # counted with a correlated subquery so it is only evaluated for the rows
+    # on the requested page, not for every template before the LIMIT
+    fields_count = (
+        FormField.objects.filter(form_template=OuterRef('pk'), retired_at__isnull=True)
+        .order_by()
+        .values('form_template')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    queryset = FormTemplate.objects.annotate(
+        fields_count=Coalesce(Subquery(fields_count, output_field=IntegerField()), 0)
+    )
+    if name_prefix:
+        queryset = queryset.filter(name__startswith=name_prefix)
+    return queryset
 
-# Create your views here.
 
 class FormTemplateView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
@@ -45,75 +122,49 @@ class FormTemplateView(APIView):
         }
         """
         try:
-            with transaction.atomic():
-                # Create form template
-                template_data = {
-                    'name': request.data.get('name'),
-                    'description': request.data.get('description', '')
-                }
-                
-                # Validate template data
-                if not template_data['name']:
-                    return Response(
-                        {"error": "Form template name is required"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                form_template = FormTemplate.objects.create(**template_data)
-                
-                # Create form fields
-                fields_data = request.data.get('fields', [])
-                if not fields_data:
-                    return Response(
-                        {"error": "At least one field is required"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                created_fields = []
-                print("**************")
-                print(fields_data)
-                for idx, field_data in enumerate(fields_data):
-                    # Validate field data
-                    if not field_data.get('label'):
-                        return Response(
-                            {"error": f"Field at index {idx} is missing a label"},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                    
-                    field_type = field_data.get('field_type')
-                    if not field_type or field_type not in dict(FormField.FIELD_TYPES):
-                        return Response(
-                            {"error": f"Field '{field_data.get('label')}' has invalid field type"},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                    
-                    # Create the field
-                    field = FormField.objects.create(
-                        form_template=form_template,
-                        label=field_data.get('label'),
-                        field_type=field_type,
-                        required=field_data.get('required', False),
-                        order=field_data.get('order', idx),
-                        options=field_data.get('options')
-                    )
-                    created_fields.append({
-                        'id': field.id,
-                        'label': field.label,
-                        'field_type': field.field_type,
-                        'required': field.required,
-                        'order': field.order
-                    })
-                
-                return Response({
-                    'id': form_template.id,
-                    'name': form_template.name,
-                    'description': form_template.description,
-                    'fields': created_fields,
-                    'created_at': form_template.created_at
-                }, status=status.HTTP_201_CREATED)
-                
+            template_kwargs, fields = clean_template_payload(request.data)
+        except TemplatePayloadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            [(form_template, created_fields)] = create_form_templates([(template_kwargs, fields)])
         except Exception as e:
+            logger.error(f"Error creating form template: {str(e)}")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response(
+            _created_template_data(form_template, created_fields),
+            status=status.HTTP_201_CREATED
+        )
+
+    def patch(self, request, template_id=None):
+        """
+        Edit a template in place and return its new schema.
+
+        Expected request body (every key optional):
+        {
+            "name": "Employee Onboarding v2",
+            "description": "...",
+            "add": [{"label": "Phone", "field_type": "text", "after": 12}],
+            "change": [{"id": 12, "label": "Full name", "required": true}],
+            "remove": [14],
+            "order": [13, 12, 15]
+        }
+
+        `after` is the field the new one follows (null for first, absent for
+        last); `order` lists every remaining field in display order. Removed
+        fields are retired: they leave the schema but existing employee
+        values stay in the database.
+        """
+        if not template_id:
+            return Response({"error": "A form template id is required"}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        try:
+            schema = apply_template_patch(template_id, clean_template_patch(request.data))
+        except TemplatePayloadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if schema is None:
+            return Response({"error": "Form template not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(schema)
     
 
 
@@ -121,40 +172,467 @@ class FormTemplateView(APIView):
         """
         Retrieve form templates.
         If template_id is provided, return that specific template with its fields.
-        Otherwise, return a list of all templates.
+        Otherwise, return a page of templates, newest first.
+
+        Query params for the list:
+            q       - name prefix filter (case-sensitive, uses the name index)
+            limit   - page size (default 50, max 200)
+            cursor  - `next_cursor` from the previous page
+
+        Responses carry an ETag and Last-Modified; a request whose
+        If-None-Match/If-Modified-Since still matches gets a 304.
         """
         if template_id:
-            try:
-                template = FormTemplate.objects.get(id=template_id)
-                fields = template.fields.all().order_by('order')
-                
-                fields_data = [{
-                    'id': field.id,
-                    'label': field.label,
-                    'field_type': field.field_type,
-                    'required': field.required,
-                    'order': field.order,
-                    'options': field.options
-                } for field in fields]
-                
-                return Response({
-                    'id': template.id,
-                    'name': template.name,
-                    'description': template.description,
-                    'fields': fields_data,
-                    'created_at': template.created_at,
-                    'updated_at': template.updated_at
-                })
-            except FormTemplate.DoesNotExist:
+            if is_conditional(request):
+                version = template_version(template_id)
+                if version is None:
+                    return Response({"error": "Form template not found"}, status=status.HTTP_404_NOT_FOUND)
+                response = not_modified(request, *template_validators(template_id, version))
+                if response is not None:
+                    return response
+            schema = schema_cache.get(template_id)
+            if schema is None:
                 return Response({"error": "Form template not found"}, status=status.HTTP_404_NOT_FOUND)
+            return set_validators(
+                Response(schema), *template_validators(template_id, version_stamp(schema['updated_at']))
+            )
         else:
-            templates = FormTemplate.objects.all().order_by('-created_at')
+            name_prefix = request.query_params.get('q')
+            cursor = request.query_params.get('cursor')
+            try:
+                page_size = parse_page_size(request.query_params.get('limit'))
+                queryset = _template_list_queryset(name_prefix)
+                if is_conditional(request):
+                    response = not_modified(request, *page_validators(queryset, name_prefix, cursor, page_size))
+                    if response is not None:
+                        return response
+                templates, next_cursor = paginate_keyset(queryset, cursor=cursor, page_size=page_size)
+            except InvalidCursor as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
             templates_data = [{
                 'id': template.id,
                 'name': template.name,
                 'description': template.description,
-                'fields_count': template.fields.count(),
+                'fields_count': template.fields_count,
                 'created_at': template.created_at
             } for template in templates]
             
-            return Response(templates_data)
\ No newline at end of file
+            return set_validators(
+                Response({'results': templates_data, 'next_cursor': next_cursor}),
+                *template_list_validators(
+                    name_prefix, cursor, page_size,
+                    [(template.id, template.updated_at) for template in templates], next_cursor is not None,
+                )
+            )
+
+
+class FormTemplateImportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Create many form templates in one request.
+
+        Expected request body:
+        {
+            "templates": [
+                {"name": "...", "description": "...", "fields": [...]},
+                ...
+            ]
+        }
+
+        or the bare list of templates. Every template is validated before
+        anything is written; if any of them is invalid nothing is created and
+        the errors are returned by index.
+        """
+        payloads = request.data
+        if isinstance(payloads, dict):
+            payloads = payloads.get('templates')
+        if not isinstance(payloads, list) or not payloads:
+            return Response(
+                {"error": "A non-empty 'templates' list is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(payloads) > MAX_IMPORT_TEMPLATES:
+            return Response(
+                {"error": f"At most {MAX_IMPORT_TEMPLATES} templates can be imported at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        cleaned = []
+        errors = []
+        for idx, payload in enumerate(payloads):
+            try:
+                cleaned.append(clean_template_payload(payload))
+            except TemplatePayloadError as e:
+                errors.append({'index': idx, 'error': str(e)})
+
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            created = create_form_templates(cleaned)
+        except Exception as e:
+            logger.error(f"Error importing form templates: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response(
+            [_created_template_data(template, fields) for template, fields in created],
+            status=status.HTTP_201_CREATED
+        )
+
+
+class SchemaCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """Hit rate, eviction and invalidation counters of this worker's schema cache."""
+        return Response(schema_cache.stats())
+
+
+class TemplateStatsView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, template_id):
+        """
+        Employee count and per-field fill rate, bounds and value distribution
+        of a template, read from the incrementally maintained statistics.
+
+        Statistics that were never computed are rebuilt by a background job;
+        until then the response is 202 with a Retry-After header.
+        """
+        data = template_stats_data(template_id)
+        if data is not None:
+            return Response(data)
+
+        if not FormTemplate.objects.filter(pk=template_id).exists():
+            return Response({"error": "Form template not found"}, status=status.HTTP_404_NOT_FOUND)
+        pending = Job.objects.filter(
+            name='employee.rebuild_stats', payload__template_id=template_id, status__in=('queued', 'running')
+        )
+        if not pending.exists():
+            enqueue('employee.rebuild_stats', {'template_id': template_id})
+        response = Response({'template': template_id, 'status': 'computing'}, status=status.HTTP_202_ACCEPTED)
+        response['Retry-After'] = '5'
+        return response
+
+
+class DynamicFormView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, template_id):
+        """
+        Submit one employee or a batch of employees for a form template.
+
+        Expected request body (values keyed by field id or label):
+        {"values": {"Full Name": "Jane", "12": "jane@example.com"}}
+        or
+        {"employees": [{"Full Name": "Jane", ...}, {"Full Name": "John", ...}]}
+
+        Valid records are created even when others fail; errors are returned
+        by index.
+        """
+        schema = schema_cache.get(template_id)
+        if schema is None:
+            return Response({"error": "Form template not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if 'employees' in request.data:
+            records = request.data.get('employees')
+        elif 'values' in request.data:
+            records = [request.data.get('values')]
+        else:
+            records = None
+
+        if not isinstance(records, list) or not records:
+            return Response(
+                {"error": "Either 'values' or a non-empty 'employees' list is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(records) > MAX_SUBMISSION_BATCH:
+            return Response(
+                {"error": f"At most {MAX_SUBMISSION_BATCH} employees can be submitted at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        valid, errors = validate_submissions(schema, records)
+        try:
+            created = create_employees(schema, valid)
+        except Exception as e:
+            logger.error(f"Error creating employees: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response(
+            {
+                'created': [{'index': index, 'id': employee_id} for index, employee_id in created],
+                'errors': errors,
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+        )
+
+
+class EmployeeExportView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, template_id):
+        """
+        Stream every employee of a template, one column per field label.
+
+        Query params:
+            output  - `csv` (default) or `ndjson`
+        """
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Unsupported output '{output}', use one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        schema = schema_cache.get(template_id)
+        if schema is None:
+            return Response({"error": "Form template not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        stream, content_type, extension = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(stream(schema), content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="form-{template_id}-employees.{extension}"'
+        )
+        return response
+
+    def post(self, request, template_id):
+        """
+        Export in the background to a private file; poll the returned job
+        and, once it succeeded, download its `result.url` before
+        `result.expires_at`.
+
+        Body:
+            output  - `csv` (default) or `ndjson`
+        """
+        output = request.data.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Unsupported output '{output}', use one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if schema_cache.get(template_id) is None:
+            return Response({"error": "Form template not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        job = enqueue(
+            'employee.export', {'template_id': template_id, 'output': output}, created_by=request.user
+        )
+        return Response(job_data(job), status=status.HTTP_202_ACCEPTED)
+
+
+class EmployeeExportDownloadView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        """The file of one of the user's finished background exports."""
+        job = Job.objects.filter(
+            pk=job_id, name='employee.export', status='succeeded', created_by_id=request.user.id
+        ).first()
+        if job is None:
+            return Response({"error": "Export not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        storage = private_storage()
+        path = job.result['path']
+        if export_expires_at(job.finished_at) <= timezone.now() or not storage.exists(path):
+            return Response({"error": "Export has expired"}, status=status.HTTP_410_GONE)
+        return FileResponse(storage.open(path, 'rb'), as_attachment=True, filename=path.rsplit('/', 1)[-1])
+
+
+def _employee_import_data(employee_import):
+    return {
+        'id': employee_import.id,
+        'form_template': employee_import.form_template_id,
+        'source_name': employee_import.source_name,
+        'status': employee_import.status,
+        'rows_processed': employee_import.rows_processed,
+        'rows_created': employee_import.rows_created,
+        'error_count': employee_import.error_count,
+        'errors': employee_import.errors,
+        'created_at': employee_import.created_at,
+        'updated_at': employee_import.updated_at
+    }
+
+
+class EmployeeImportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, template_id):
+        """
+        Import employees from an uploaded CSV file (multipart field `file`).
+
+        The header row must hold field labels. Rows are committed in chunks;
+        pass `resume=<import id>` to continue an interrupted import from its
+        last committed chunk with the same file. With `background=true` the
+        file is stored and imported by a job; the response holds the import
+        and the job to poll.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "A CSV 'file' is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        schema = schema_cache.get(template_id)
+        if schema is None:
+            return Response({"error": "Form template not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        resume = request.data.get('resume')
+        if resume:
+            try:
+                employee_import = EmployeeImport.objects.get(pk=resume, form_template_id=template_id)
+            except (EmployeeImport.DoesNotExist, ValueError):
+                return Response({"error": "Import not found"}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            employee_import = EmployeeImport.objects.create(
+                form_template_id=template_id, source_name=upload.name[-255:]
+            )
+
+        if str(request.data.get('background', '')).lower() in ('1', 'true'):
+            path = private_storage().save(f"{IMPORT_DIR}/{uuid.uuid4().hex}.csv", upload)
+            job = enqueue(
+                'employee.import', {'import_id': employee_import.id, 'path': path}, created_by=request.user
+            )
+            return Response(
+                {'import': _employee_import_data(employee_import), 'job': job_data(job)},
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            EmployeeImporter(schema, employee_import).run(lines)
+        except (CSVImportError, UnicodeDecodeError) as e:
+            return Response(
+                {"error": str(e), "import": _employee_import_data(employee_import)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"Error importing employees: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        employee_import.refresh_from_db()
+        return Response(_employee_import_data(employee_import), status=status.HTTP_201_CREATED)
+
+
+class EmployeeImportStatusView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, import_id):
+        """Progress of an employee import."""
+        try:
+            employee_import = EmployeeImport.objects.get(pk=import_id)
+        except EmployeeImport.DoesNotExist:
+            return Response({"error": "Import not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(_employee_import_data(employee_import))
+
+
+class EmployeeListView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, template_id):
+        """
+        List employees of a template, filtered and sorted by field values.
+
+        Query params:
+            <field>=v, <field>__<op>=v  - field by id or label; op is one of
+                                          eq, lt, lte, gt, gte, startswith, isnull
+            sort                        - field id or label, `-` prefix for descending
+            limit                       - page size (default 50, max 200)
+            cursor                      - `next_cursor` from the previous page
+        """
+        schema = schema_cache.get(template_id)
+        if schema is None:
+            return Response({"error": "Form template not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            predicates, sort = parse_employee_query(schema, request.query_params)
+            page_size = parse_page_size(request.query_params.get('limit'))
+            queryset = filter_employees(schema, predicates)
+            cursor = request.query_params.get('cursor')
+            if sort is None:
+                employees, next_cursor = paginate_keyset(queryset, cursor=cursor, page_size=page_size)
+            else:
+                employees, next_cursor = paginate_sorted(queryset, sort, cursor=cursor, page_size=page_size)
+        except (EmployeeQueryError, InvalidCursor) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        values = document_values([employee.id for employee in employees])
+        return Response({
+            'results': [{
+                'id': employee.id,
+                'values': values.get(employee.id, {}),
+                'created_at': employee.created_at,
+                'updated_at': employee.updated_at
+            } for employee in employees],
+            'next_cursor': next_cursor
+        })
+
+
+class EmployeeSearchView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Search employees across all text and email values.
+
+        Query params:
+            q         - search terms; every term must match the start of a word
+            template  - restrict to one form template
+            limit     - page size (default 50, max 200)
+            offset    - `next_offset` from the previous page
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "A search query 'q' is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page_size = parse_page_size(request.query_params.get('limit'))
+            offset = parse_offset(request.query_params.get('offset'))
+            template_id = request.query_params.get('template')
+            template_id = int(template_id) if template_id else None
+        except (InvalidCursor, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        hits = search_employees(query, template_id=template_id, limit=page_size + 1, offset=offset)
+        next_offset = offset + page_size if len(hits) > page_size else None
+        hits = hits[:page_size]
+
+        employee_ids = [hit['employee_id'] for hit in hits]
+        documents = dict(
+            EmployeeDocument.objects.filter(employee_id__in=employee_ids)
+            .values_list('employee_id', 'form_template_id')
+        )
+        values = document_values(employee_ids)
+        results = [{
+            'id': hit['employee_id'],
+            'form_template': documents.get(hit['employee_id']),
+            'score': hit['score'],
+            'values': values.get(hit['employee_id'], {}),
+        } for hit in hits]
+
+        return Response({'results': results, 'next_offset': next_offset})
+
+
+class EmployeeDetailView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, employee_id):
+        """One employee's values keyed by field label, served from its document."""
+        document = EmployeeDocument.objects.filter(employee_id=employee_id).first()
+        if document is None:
+            if not document_values([employee_id]):
+                return Response({"error": "Employee not found"}, status=status.HTTP_404_NOT_FOUND)
+            document = EmployeeDocument.objects.get(employee_id=employee_id)
+        return Response({
+            'id': document.employee_id,
+            'form_template': document.form_template_id,
+            'values': document.data,
+            'updated_at': document.updated_at
+        })
@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+# model
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'progress', 'progress_total', 'attempts', 'run_after', 'finished_at')
+    list_filter = ('status', 'name')
+    list_select_related = ('created_by',)
+    raw_id_fields = ('created_by',)
+    readonly_fields = ('locked_by', 'locked_at', 'started_at', 'finished_at', 'created_at', 'updated_at')
+    ordering = ('-created_at', '-id')
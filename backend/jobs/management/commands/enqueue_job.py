@@ -0,0 +1,26 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.registry import enqueue, task_names
+
+
+class Command(BaseCommand):
+    help = "Queue a background job."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help="Task name")
+        parser.add_argument('--payload', default='{}', help="Task keyword arguments as a JSON object")
+
+    def handle(self, *args, **options):
+        try:
+            payload = json.loads(options['payload'])
+        except ValueError as e:
+            raise CommandError(f"Invalid payload: {e}")
+        if not isinstance(payload, dict):
+            raise CommandError("The payload must be a JSON object")
+        if options['name'] not in task_names():
+            raise CommandError(f"Unknown task, use one of: {', '.join(task_names())}")
+
+        job = enqueue(options['name'], payload)
+        self.stdout.write(self.style.SUCCESS(f"Queued job {job.id} ({job.name})"))
@@ -0,0 +1,29 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from jobs.runner import Worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs on a process pool until stopped (SIGTERM/SIGINT)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, help="Jobs run at once (default JOBS['PROCESSES'])")
+        parser.add_argument('--poll-interval', type=float, help="Seconds between claims when idle")
+        parser.add_argument('--names', nargs='+', help="Only run these tasks")
+        parser.add_argument('--once', action='store_true', help="Exit once no job is due")
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            processes=options['processes'],
+            poll_interval=options['poll_interval'],
+            names=options['names'],
+        )
+        # finish the running jobs, then exit
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+
+        self.stdout.write(f"Worker {worker.worker_id} running {worker.processes} processes")
+        worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker.worker_id} stopped"))
@@ -0,0 +1,21 @@
+"""
+Entry points of the worker's pool processes.
+
+The pool spawns fresh interpreters (forked children would share the
+parent's database sockets), so Django is set up in ``init`` before any
+model is imported.
+"""
+
+
+def init():
+    import signal
+    # Ctrl-C reaches the whole process group; the worker decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import django
+    django.setup()
+
+
+def run(job_id):
+    from .runner import execute_job
+    execute_job(job_id)
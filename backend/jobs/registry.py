@@ -0,0 +1,124 @@
+"""
+Background jobs without a broker.
+
+Apps register tasks in their ``tasks`` module and queue them with
+``enqueue``; a queued task is a ``Job`` row. ``manage.py run_jobs`` claims
+due jobs (``SELECT ... FOR UPDATE SKIP LOCKED`` on Postgres, a
+compare-and-set ``UPDATE`` elsewhere) and runs them on a process pool. A
+failed job is retried with exponential backoff until ``max_attempts``;
+raise ``JobError`` to fail it for good. Clients poll ``/jobs/<id>/`` for
+status, progress and result.
+
+::
+
+    @task('employee.export')
+    def export_employees(job, template_id, output):
+        job.progress(done, total)
+        return {'path': ...}          # stored as the job's JSON result
+
+    enqueue('employee.export', {'template_id': 1, 'output': 'csv'}, created_by=request.user)
+
+Settings (all optional)::
+
+    JOBS = {
+        'PROCESSES': 2,            # worker pool size
+        'POLL_INTERVAL': 1.0,      # seconds between claims when idle
+        'MAX_ATTEMPTS': 3,
+        'BACKOFF_BASE': 10,        # seconds before the first retry, doubled after each
+        'BACKOFF_MAX': 3600,
+        'LOCK_TIMEOUT': 300,       # a running job not heard from this long is retried
+        'PERIODIC': {},            # task name -> seconds between runs
+    }
+"""
+import random
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+# model
+from .models import Job
+
+
+DEFAULTS = {
+    'PROCESSES': 2,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF_BASE': 10,
+    'BACKOFF_MAX': 3600,
+    'LOCK_TIMEOUT': 300,
+    'PERIODIC': {},
+}
+
+# seconds between progress writes of a running job
+PROGRESS_INTERVAL = 1.0
+
+_tasks = {}
+
+
+def jobs_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'JOBS', {})}[name]
+
+
+class JobError(Exception):
+    """Raised by a task to fail its job without retrying."""
+
+
+def task(name, max_attempts=None):
+    """Register the decorated function as task ``name``."""
+    def register(func):
+        _tasks[name] = (func, max_attempts)
+        return func
+    return register
+
+
+def get_task(name):
+    """``(func, max_attempts)`` of a registered task, or ``None``."""
+    return _tasks.get(name)
+
+
+def task_names():
+    return sorted(_tasks)
+
+
+def enqueue(name, payload=None, created_by=None, run_after=None, max_attempts=None):
+    """Queue a run of task ``name`` with ``payload`` as its keyword arguments."""
+    registered = get_task(name)
+    if registered is None:
+        raise ValueError(f"Unknown task: {name}")
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        created_by=created_by,
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts or registered[1] or jobs_setting('MAX_ATTEMPTS'),
+    )
+
+
+def retry_delay(attempts):
+    """Seconds before retrying a job that failed its ``attempts``-th attempt."""
+    delay = min(jobs_setting('BACKOFF_MAX'), jobs_setting('BACKOFF_BASE') * 2 ** (attempts - 1))
+    # jitter, so jobs that failed together do not retry together
+    return delay * random.uniform(1.0, 1.25)
+
+
+class JobContext:
+    """What a running task sees of its job."""
+
+    def __init__(self, job):
+        self.id = job.pk
+        self.attempt = job.attempts
+        self.created_by_id = job.created_by_id
+        self._locked_by = job.locked_by
+        self._last_write = 0.0
+
+    def progress(self, done, total=None, force=False):
+        """Record progress; writes are throttled to one per ``PROGRESS_INTERVAL``."""
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        fields = {'progress': done, 'locked_at': timezone.now(), 'updated_at': timezone.now()}
+        if total is not None:
+            fields['progress_total'] = total
+        Job.objects.filter(pk=self.id, status='running', locked_by=self._locked_by).update(**fields)
@@ -0,0 +1,217 @@
+"""
+Claiming and running jobs; see ``jobs.registry`` for the overview.
+
+``Worker`` is the loop behind ``manage.py run_jobs``: it claims as many due
+jobs as it has free processes, runs them on a spawned process pool, keeps
+their locks fresh with a heartbeat, and puts back jobs whose worker died.
+"""
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+# model
+from .models import Job
+
+from . import process
+from .registry import JobContext, JobError, enqueue, get_task, jobs_setting, retry_delay
+
+logger = logging.getLogger(__name__)
+
+
+# seconds between stale-lock recovery and periodic scheduling passes
+MAINTENANCE_INTERVAL = 30
+
+
+def claim_jobs(worker_id, limit, names=None):
+    """Mark up to ``limit`` due jobs as running under ``worker_id``; returns their ids."""
+    now = timezone.now()
+    due = Job.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'id')
+    if names:
+        due = due.filter(name__in=names)
+    claimed = {
+        'status': 'running',
+        'locked_by': worker_id,
+        'locked_at': now,
+        'started_at': now,
+        'updated_at': now,
+        'attempts': F('attempts') + 1,
+    }
+
+    db = router.db_for_write(Job)
+    if connections[db].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=db):
+            ids = list(
+                due.using(db).select_for_update(skip_locked=True).values_list('id', flat=True)[:limit]
+            )
+            Job.objects.using(db).filter(id__in=ids).update(**claimed)
+        return ids
+
+    # no SKIP LOCKED (SQLite): claim one row at a time; the status check makes
+    # the UPDATE succeed for a single worker
+    ids = []
+    for pk in due.using(db).values_list('id', flat=True)[:limit * 2]:
+        if Job.objects.using(db).filter(pk=pk, status='queued').update(**claimed):
+            ids.append(pk)
+            if len(ids) == limit:
+                break
+    return ids
+
+
+def _finish(job, conditions=None, **fields):
+    """Release ``job`` with ``fields`` unless another worker has taken it over."""
+    return Job.objects.filter(
+        pk=job.pk, status='running', locked_by=job.locked_by, **(conditions or {})
+    ).update(locked_by='', locked_at=None, updated_at=timezone.now(), **fields)
+
+
+def record_failure(job, error, retry=True, conditions=None):
+    now = timezone.now()
+    if retry and job.attempts < job.max_attempts:
+        fields = {
+            'status': 'queued',
+            'run_after': now + timedelta(seconds=retry_delay(job.attempts)),
+        }
+    else:
+        fields = {'status': 'failed', 'finished_at': now}
+    return _finish(job, conditions, error=error[:10000], **fields)
+
+
+def execute_job(job_id):
+    """Run one claimed job to completion and record the outcome."""
+    close_old_connections()
+    try:
+        job = Job.objects.filter(pk=job_id, status='running').first()
+        if job is None:
+            return
+        registered = get_task(job.name)
+        if registered is None:
+            record_failure(job, f"Unknown task: {job.name}", retry=False)
+            return
+        try:
+            result = registered[0](JobContext(job), **job.payload)
+        except JobError as e:
+            record_failure(job, str(e), retry=False)
+        except Exception as e:
+            logger.exception(f"Job {job} failed on attempt {job.attempts} of {job.max_attempts}")
+            record_failure(job, f"{type(e).__name__}: {e}")
+        else:
+            _finish(job, status='succeeded', result=result, error='', finished_at=timezone.now())
+    finally:
+        close_old_connections()
+
+
+def recover_stale_jobs():
+    """Retry (or fail) running jobs whose worker stopped sending heartbeats."""
+    cutoff = timezone.now() - timedelta(seconds=jobs_setting('LOCK_TIMEOUT'))
+    recovered = 0
+    for job in Job.objects.filter(status='running', locked_at__lt=cutoff):
+        recovered += record_failure(
+            job, f"Worker {job.locked_by} stopped responding", conditions={'locked_at__lt': cutoff}
+        )
+    return recovered
+
+
+def enqueue_periodic():
+    """Queue each ``PERIODIC`` task that is due and not already queued or running."""
+    now = timezone.now()
+    for name, interval in jobs_setting('PERIODIC').items():
+        if Job.objects.filter(name=name, status__in=('queued', 'running')).exists():
+            continue
+        last_run = (
+            Job.objects.filter(name=name, finished_at__isnull=False)
+            .order_by('-finished_at').values_list('finished_at', flat=True).first()
+        )
+        if last_run is None or last_run <= now - timedelta(seconds=interval):
+            enqueue(name)
+
+
+class Worker:
+
+    def __init__(self, processes=None, poll_interval=None, names=None):
+        self.processes = processes or jobs_setting('PROCESSES')
+        self.poll_interval = poll_interval or jobs_setting('POLL_INTERVAL')
+        self.names = names
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"[:100]
+        self.stopping = False
+
+    def stop(self, *args):
+        """Stop claiming; jobs already running are finished first."""
+        self.stopping = True
+
+    def _pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=process.init,
+        )
+
+    def run(self, once=False):
+        """Process jobs until stopped, or with ``once`` until none are due."""
+        # the pool processes open their own connections
+        connections.close_all()
+        pool = self._pool()
+        in_flight = {}
+        heartbeat_interval = jobs_setting('LOCK_TIMEOUT') / 3
+        last_heartbeat = last_maintenance = time.monotonic()
+        try:
+            recover_stale_jobs()
+            while not self.stopping:
+                now = time.monotonic()
+                if now - last_maintenance >= MAINTENANCE_INTERVAL:
+                    recover_stale_jobs()
+                    enqueue_periodic()
+                    last_maintenance = now
+                if now - last_heartbeat >= heartbeat_interval and in_flight:
+                    Job.objects.filter(pk__in=in_flight.values(), locked_by=self.worker_id).update(
+                        locked_at=timezone.now()
+                    )
+                    last_heartbeat = now
+
+                free = self.processes - len(in_flight)
+                for job_id in claim_jobs(self.worker_id, free, self.names) if free else ():
+                    in_flight[pool.submit(process.run, job_id)] = job_id
+                if not in_flight:
+                    if once:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+
+                done, _ = wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                if self._collect(done, in_flight):
+                    # every job on a broken pool fails; start over with a new one
+                    pool.shutdown(wait=False)
+                    pool = self._pool()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                self._collect(done, in_flight)
+        finally:
+            pool.shutdown(wait=True)
+
+    def _collect(self, done, in_flight):
+        broken = False
+        for future in done:
+            job_id = in_flight.pop(future)
+            try:
+                future.result()
+            except BrokenProcessPool:
+                broken = True
+                self._crashed(job_id, "Worker process died")
+            except Exception as e:
+                logger.error(f"Job {job_id} crashed its worker process: {str(e)}")
+                self._crashed(job_id, f"{type(e).__name__}: {e}")
+        return broken
+
+    def _crashed(self, job_id, error):
+        job = Job.objects.filter(pk=job_id, status='running', locked_by=self.worker_id).first()
+        if job is not None:
+            record_failure(job, error)
@@ -0,0 +1,192 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user_auth.models import User
+
+from .models import Job
+from .registry import JobError, enqueue, retry_delay, task
+from .runner import claim_jobs, enqueue_periodic, execute_job, recover_stale_jobs
+
+
+@task('tests.echo', max_attempts=2)
+def echo(job, **payload):
+    job.progress(1, 2, force=True)
+    return payload
+
+
+@task('tests.flaky')
+def flaky(job):
+    raise RuntimeError("boom")
+
+
+@task('tests.fatal')
+def fatal(job):
+    raise JobError("Bad input")
+
+
+class JobTestCase(TestCase):
+
+    def setUp(self):
+        # the runner closes connections between jobs, which would end the test transaction
+        patcher = mock.patch('jobs.runner.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_job(self, job):
+        self.assertEqual(claim_jobs('tests', limit=1), [job.id])
+        execute_job(job.id)
+        job.refresh_from_db()
+        return job
+
+
+class EnqueueTests(JobTestCase):
+
+    def test_max_attempts(self):
+        self.assertEqual(enqueue('tests.echo').max_attempts, 2)
+        self.assertEqual(enqueue('tests.flaky').max_attempts, 3)
+        self.assertEqual(enqueue('tests.flaky', max_attempts=5).max_attempts, 5)
+
+    def test_unknown_task(self):
+        with self.assertRaises(ValueError):
+            enqueue('tests.missing')
+        self.assertFalse(Job.objects.exists())
+
+
+class ClaimTests(JobTestCase):
+
+    def test_claims_due_jobs_once(self):
+        first = enqueue('tests.echo')
+        second = enqueue('tests.flaky')
+        enqueue('tests.echo', run_after=timezone.now() + timedelta(minutes=5))
+
+        self.assertEqual(claim_jobs('worker-a', limit=1), [first.id])
+        self.assertEqual(claim_jobs('worker-b', limit=5), [second.id])
+        self.assertEqual(claim_jobs('worker-c', limit=5), [])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.locked_by, first.attempts), ('running', 'worker-a', 1))
+
+    def test_names(self):
+        enqueue('tests.echo')
+        fatal_job = enqueue('tests.fatal')
+        self.assertEqual(claim_jobs('tests', limit=5, names=['tests.fatal']), [fatal_job.id])
+
+
+class ExecuteTests(JobTestCase):
+
+    def test_success(self):
+        job = self.run_job(enqueue('tests.echo', {'template_id': 1}))
+        self.assertEqual((job.status, job.result, job.error), ('succeeded', {'template_id': 1}, ''))
+        self.assertEqual((job.progress, job.progress_total), (1, 2))
+        self.assertEqual(job.locked_by, '')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failures_retry_with_backoff(self):
+        before = timezone.now()
+        job = self.run_job(enqueue('tests.flaky', max_attempts=2))
+        self.assertEqual((job.status, job.error, job.attempts), ('queued', 'RuntimeError: boom', 1))
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=10))
+        self.assertLessEqual(job.run_after, timezone.now() + timedelta(seconds=12.5))
+        # not due before its backoff
+        self.assertEqual(claim_jobs('tests', limit=1), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = self.run_job(job)
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_job_errors_do_not_retry(self):
+        job = self.run_job(enqueue('tests.fatal'))
+        self.assertEqual((job.status, job.error, job.attempts), ('failed', 'Bad input', 1))
+
+    def test_unknown_task(self):
+        job = Job.objects.create(name='tests.removed')
+        job = self.run_job(job)
+        self.assertEqual((job.status, job.error), ('failed', 'Unknown task: tests.removed'))
+
+    def test_unclaimed_jobs_are_left_alone(self):
+        job = enqueue('tests.echo')
+        execute_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 0))
+
+    @override_settings(JOBS={'BACKOFF_BASE': 10, 'BACKOFF_MAX': 60})
+    def test_retry_delay(self):
+        self.assertTrue(10 <= retry_delay(1) <= 12.5)
+        self.assertTrue(40 <= retry_delay(3) <= 50)
+        self.assertTrue(60 <= retry_delay(10) <= 75)
+
+
+class MaintenanceTests(JobTestCase):
+
+    @override_settings(JOBS={'LOCK_TIMEOUT': 300})
+    def test_recover_stale_jobs(self):
+        stale = enqueue('tests.echo')
+        fresh = enqueue('tests.echo')
+        claim_jobs('dead-worker', limit=2)
+        Job.objects.filter(pk=stale.pk).update(locked_at=timezone.now() - timedelta(minutes=10))
+
+        self.assertEqual(recover_stale_jobs(), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, stale.locked_by), ('queued', ''))
+        self.assertEqual(stale.error, 'Worker dead-worker stopped responding')
+        self.assertEqual(fresh.status, 'running')
+
+    @override_settings(JOBS={'PERIODIC': {'tests.echo': 3600}})
+    def test_enqueue_periodic(self):
+        enqueue_periodic()
+        enqueue_periodic()
+        job = Job.objects.get(name='tests.echo')
+        self.run_job(job)
+        # ran recently
+        enqueue_periodic()
+        self.assertEqual(Job.objects.filter(name='tests.echo').count(), 1)
+
+        Job.objects.filter(pk=job.pk).update(finished_at=timezone.now() - timedelta(hours=2))
+        enqueue_periodic()
+        self.assertEqual(Job.objects.filter(name='tests.echo', status='queued').count(), 1)
+
+
+class JobViewTests(JobTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='hr@example.com', username='hr', password='secret-pass')
+        self.other = User.objects.create_user(email='it@example.com', username='it', password='secret-pass')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_detail(self):
+        job = enqueue('tests.echo', {'rows': 3}, created_by=self.user)
+        response = self.client.get(reverse('job-detail', args=[job.id]))
+        self.assertEqual((response.status_code, response.json()['status']), (200, 'queued'))
+        self.assertEqual(response['Retry-After'], '2')
+
+        self.run_job(job)
+        response = self.client.get(reverse('job-detail', args=[job.id]))
+        self.assertEqual(response.json()['result'], {'rows': 3})
+        self.assertNotIn('Retry-After', response)
+
+    def test_other_users_jobs(self):
+        job = enqueue('tests.echo', created_by=self.other)
+        response = self.client.get(reverse('job-detail', args=[job.id]))
+        self.assertEqual((response.status_code, response.json()), (404, {'error': 'Job not found'}))
+        self.assertEqual(self.client.get(reverse('job-list')).json(), {'results': []})
+
+    def test_list(self):
+        jobs = [enqueue('tests.echo', created_by=self.user) for _ in range(3)]
+        self.run_job(jobs[0])
+        ids = [job['id'] for job in self.client.get(reverse('job-list')).json()['results']]
+        self.assertEqual(ids, [job.id for job in reversed(jobs)])
+        response = self.client.get(reverse('job-list'), {'status': 'succeeded', 'limit': 1})
+        self.assertEqual([job['id'] for job in response.json()['results']], [jobs[0].id])
+        self.assertEqual(self.client.get(reverse('job-list'), {'limit': 'all'}).status_code, 400)
+
+    def test_unauthenticated(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get(reverse('job-list')).status_code, 401)
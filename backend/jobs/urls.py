@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import JobListView, JobView
+
+urlpatterns = [
+    path('', JobListView.as_view(), name='job-list'),
+    path('<int:job_id>/', JobView.as_view(), name='job-detail'),
+]
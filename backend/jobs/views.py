@@ -0,0 +1,79 @@
+# drf
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+
+# model
+from .models import Job
+
+# auth
+from user_auth.authentication import ClaimsJWTAuthentication
+
+# services
+from employee.pagination import InvalidCursor, parse_page_size
+
+# logging
+import logging
+logger = logging.getLogger(__name__)
+
+
+# seconds a client should wait before polling an unfinished job again
+POLL_AFTER = 2
+
+
+def job_data(job):
+    return {
+        'id': job.id,
+        'name': job.name,
+        'status': job.status,
+        'progress': job.progress,
+        'progress_total': job.progress_total,
+        'result': job.result,
+        'error': job.error,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'run_after': job.run_after,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+
+
+class JobView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        """Status, progress and (once succeeded) result of one of the user's jobs."""
+        job = Job.objects.filter(pk=job_id, created_by_id=request.user.id).first()
+        if job is None:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        response = Response(job_data(job))
+        if not job.finished:
+            response['Retry-After'] = str(POLL_AFTER)
+        return response
+
+
+class JobListView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        The user's most recent jobs, newest first.
+
+        Query params:
+            status  - only jobs with this status
+            limit   - number of jobs (default 20, max 100)
+        """
+        try:
+            limit = parse_page_size(request.query_params.get('limit'), default=20, maximum=100)
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        jobs = Job.objects.filter(created_by_id=request.user.id).order_by('-created_at', '-id')
+        job_status = request.query_params.get('status')
+        if job_status:
+            jobs = jobs.filter(status=job_status)
+        return Response({'results': [job_data(job) for job in jobs[:limit]]})
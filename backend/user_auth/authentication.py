@@ -0,0 +1,181 @@
+"""
+JWT authentication without a user query per request.
+
+``CachedJWTAuthentication`` resolves the user (with its profile) from a
+short-TTL, process-local cache keyed by user id. The token version
+(simplejwt's revoke claim, when ``CHECK_REVOKE_TOKEN`` is on) is checked
+against the cached password hash, so a password change still revokes. Each
+request gets fresh ``User``/``Profile`` instances built from the cached
+column values, so a view mutating ``request.user`` never leaks into the
+cache. ``user_auth.signals`` invalidates entries on ``User``/``Profile``
+saves and deletes; other workers pick changes up within the TTL.
+
+``ClaimsJWTAuthentication`` goes further for read-only endpoints: safe
+methods get a ``TokenUser`` built from the token claims alone, other methods
+fall back to the cached user.
+
+Settings (all optional)::
+
+    JWT_PRINCIPAL_CACHE = {
+        'TTL': 30,             # seconds
+        'MAX_ENTRIES': 10000,
+    }
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+
+from backend.replicas import use_primary
+
+# simple jwt
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# models
+from .models import User, Profile
+
+
+DEFAULTS = {
+    'TTL': 30,
+    'MAX_ENTRIES': 10000,
+}
+
+
+def _field_values(instance):
+    return {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+def _instance(model, values, db):
+    instance = model(**values)
+    instance._state.adding = False
+    instance._state.db = db
+    return instance
+
+
+class PrincipalCache:
+    """TTL + LRU cache of ``user id -> (expires, db, user values, profile values)``."""
+
+    def __init__(self, ttl=DEFAULTS['TTL'], max_entries=DEFAULTS['MAX_ENTRIES']):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULTS, **getattr(settings, 'JWT_PRINCIPAL_CACHE', {})}
+        return cls(ttl=options['TTL'], max_entries=options['MAX_ENTRIES'])
+
+    def get_user(self, user_id):
+        """A fresh ``User`` (with ``profile`` attached) or ``None`` if it does not exist."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return self._build(entry)
+            self.misses += 1
+            generation = self._generation
+
+        # from the primary so a password change cannot be undone by replica lag
+        with use_primary():
+            user = (
+                User.objects.select_related('profile')
+                .filter(**{api_settings.USER_ID_FIELD: user_id})
+                .first()
+            )
+        if user is None:
+            return None
+
+        profile = getattr(user, 'profile', None)
+        entry = (
+            now + self.ttl,
+            user._state.db,
+            _field_values(user),
+            _field_values(profile) if profile is not None else None,
+        )
+        with self._lock:
+            # skip the store if an invalidation ran while we were loading
+            if generation == self._generation:
+                self._entries[user_id] = entry
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def _build(self, entry):
+        _, db, user_values, profile_values = entry
+        user = _instance(User, user_values, db)
+        if profile_values is not None:
+            user.profile = _instance(Profile, profile_values, db)
+        return user
+
+
+principal_cache = PrincipalCache.from_settings()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` with users served from ``principal_cache``."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = principal_cache.get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        # the token version: simplejwt's hash of the password it was issued for
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+class ClaimsJWTAuthentication(CachedJWTAuthentication):
+    """
+    For read-only endpoints: safe methods get a ``TokenUser`` from the claims.
+
+    A deactivated user keeps read access until the access token expires.
+    """
+
+    def authenticate(self, request):
+        self._safe = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if getattr(self, '_safe', False):
+            if api_settings.USER_ID_CLAIM not in validated_token:
+                raise InvalidToken(_("Token contained no recognizable user identification"))
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+        return super().get_user(validated_token)
@@ -0,0 +1,221 @@
+"""
+Bounded token blacklist tables and fast blacklist checks.
+
+Pruning deletes expired ``OutstandingToken`` rows (their ``BlacklistedToken``
+rows cascade) in primary-key order and small batches. simplejwt does not
+index ``expires_at``, but tokens share one lifetime, so the oldest ids
+expire first and each batch is a short PK range scan instead of a table
+scan. ``prune_tokens`` runs it once; ``PruneScheduler`` runs it periodically
+in serving processes.
+
+``blacklist_filter`` is a Bloom filter of blacklisted JTIs. It is built on
+first use, updated when a token is blacklisted here, and catches up with
+other workers by reading blacklist rows past the highest id it has seen at
+most every ``REFRESH_INTERVAL`` seconds. A negative answer is exact, so most
+refreshes (``FilteredRefreshToken``, used by the refresh endpoint) never
+query the blacklist table; a positive answer is confirmed against the
+database. A token blacklisted by another worker can pass this worker's
+check for up to ``REFRESH_INTERVAL`` seconds.
+
+Settings (all optional)::
+
+    TOKEN_BLACKLIST = {
+        'PRUNE_INTERVAL': 3600,     # seconds between scheduled prunes, 0 disables
+        'PRUNE_BATCH_SIZE': 1000,
+        'REFRESH_INTERVAL': 5,      # seconds between filter catch-ups
+        'FALSE_POSITIVE_RATE': 0.01,
+    }
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+# simple jwt
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'PRUNE_INTERVAL': 3600,
+    'PRUNE_BATCH_SIZE': 1000,
+    'REFRESH_INTERVAL': 5,
+    'FALSE_POSITIVE_RATE': 0.01,
+}
+
+
+def blacklist_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_BLACKLIST', {})}[name]
+
+
+def prune_expired_tokens(batch_size=None, max_batches=None, now=None):
+    """
+    Delete expired outstanding tokens and their blacklist entries in batches.
+
+    Returns ``(outstanding_deleted, blacklisted_deleted)``.
+    """
+    batch_size = batch_size or blacklist_setting('PRUNE_BATCH_SIZE')
+    now = now or timezone.now()
+    outstanding_deleted = 0
+    blacklisted_deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        blacklisted_deleted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+        outstanding_deleted += OutstandingToken.objects.filter(id__in=ids).delete()[0]
+        batches += 1
+    return outstanding_deleted, blacklisted_deleted
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity, false_positive_rate):
+        capacity = max(capacity, 1024)
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class BlacklistFilter:
+    """Bloom filter of blacklisted JTIs kept in step with ``BlacklistedToken``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._last_id = 0
+        self._refreshed_at = 0.0
+        self.skipped = 0
+        self.confirmed = 0
+
+    def rebuild(self):
+        """Load every unexpired blacklisted JTI."""
+        last_id = BlacklistedToken.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        rows = list(
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+            .order_by()
+            .values_list('token__jti', flat=True)
+        )
+        bloom = BloomFilter(len(rows) * 2, blacklist_setting('FALSE_POSITIVE_RATE'))
+        for jti in rows:
+            bloom.add(jti)
+        with self._lock:
+            self._bloom = bloom
+            self._last_id = last_id
+            self._refreshed_at = time.monotonic()
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is None:
+                return
+            self._bloom.add(jti)
+            # grow before the false positive rate degrades
+            full = self._bloom.count > self._bloom.capacity
+        if full:
+            self.rebuild()
+
+    def might_be_blacklisted(self, jti):
+        if self._bloom is None:
+            self.rebuild()
+        elif time.monotonic() - self._refreshed_at > blacklist_setting('REFRESH_INTERVAL'):
+            self._catch_up()
+        with self._lock:
+            found = jti in self._bloom
+            if found:
+                self.confirmed += 1
+            else:
+                self.skipped += 1
+            return found
+
+    def _catch_up(self):
+        with self._lock:
+            last_id = self._last_id
+            self._refreshed_at = time.monotonic()
+        rows = list(
+            BlacklistedToken.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'token__jti')
+        )
+        for _, jti in rows:
+            self.add(jti)
+        if rows:
+            with self._lock:
+                self._last_id = max(self._last_id, rows[-1][0])
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class FilteredRefreshToken(RefreshToken):
+    """``RefreshToken`` that asks ``blacklist_filter`` before the database."""
+
+    def check_blacklist(self):
+        if blacklist_filter.might_be_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+
+class PruneScheduler:
+    """Daemon thread pruning expired tokens every ``PRUNE_INTERVAL`` seconds."""
+
+    def __init__(self):
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        interval = blacklist_setting('PRUNE_INTERVAL')
+        if not interval:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, args=(interval,), name='token-pruner', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            close_old_connections()
+            try:
+                outstanding, blacklisted = prune_expired_tokens()
+                if outstanding:
+                    logger.info(
+                        f"Pruned {outstanding} expired outstanding tokens "
+                        f"({blacklisted} blacklisted)"
+                    )
+            except Exception as e:
+                logger.error(f"Token pruning failed: {str(e)}")
+
+
+prune_scheduler = PruneScheduler()
@@ -0,0 +1,157 @@
+"""
+Profile picture pipeline.
+
+Uploads are streamed to a temporary file in chunks while being hashed, then
+stored under their SHA-256 (``profile_pics/ab/abcdef....png``), so identical
+uploads are kept once. Thumbnails are rendered by Pillow on a process pool
+off the request thread and written next to the original as
+``<name>_<size>.jpg``; until a thumbnail exists its URL falls back to the
+original.
+
+Thumbnail rendering works on local paths, so it needs a storage with
+``path()`` (the default ``FileSystemStorage``). With ``BACKGROUND = 'jobs'``
+rendering is queued as a ``user_auth.thumbnails`` job for ``run_jobs``
+instead, so web processes keep no pool of their own.
+
+Settings (all optional)::
+
+    PROFILE_IMAGES = {
+        'THUMBNAIL_SIZES': (64, 128, 256),  # longest side in pixels
+        'WORKERS': 2,                       # processes rendering thumbnails
+        'QUALITY': 85,                      # JPEG quality of thumbnails
+        'BACKGROUND': 'pool',               # 'pool' or 'jobs'
+    }
+"""
+import atexit
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'THUMBNAIL_SIZES': (64, 128, 256),
+    'WORKERS': 2,
+    'QUALITY': 85,
+    'BACKGROUND': 'pool',
+}
+
+UPLOAD_DIR = 'profile_pics'
+
+
+def image_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'PROFILE_IMAGES', {})}[name]
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def thumbnail_name(name, size):
+    return f"{os.path.splitext(name)[0]}_{size}.jpg"
+
+
+def render_thumbnails(source_path, targets, quality):
+    """
+    Write ``{size: target_path}`` thumbnails of ``source_path``.
+
+    Runs in a worker process, so it only deals in plain paths. Existing
+    thumbnails are left alone. Returns the number written.
+    """
+    pending = {size: path for size, path in targets.items() if not os.path.exists(path)}
+    if not pending:
+        return 0
+    with Image.open(source_path) as source:
+        source.load()
+        image = source.convert('RGB')
+    # largest first, each one resized from the previous
+    for size in sorted(pending, reverse=True):
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        partial = f"{pending[size]}.part"
+        image.save(partial, 'JPEG', quality=quality, optimize=True)
+        os.replace(partial, pending[size])
+    return len(pending)
+
+
+def store_upload(uploaded_file):
+    """
+    Store an uploaded image content-addressed and return its storage name.
+
+    Raises ``InvalidImage`` if the upload is not an image Pillow can read.
+    """
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR) as temporary:
+        for chunk in uploaded_file.chunks():
+            digest.update(chunk)
+            temporary.write(chunk)
+        temporary.flush()
+
+        try:
+            with Image.open(temporary.name) as image:
+                image.verify()
+                extension = (image.format or 'png').lower()
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+            raise InvalidImage(str(e))
+
+        hexdigest = digest.hexdigest()
+        name = f"{UPLOAD_DIR}/{hexdigest[:2]}/{hexdigest}.{extension}"
+        if default_storage.exists(name):
+            return name
+        temporary.seek(0)
+        return default_storage.save(name, File(temporary))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_thumbnail_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=image_setting('WORKERS'))
+            atexit.register(_pool.shutdown, wait=False)
+        return _pool
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Thumbnail rendering failed: {str(error)}")
+
+
+def schedule_thumbnails(name):
+    """Render the thumbnails of stored image ``name`` in the background."""
+    if image_setting('BACKGROUND') == 'jobs':
+        from jobs.registry import enqueue
+        return enqueue('user_auth.thumbnails', {'name': name})
+
+    targets = {
+        size: default_storage.path(thumbnail_name(name, size))
+        for size in image_setting('THUMBNAIL_SIZES')
+    }
+    future = get_thumbnail_pool().submit(
+        render_thumbnails, default_storage.path(name), targets, image_setting('QUALITY')
+    )
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def thumbnail_urls(image):
+    """``{size: url}`` for an ``ImageField`` value, the original until rendered."""
+    if not image:
+        return {}
+    urls = {}
+    for size in image_setting('THUMBNAIL_SIZES'):
+        name = thumbnail_name(image.name, size)
+        urls[str(size)] = default_storage.url(name if default_storage.exists(name) else image.name)
+    return urls
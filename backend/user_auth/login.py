@@ -0,0 +1,214 @@
+"""
+Login pipeline helpers.
+
+``alogin`` checks a login with one user lookup and issues its refresh token.
+Password hashing (PBKDF2) runs on a bounded thread pool so it never blocks
+the event loop; ``hashlib`` releases the GIL while hashing, so the pool gives
+real parallelism.
+
+The ``OutstandingToken`` row of a login's refresh token is written in the
+request. ``DEFER_OUTSTANDING_TOKENS`` instead buffers the rows and inserts
+them with ``bulk_create`` from a background flusher, trading durability for
+one INSERT per batch: rows buffered when the process dies without running
+``atexit`` (SIGKILL, OOM kill, a crash) are lost, up to
+``TOKEN_FLUSH_INTERVAL`` seconds or ``TOKEN_FLUSH_SIZE`` logins per process.
+Their tokens keep working and can still be blacklisted (simplejwt creates the
+row then); only the outstanding token listing misses them.
+
+Settings (all optional)::
+
+    LOGIN_PIPELINE = {
+        'HASH_WORKERS': 4,                  # threads hashing passwords
+        'DEFER_OUTSTANDING_TOKENS': False,  # True buffers token rows, see above
+        'TOKEN_FLUSH_SIZE': 200,            # flush once this many are buffered
+        'TOKEN_FLUSH_INTERVAL': 0.5,        # ... or after this many seconds
+    }
+"""
+import asyncio
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, identify_hasher
+from django.db import close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+
+# simple jwt
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+# models
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'HASH_WORKERS': 4,
+    'DEFER_OUTSTANDING_TOKENS': False,
+    'TOKEN_FLUSH_SIZE': 200,
+    'TOKEN_FLUSH_INTERVAL': 0.5,
+}
+
+
+def pipeline_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'LOGIN_PIPELINE', {})}[name]
+
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+
+def get_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ThreadPoolExecutor(
+                max_workers=pipeline_setting('HASH_WORKERS'), thread_name_prefix='login-hash'
+            )
+        return _hash_pool
+
+
+def configure_hash_pool(workers):
+    """Replace the hashing pool, e.g. to benchmark different sizes."""
+    global _hash_pool
+    with _hash_pool_lock:
+        old, _hash_pool = _hash_pool, ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='login-hash'
+        )
+    if old is not None:
+        old.shutdown(wait=False)
+
+
+def verify_password(raw_password, encoded):
+    """
+    Return ``(valid, needs_rehash)`` for a stored password hash.
+
+    Meant to run on the hashing pool.
+    """
+    if not encoded:
+        return False, False
+    valid = check_password(raw_password, encoded)
+    if not valid:
+        return False, False
+    try:
+        needs_rehash = identify_hasher(encoded).must_update(encoded)
+    except ValueError:
+        needs_rehash = False
+    return True, needs_rehash
+
+
+def rehash_password(user, raw_password):
+    """Store the password with the current hasher settings."""
+    user.set_password(raw_password)
+    type(user).objects.filter(pk=user.pk).update(password=user.password)
+
+
+def refresh_token_for_user(user):
+    """
+    A ``RefreshToken`` for ``user`` without the inline OutstandingToken INSERT.
+
+    The token is recorded through ``record_outstanding_token`` instead.
+    """
+    # Token.for_user, skipping BlacklistMixin.for_user which writes the row
+    return super(BlacklistMixin, RefreshToken).for_user(user)
+
+
+def outstanding_token(user, token):
+    return OutstandingToken(
+        user_id=user.pk,
+        jti=token[api_settings.JTI_CLAIM],
+        token=str(token),
+        created_at=token.current_time,
+        expires_at=datetime_from_epoch(token['exp']),
+    )
+
+
+class OutstandingTokenWriter:
+    """Buffers OutstandingToken rows and inserts them in batches."""
+
+    def __init__(self, flush_size, flush_interval):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, token_row):
+        with self._lock:
+            self._buffer.append(token_row)
+            full = len(self._buffer) >= self.flush_size
+            self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        try:
+            OutstandingToken.objects.bulk_create(rows, ignore_conflicts=True)
+        except Exception as e:
+            logger.error(f"Could not record {len(rows)} outstanding tokens: {str(e)}")
+            return 0
+        return len(rows)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name='outstanding-token-writer', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+
+outstanding_tokens = OutstandingTokenWriter(
+    flush_size=pipeline_setting('TOKEN_FLUSH_SIZE'),
+    flush_interval=pipeline_setting('TOKEN_FLUSH_INTERVAL'),
+)
+atexit.register(outstanding_tokens.flush)
+
+
+async def record_outstanding_token(user, token):
+    row = outstanding_token(user, token)
+    if pipeline_setting('DEFER_OUTSTANDING_TOKENS'):
+        outstanding_tokens.add(row)
+    else:
+        await row.asave()
+
+
+async def alogin(email, password):
+    """
+    Check a login and issue its refresh token; ``(user, refresh)``.
+
+    Raises ``AuthenticationFailed`` for an unknown email or a wrong password.
+    """
+    # Single lookup, reused for authentication and the token
+    user = await User.objects.filter(email=email).afirst()
+    if user is None:
+        raise AuthenticationFailed('Invalid email address')
+
+    loop = asyncio.get_running_loop()
+    valid, needs_rehash = await loop.run_in_executor(get_hash_pool(), verify_password, password, user.password)
+    if not valid or not user.is_active:
+        raise AuthenticationFailed("Invalid password")
+    if needs_rehash:
+        await sync_to_async(rehash_password)(user, password)
+
+    refresh = refresh_token_for_user(user)
+    refresh["username"] = str(user.username)
+    await record_outstanding_token(user, refresh)
+    return user, refresh
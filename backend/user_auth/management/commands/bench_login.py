@@ -0,0 +1,79 @@
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+
+from user_auth.login import configure_hash_pool, outstanding_tokens
+from user_auth.models import User
+
+
+BENCH_EMAIL = 'bench-login-{}@example.invalid'
+BENCH_PASSWORD = 'bench-password-123'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure logins per second through /user/login/ for several hashing pool sizes. "
+        "Creates throwaway users in the configured database and removes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default='1,2,4', help="Comma separated hashing pool sizes")
+        parser.add_argument('--logins', type=int, default=40, help="Logins per pool size")
+        parser.add_argument('--concurrency', type=int, default=16, help="Logins in flight at once")
+
+    def handle(self, *args, **options):
+        # the in-process client sends Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            self.run_benchmark(options)
+
+    def run_benchmark(self, options):
+        users = self.create_users(options['concurrency'])
+        try:
+            for workers in [int(count) for count in options['workers'].split(',')]:
+                configure_hash_pool(workers)
+                elapsed, failures = asyncio.run(
+                    self.run_logins(options['logins'], options['concurrency'])
+                )
+                rate = options['logins'] / elapsed
+                self.stdout.write(
+                    f"{workers:>3} workers: {rate:>8.1f} logins/s "
+                    f"({rate / workers:.1f} per worker, {failures} failures)"
+                )
+        finally:
+            outstanding_tokens.flush()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def create_users(self, count):
+        # hash once and share it, creating users is not what is measured
+        template = User(email=BENCH_EMAIL.format('template'))
+        template.set_password(BENCH_PASSWORD)
+        users = [
+            User(email=BENCH_EMAIL.format(i), username=f'bench-login-{i}', password=template.password)
+            for i in range(count)
+        ]
+        User.objects.filter(email__in=[user.email for user in users]).delete()
+        return User.objects.bulk_create(users)
+
+    async def run_logins(self, total, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        failures = 0
+
+        async def login(i):
+            nonlocal failures
+            async with semaphore:
+                response = await client.post(
+                    '/user/login/',
+                    json.dumps({'email': BENCH_EMAIL.format(i % concurrency), 'password': BENCH_PASSWORD}),
+                    content_type='application/json',
+                )
+                if response.status_code != 200:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(total)))
+        return time.perf_counter() - started, failures
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from user_auth.images import image_setting, render_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure profile picture thumbnail rendering (images per second) for several "
+        "process pool sizes, using generated images in a temporary directory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default='1,2,4', help="Comma separated process pool sizes")
+        parser.add_argument('--images', type=int, default=24, help="Images per pool size")
+        parser.add_argument('--width', type=int, default=1600)
+        parser.add_argument('--height', type=int, default=1200)
+
+    def handle(self, *args, **options):
+        sizes = image_setting('THUMBNAIL_SIZES')
+        quality = image_setting('QUALITY')
+        with tempfile.TemporaryDirectory() as directory:
+            sources = self.create_images(directory, options['images'], options['width'], options['height'])
+            for workers in [int(count) for count in options['workers'].split(',')]:
+                jobs = [
+                    (source, {size: os.path.join(directory, f"{workers}-{i}-{size}.jpg") for size in sizes})
+                    for i, source in enumerate(sources)
+                ]
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    # start the workers before timing
+                    list(pool.map(abs, range(workers)))
+                    started = time.perf_counter()
+                    futures = [pool.submit(render_thumbnails, source, targets, quality) for source, targets in jobs]
+                    rendered = sum(future.result() for future in futures)
+                    elapsed = time.perf_counter() - started
+                rate = len(jobs) / elapsed
+                self.stdout.write(
+                    f"{workers:>3} workers: {rate:>8.1f} images/s "
+                    f"({rate / workers:.1f} per worker, {rendered} thumbnails)"
+                )
+
+    def create_images(self, directory, count, width, height):
+        sources = []
+        for i in range(count):
+            path = os.path.join(directory, f"source-{i}.png")
+            # noise so the encoders do realistic work
+            Image.effect_noise((width, height), 32 + i % 32).convert('RGB').save(path)
+            sources.append(path)
+        return sources
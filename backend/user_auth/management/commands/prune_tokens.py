@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from user_auth.blacklist import blacklist_setting, prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted JWT tokens in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=blacklist_setting('PRUNE_BATCH_SIZE'))
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches")
+
+    def handle(self, *args, **options):
+        outstanding, blacklisted = prune_expired_tokens(
+            batch_size=options['batch_size'], max_batches=options['max_batches']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {outstanding} expired outstanding tokens ({blacklisted} blacklisted)"
+        ))
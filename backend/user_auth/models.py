@@ -1,9 +1,58 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.db.models.fields.files import FieldFile
+
+_UNSET = object()
+
+
+class DirtyFieldsMixin:
+    """
+    Saves of existing rows write only the columns changed since load.
+
+    Column values are remembered when the instance is built, loaded or
+    saved. ``save()`` without ``update_fields`` on an existing row becomes
+    ``save(update_fields=<changed columns>)``, which is a no-op (no query,
+    no signals) when nothing changed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reset_dirty()
+
+    def _reset_dirty(self, fields=None):
+        snapshot = getattr(self, '_loaded_values', {}) if fields is not None else {}
+        for field in self._meta.concrete_fields:
+            if fields is None or field.attname in fields or field.name in fields:
+                # deferred fields are not in __dict__ and never count as dirty
+                value = self.__dict__.get(field.attname, _UNSET)
+                if isinstance(value, FieldFile):
+                    value = value.name
+                snapshot[field.attname] = value
+        self._loaded_values = snapshot
+
+    def get_dirty_fields(self):
+        return [
+            field.name
+            for field in self._meta.concrete_fields
+            if not field.primary_key
+            and self._loaded_values.get(field.attname, _UNSET) is not _UNSET
+            and self.__dict__.get(field.attname, _UNSET) != self._loaded_values[field.attname]
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and self.pk is not None and kwargs.get('update_fields') is None and not args:
+            kwargs['update_fields'] = self.get_dirty_fields()
+        super().save(*args, **kwargs)
+        self._reset_dirty(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._reset_dirty()
+
 
 # Create your models here.
-class User(AbstractUser):
+class User(DirtyFieldsMixin, AbstractUser):
     username = models.CharField(max_length = 50, blank = True, null = True, unique = True)
     email = models.EmailField(unique = True)
     
@@ -14,7 +63,7 @@ class User(AbstractUser):
         return "{}".format(self.email)
 
 
-class Profile(models.Model):
+class Profile(DirtyFieldsMixin, models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     profile_pic = models.ImageField(upload_to='profile_pics', default='profile_pics/default.png')
     
@@ -1,8 +1,11 @@
 from rest_framework import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
 
 # models
 
 from .models import Profile, User
+from .blacklist import FilteredRefreshToken
+from .images import thumbnail_urls
 
 
 
@@ -40,7 +43,20 @@ class UserSignUpSerializer(serializers.ModelSerializer):
 
 class UserProfileSerializer(serializers.ModelSerializer):
     profile_pic = serializers.ImageField(source='profile.profile_pic')
+    profile_pic_sizes = serializers.SerializerMethodField()
     
     class Meta:
         model = User
-        fields = ['username', 'email', 'first_name', 'last_name', 'profile_pic']
+        fields = ['username', 'email', 'first_name', 'last_name', 'profile_pic', 'profile_pic_sizes']
+
+    def get_profile_pic_sizes(self, user):
+        urls = thumbnail_urls(user.profile.profile_pic)
+        request = self.context.get('request')
+        if request is not None:
+            urls = {size: request.build_absolute_uri(url) for size, url in urls.items()}
+        return urls
+
+
+# refresh with the blacklist filter in front of the blacklist table
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    token_class = FilteredRefreshToken
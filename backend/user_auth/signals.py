@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save
+from django.core.signals import request_started
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
 from .models import Profile
+from .authentication import principal_cache
+from .blacklist import blacklist_filter, prune_scheduler
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_profile(sender, instance, created, **kwargs):
@@ -10,4 +14,27 @@ def create_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+    # a profile that was never loaded has nothing to save; a loaded one
+    # only writes its changed columns (DirtyFieldsMixin)
+    profile = instance._state.fields_cache.get('profile')
+    if profile is not None:
+        profile.save()
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_user_principal(sender, instance, **kwargs):
+    principal_cache.invalidate(instance.pk)
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_profile_principal(sender, instance, **kwargs):
+    principal_cache.invalidate(instance.user_id)
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_blacklist_filter(sender, instance, created, **kwargs):
+    if created:
+        blacklist_filter.add(instance.token.jti)
+
+@receiver(request_started)
+def start_token_pruning(sender, **kwargs):
+    # only serving processes prune, not management commands
+    prune_scheduler.start()
+    request_started.disconnect(start_token_pruning)
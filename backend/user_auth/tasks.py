@@ -0,0 +1,23 @@
+"""Background jobs (``jobs.registry``) of user_auth."""
+from django.core.files.storage import default_storage
+
+# services
+from jobs.registry import task
+from .blacklist import prune_expired_tokens
+from .images import image_setting, render_thumbnails, thumbnail_name
+
+
+@task('user_auth.prune_tokens', max_attempts=1)
+def prune_tokens(job, batch_size=None, max_batches=None):
+    outstanding, blacklisted = prune_expired_tokens(batch_size=batch_size, max_batches=max_batches)
+    return {'outstanding': outstanding, 'blacklisted': blacklisted}
+
+
+@task('user_auth.thumbnails')
+def render_profile_thumbnails(job, name):
+    targets = {
+        size: default_storage.path(thumbnail_name(name, size))
+        for size in image_setting('THUMBNAIL_SIZES')
+    }
+    rendered = render_thumbnails(default_storage.path(name), targets, image_setting('QUALITY'))
+    return {'rendered': rendered}
@@ -1,3 +1,420 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework.throttling import AnonRateThrottle
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from jobs.runner import claim_jobs, execute_job
+
+from .authentication import PrincipalCache, principal_cache
+from .blacklist import BlacklistFilter, BloomFilter, blacklist_filter, prune_expired_tokens
+from .images import InvalidImage, render_thumbnails, store_upload, thumbnail_name
+from .login import outstanding_tokens
+from .models import User
+from .views import LoginView
+
+
+@override_settings(LOGIN_PIPELINE={'DEFER_OUTSTANDING_TOKENS': False})
+class EndpointQueryCountTests(TestCase):
+    """Lock in the number of queries each user_auth endpoint costs."""
+
+    def setUp(self):
+        principal_cache.clear()
+        self.user = User.objects.create_user(
+            username='jane', email='jane@example.com', password='secret-pass',
+            first_name='Jane', last_name='Doe',
+        )
+        self.client = APIClient()
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+    def test_signup(self):
+        self.client.credentials()
+        # username and email uniqueness checks, user insert, profile insert
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('signup'), {
+                'username': 'john', 'email': 'john@example.com', 'password': 'secret-pass',
+                'first_name': 'John', 'last_name': 'Doe',
+            })
+        self.assertEqual(response.status_code, 201)
+
+    def test_login(self):
+        self.client.credentials()
+        # user lookup, outstanding token insert
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                reverse('login'), {'email': 'jane@example.com', 'password': 'secret-pass'}
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_token_refresh(self):
+        blacklist_filter.rebuild()
+        # user active check only, the blacklist filter answers without a query
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('token_refresh'), {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_details(self):
+        # user and profile in one query
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('user-profile'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_put_name(self):
+        # user load, one UPDATE of the changed column
+        with self.assertNumQueries(2) as queries:
+            response = self.client.put(reverse('user-profile'), {'first_name': 'Janet'})
+        self.assertEqual(response.status_code, 200)
+        update = queries.captured_queries[-1]['sql']
+        self.assertIn('"first_name"', update)
+        self.assertNotIn('"password"', update)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Janet')
+
+    def test_put_username_and_email(self):
+        # user load, one uniqueness query for both, one UPDATE
+        with self.assertNumQueries(3):
+            response = self.client.put(
+                reverse('user-profile'), {'username': 'janet', 'email': 'janet@example.com'}
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_put_taken_email(self):
+        User.objects.create_user(username='john', email='john@example.com', password='secret-pass')
+        with self.assertNumQueries(2):
+            response = self.client.put(
+                reverse('user-profile'), {'username': 'janet', 'email': 'john@example.com'}
+            )
+        self.assertEqual(response.json(), {'error': 'Email already registered'})
+
+    def test_put_unchanged(self):
+        # nothing changed, nothing written
+        with self.assertNumQueries(1):
+            response = self.client.put(reverse('user-profile'), {'first_name': 'Jane'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_patch_password(self):
+        # user load, one UPDATE of the password column
+        with self.assertNumQueries(2) as queries:
+            response = self.client.patch(
+                reverse('user-profile'),
+                {'current_password': 'secret-pass', 'new_password': 'new-secret-pass'},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('"first_name"', queries.captured_queries[-1]['sql'])
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new-secret-pass'))
+
+
+class LoginThrottle(AnonRateThrottle):
+    rate = '2/min'
+
+
+class LoginTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='secret-pass')
+        self.client = APIClient()
+
+    def login(self, data, format='json'):
+        return self.client.post(reverse('login'), data, format=format)
+
+    def test_login(self):
+        response = self.login({'email': 'jane@example.com', 'password': 'secret-pass'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user'], {'email': 'jane@example.com', 'username': 'jane'})
+        # recorded before the response, not by a background flush
+        refresh = RefreshToken(response.json()['refresh'])
+        self.assertTrue(OutstandingToken.objects.filter(jti=refresh['jti'], user=self.user).exists())
+
+    def test_form_body(self):
+        response = self.login({'email': 'jane@example.com', 'password': 'secret-pass'}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+
+    def test_errors(self):
+        cases = [
+            ({'email': 'jane@example.com'}, 'Email and password are required'),
+            (['jane@example.com', 'secret-pass'], 'Email and password are required'),
+            ({'email': 'nobody@example.com', 'password': 'secret-pass'}, 'Invalid email address'),
+            ({'email': 'jane@example.com', 'password': 'wrong'}, 'Invalid password'),
+        ]
+        for data, error in cases:
+            response = self.login(data)
+            self.assertEqual((response.status_code, response.json()), (400, {'error': error}), data)
+        response = self.client.post(reverse('login'), '{"email": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['error'])
+        self.assertFalse(OutstandingToken.objects.exists())
+
+    def test_throttles(self):
+        with mock.patch.object(LoginView, 'throttle_classes', [LoginThrottle]):
+            for _ in range(2):
+                self.login({'email': 'jane@example.com', 'password': 'wrong'})
+            response = self.login({'email': 'jane@example.com', 'password': 'secret-pass'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('throttled', response.json()['detail'])
+        self.assertEqual(response['Retry-After'], '60')
+
+    @override_settings(LOGIN_PIPELINE={'DEFER_OUTSTANDING_TOKENS': True})
+    def test_deferred_tokens(self):
+        with mock.patch.object(outstanding_tokens, '_ensure_thread'):
+            response = self.login({'email': 'jane@example.com', 'password': 'secret-pass'})
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(OutstandingToken.objects.exists())
+            self.assertEqual(outstanding_tokens.flush(), 1)
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+
+
+class PrincipalCacheTests(TestCase):
+
+    def setUp(self):
+        principal_cache.clear()
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='secret-pass')
+        self.client = APIClient()
+
+    def get_details(self, user=None):
+        token = AccessToken.for_user(user or self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return self.client.get(reverse('user-profile'))
+
+    def test_hits_skip_the_query(self):
+        cache = PrincipalCache()
+        with self.assertNumQueries(1):
+            first = cache.get_user(self.user.id)
+        with self.assertNumQueries(0):
+            second = cache.get_user(self.user.id)
+            second.profile
+        self.assertEqual((second.id, second.email), (self.user.id, 'jane@example.com'))
+        # every hit is a fresh copy
+        second.email = 'changed@example.com'
+        self.assertEqual(cache.get_user(self.user.id).email, 'jane@example.com')
+        self.assertIsNot(first, second)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_unknown_user(self):
+        self.assertIsNone(PrincipalCache().get_user(999))
+        response = self.get_details(User(id=999))
+        self.assertEqual(response.status_code, 401)
+
+    def test_expiry_and_eviction(self):
+        other = User.objects.create_user(username='john', email='john@example.com', password='secret-pass')
+        cache = PrincipalCache(ttl=30, max_entries=1)
+        with mock.patch('user_auth.authentication.time.monotonic', return_value=100):
+            cache.get_user(self.user.id)
+            with self.assertNumQueries(0):
+                cache.get_user(self.user.id)
+        with mock.patch('user_auth.authentication.time.monotonic', return_value=131):
+            with self.assertNumQueries(1):
+                cache.get_user(self.user.id)
+            cache.get_user(other.id)
+            with self.assertNumQueries(1):
+                cache.get_user(self.user.id)
+
+    def test_saves_invalidate(self):
+        self.assertEqual(self.get_details().json()['username'], 'jane')
+        self.user.username = 'janet'
+        self.user.save()
+        self.assertEqual(self.get_details().json()['username'], 'janet')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_details().status_code, 401)
+
+    def test_password_change_revokes(self):
+        # simplejwt binds its settings at import, out of override_settings' reach
+        with mock.patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True):
+            token = AccessToken.for_user(self.user)
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.assertEqual(self.client.get(reverse('user-profile')).status_code, 200)
+            self.user.set_password('new-secret-pass')
+            self.user.save()
+            response = self.client.get(reverse('user-profile'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'password_changed')
+
+
+class BlacklistTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='secret-pass')
+        self.client = APIClient()
+
+    def outstanding(self, jti, expires_in):
+        now = timezone.now()
+        return OutstandingToken.objects.create(
+            user=self.user, jti=jti, token=jti, created_at=now, expires_at=now + timedelta(seconds=expires_in)
+        )
+
+    def refresh(self, token):
+        return self.client.post(reverse('token_refresh'), {'refresh': str(token)})
+
+    def test_prune_expired_tokens(self):
+        for i in range(5):
+            token = self.outstanding(f'old-{i}', -60)
+            if i % 2:
+                BlacklistedToken.objects.create(token=token)
+        BlacklistedToken.objects.create(token=self.outstanding('new', 60))
+
+        self.assertEqual(prune_expired_tokens(batch_size=2, max_batches=1), (2, 1))
+        self.assertEqual(prune_expired_tokens(batch_size=2), (3, 1))
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['new'])
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+        self.assertEqual(prune_expired_tokens(), (0, 0))
+
+    def test_prune_command(self):
+        self.outstanding('old', -60)
+        out = StringIO()
+        call_command('prune_tokens', '--batch-size', '10', stdout=out)
+        self.assertIn('Deleted 1 expired outstanding tokens (0 blacklisted)', out.getvalue())
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, 0.01)
+        values = [f'jti-{i}' for i in range(1000)]
+        for value in values:
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in values))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_refresh_checks_the_filter(self):
+        blacklist_filter.rebuild()
+        token = RefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+        token.blacklist()
+        # added by the signal, so confirmed against the table at once
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+
+    @override_settings(TOKEN_BLACKLIST={'REFRESH_INTERVAL': 0})
+    def test_catches_up_with_other_workers(self):
+        worker = BlacklistFilter()
+        token = RefreshToken.for_user(self.user)
+        self.assertFalse(worker.might_be_blacklisted(token['jti']))
+        # another worker's blacklisting; this filter's signal never fired
+        outstanding = OutstandingToken.objects.get(jti=token['jti'])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=outstanding)])
+        self.assertTrue(worker.might_be_blacklisted(token['jti']))
+        self.assertEqual((worker.skipped, worker.confirmed), (1, 1))
+
+    def test_unblacklisted_tokens_skip_the_table(self):
+        worker = BlacklistFilter()
+        worker.rebuild()
+        with self.assertNumQueries(0):
+            self.assertFalse(worker.might_be_blacklisted('unknown-jti'))
+
+
+@override_settings(PROFILE_IMAGES={'THUMBNAIL_SIZES': (16, 32)})
+class ProfileImageTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        principal_cache.clear()
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='secret-pass')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def png(self, color='red', size=(80, 40)):
+        data = BytesIO()
+        Image.new('RGB', size, color).save(data, 'PNG')
+        return SimpleUploadedFile('me.png', data.getvalue(), content_type='image/png')
+
+    def upload(self, upload):
+        return self.client.put(reverse('user-profile'), {'profile_pic': upload}, format='multipart')
+
+    def run_jobs(self):
+        with mock.patch('jobs.runner.close_old_connections'):
+            for job_id in claim_jobs('tests', limit=10):
+                execute_job(job_id)
+
+    def test_identical_uploads_are_stored_once(self):
+        first = store_upload(self.png())
+        self.assertRegex(first, r'^profile_pics/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(store_upload(self.png()), first)
+        self.assertNotEqual(store_upload(self.png(color='blue')), first)
+        self.assertEqual(len(default_storage.listdir(os.path.dirname(first))[1]), 1)
+
+    def test_not_an_image(self):
+        with self.assertRaises(InvalidImage):
+            store_upload(SimpleUploadedFile('me.png', b'not an image'))
+        response = self.upload(SimpleUploadedFile('me.png', b'not an image'))
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'Profile picture must be an image'}))
+        self.assertFalse(default_storage.exists('profile_pics'))
+
+    def test_decompression_bomb(self):
+        data = bytearray(self.png().read())
+        # claim 100000x100000 pixels in the IHDR chunk and fix its CRC
+        data[16:24] = (100000).to_bytes(4, 'big') * 2
+        data[29:33] = zlib.crc32(data[12:29]).to_bytes(4, 'big')
+        with self.assertRaises(InvalidImage):
+            store_upload(SimpleUploadedFile('me.png', bytes(data)))
+        response = self.upload(SimpleUploadedFile('me.png', bytes(data)))
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'Profile picture must be an image'}))
+        self.assertFalse(default_storage.exists('profile_pics'))
+
+    def test_thumbnails_are_rendered_in_the_background(self):
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        started = threading.Event()
+        pool.submit(started.wait, 5)
+        with mock.patch('user_auth.images.get_thumbnail_pool', return_value=pool):
+            response = self.upload(self.png())
+        self.assertEqual(response.status_code, 200)
+        name = User.objects.get(id=self.user.id).profile.profile_pic.name
+        # the original until the pool has rendered them
+        self.assertEqual(response.json()['profile_pic_sizes'], {'16': f'/media/{name}', '32': f'/media/{name}'})
+
+        started.set()
+        pool.shutdown(wait=True)
+        sizes = self.client.get(reverse('user-profile')).json()['profile_pic_sizes']
+        self.assertEqual(sizes, {
+            '16': f'/media/{thumbnail_name(name, 16)}',
+            '32': f'/media/{thumbnail_name(name, 32)}',
+        })
+        with Image.open(default_storage.path(thumbnail_name(name, 32))) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('JPEG', (32, 16)))
+
+    @override_settings(PROFILE_IMAGES={'THUMBNAIL_SIZES': (16, 32), 'BACKGROUND': 'jobs'})
+    def test_thumbnails_are_rendered_in_a_job(self):
+        response = self.upload(self.png())
+        self.assertEqual(response.status_code, 200)
+        name = User.objects.get(id=self.user.id).profile.profile_pic.name
+        # the original until the job has run
+        self.assertEqual(response.json()['profile_pic_sizes'], {'16': f'/media/{name}', '32': f'/media/{name}'})
+
+        self.run_jobs()
+        sizes = self.client.get(reverse('user-profile')).json()['profile_pic_sizes']
+        self.assertEqual(sizes, {
+            '16': f'/media/{thumbnail_name(name, 16)}',
+            '32': f'/media/{thumbnail_name(name, 32)}',
+        })
+        with Image.open(default_storage.path(thumbnail_name(name, 32))) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('JPEG', (32, 16)))
+
+    def test_existing_thumbnails_are_kept(self):
+        name = store_upload(self.png())
+        targets = {16: default_storage.path(thumbnail_name(name, 16))}
+        self.assertEqual(render_thumbnails(default_storage.path(name), targets, 85), 1)
+        self.assertEqual(render_thumbnails(default_storage.path(name), targets, 85), 0)
@@ -1,7 +1,8 @@
 # django
-from django.contrib.auth import authenticate
 from django.db import IntegrityError
+from django.db.models import Q
 from django.contrib.auth.hashers import check_password, make_password
+from asgiref.sync import async_to_sync
 
 # django rest framework 
 from rest_framework.views import APIView
@@ -14,8 +15,11 @@ from rest_framework.permissions import IsAuthenticated
 # serializers 
 from .serializers import UserSignUpSerializer, UserProfileSerializer
 
-# simple jwt 
-from rest_framework_simplejwt.tokens import RefreshToken
+# profile pictures
+from .images import InvalidImage, schedule_thumbnails, store_upload, thumbnail_urls
+
+# login pipeline
+from .login import alogin
 
 
 # models
@@ -23,6 +27,7 @@ from .models import User, Profile
 
 # logging
 import logging
+from collections.abc import Mapping
 logger = logging.getLogger(__name__)
 
 
@@ -62,7 +67,6 @@ class SignUpView(APIView):
                 status=status.HTTP_409_CONFLICT
             )
         except Exception as e:
-            print(e)
             logger.error(f"Error in user registration: {str(e)}")
             return Response(
                 {"message": "An error occurred during registration"},
@@ -72,31 +76,25 @@ class SignUpView(APIView):
 
 
 class LoginView(APIView):
+    """
+    Login with one user lookup; the password hash is checked on the bounded
+    hashing pool and the token issued by ``user_auth.login.alogin``.
+    """
     def post(self, request):
         try:
             # Extract credentials
-            email = request.data.get('email')
-            password = request.data.get('password')
-            
+            data = request.data
+            if not isinstance(data, Mapping):
+                raise ParseError('Email and password are required')
+            email = data.get('email')
+            password = data.get('password')
+
             # Validate required fields
             if not email or not password:
                 raise ParseError('Email and password are required')
-            
-            # Check if user exists 
-            try:
-                User.objects.get(email=email)    
-            except User.DoesNotExist:
-                raise AuthenticationFailed('Invalid email address')
-            
-            # Authenticate user
-            user = authenticate(email=email, password=password)
-            if user is None:
-                raise AuthenticationFailed("Invalid password")
-            
-            # Generate tokens
-            refresh = RefreshToken.for_user(user)
-            refresh["username"] = str(user.username)
-            
+
+            user, refresh = async_to_sync(alogin)(email, password)
+
             # Prepare response
             content = {
                 'refresh': str(refresh),
@@ -107,10 +105,10 @@ class LoginView(APIView):
                 }
             }
             return Response(content, status=status.HTTP_200_OK)
-            
+
         except (ParseError, AuthenticationFailed) as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-        
+
         except Exception as e:
             
             logger.error(f"Login error: {str(e)}")
@@ -144,28 +142,48 @@ class UserProfileView(APIView):
         if 'last_name' in request.data:
             user.last_name = request.data['last_name']
         
-        if 'username' in request.data:
-            if User.objects.filter(username=request.data['username']).exclude(id=user.id).exists():
-                 return Response(
+        # one query for both uniqueness checks
+        username = request.data.get('username')
+        email = request.data.get('email')
+        if username is not None or email is not None:
+            conditions = Q()
+            if username is not None:
+                conditions |= Q(username=username)
+            if email is not None:
+                conditions |= Q(email=email)
+            taken = list(
+                User.objects.filter(conditions).exclude(id=user.id).values_list('username', 'email')
+            )
+            if username is not None and any(row[0] == username for row in taken):
+                return Response(
                     {'error': 'Username already taken'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            user.username = request.data['username']
-        
-        if 'email' in request.data:
-            if User.objects.filter(email=request.data['email']).exclude(id=user.id).exists():
+            if email is not None and any(row[1] == email for row in taken):
                 return Response(
                     {'error': 'Email already registered'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            user.email = request.data['email']
-         # Handle profile picture
-        profile = Profile.objects.get(user=user)
+
+        if username is not None:
+            user.username = username
+        if email is not None:
+            user.email = email
+
+        # Handle profile picture: stored once per content, thumbnails rendered in the background
+        profile = user.profile
         if 'profile_pic' in request.FILES:
-            profile.profile_pic = request.FILES['profile_pic']
-            profile.save()
-        
-        
+            try:
+                profile.profile_pic = store_upload(request.FILES['profile_pic'])
+            except InvalidImage:
+                return Response(
+                    {'error': 'Profile picture must be an image'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            schedule_thumbnails(profile.profile_pic.name)
+
+        # only changed columns are written, and only if something changed
+        profile.save()
         user.save()
         return Response({
             'id': user.id,
@@ -174,6 +192,7 @@ class UserProfileView(APIView):
             'first_name': user.first_name,
             'last_name': user.last_name,
             'profile_pic': profile.profile_pic.url if profile.profile_pic else None,
+            'profile_pic_sizes': thumbnail_urls(profile.profile_pic),
             }, 
             status=status.HTTP_200_OK)
     
@@ -204,7 +223,7 @@ class UserProfileView(APIView):
         
         # Update password
         user.password = make_password(request.data['new_password'])
-        user.save()
+        user.save()  # writes only the password column
         
         return Response({'message': 'Password updated successfully'}, status=status.HTTP_200_OK)
 